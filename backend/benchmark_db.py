@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""Concurrent read/write throughput on SQLite, default vs tuned engine.
+
+Reader threads run the dashboard-style aggregate over a transactions-like
+table while writer threads insert rows, for ``--seconds`` each profile:
+
+- default: SQLAlchemy's default pool, rollback journal, synchronous=FULL,
+  no busy timeout (writers fail with "database is locked")
+- tuned: the app's engine_options() and SQLite pragmas (WAL,
+  synchronous=NORMAL, mmap, cache, busy timeout)
+
+    python benchmark_db.py [--readers 8] [--writers 2] [--seconds 5] [--rows 50000] [--json]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, event, text
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.utils.db_engine import apply_sqlite_pragmas, engine_options, pool_stats, sqlite_pragmas  # noqa: E402
+
+READ = text(
+    "SELECT category_id, COUNT(*), SUM(amount) FROM transactions "
+    "WHERE user_id = :user_id GROUP BY category_id"
+)
+WRITE = text(
+    "INSERT INTO transactions (user_id, category_id, amount, description) "
+    "VALUES (:user_id, :category_id, :amount, 'benchmark')"
+)
+
+
+def make_engine(path, tuned, threads):
+    uri = f"sqlite:///{path}"
+    if not tuned:
+        engine = create_engine(uri, connect_args={'timeout': 0})
+        event.listen(engine, 'connect', lambda conn, record: apply_sqlite_pragmas(
+            conn, [('journal_mode', 'DELETE'), ('synchronous', 'FULL')]))
+        return engine
+    os.environ.setdefault('GUNICORN_THREADS', str(threads))
+    engine = create_engine(uri, **engine_options(uri))
+    pragmas = sqlite_pragmas()
+    event.listen(engine, 'connect', lambda conn, record: apply_sqlite_pragmas(conn, pragmas))
+    return engine
+
+
+def seed(engine, rows):
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE transactions (id INTEGER PRIMARY KEY, user_id INTEGER, category_id INTEGER, "
+            "amount FLOAT, description TEXT)"
+        ))
+        conn.execute(text("CREATE INDEX ix_transactions_user_id ON transactions (user_id)"))
+        conn.execute(WRITE, [
+            {'user_id': i % 50, 'category_id': i % 12, 'amount': float(i % 500)} for i in range(rows)
+        ])
+
+
+def run_profile(tuned, readers, writers, seconds, rows):
+    directory = tempfile.mkdtemp(prefix='dbbench-')
+    path = os.path.join(directory, 'bench.db')
+    engine = make_engine(path, tuned, readers + writers)
+    seed(engine, rows)
+
+    counts = {'reads': 0, 'writes': 0, 'errors': 0}
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def worker(write):
+        done = errors = 0
+        rng = random.Random()
+        while not stop.is_set():
+            try:
+                with engine.begin() as conn:
+                    params = {'user_id': rng.randrange(50), 'category_id': rng.randrange(12),
+                              'amount': rng.random() * 100}
+                    conn.execute(WRITE if write else READ, params).close()
+                done += 1
+            except Exception:
+                errors += 1
+        with lock:
+            counts['writes' if write else 'reads'] += done
+            counts['errors'] += errors
+
+    threads = [threading.Thread(target=worker, args=(False,)) for _ in range(readers)]
+    threads += [threading.Thread(target=worker, args=(True,)) for _ in range(writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    stats = pool_stats(engine)
+    engine.dispose()
+    for name in os.listdir(directory):
+        os.remove(os.path.join(directory, name))
+    os.rmdir(directory)
+    return {
+        'reads_per_s': round(counts['reads'] / seconds, 1),
+        'writes_per_s': round(counts['writes'] / seconds, 1),
+        'errors': counts['errors'],
+        'pool': stats
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark SQLite read/write throughput, default vs tuned')
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--rows', type=int, default=50000, help='rows seeded before timing')
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    args = parser.parse_args(argv)
+
+    results = {
+        profile: run_profile(profile == 'tuned', args.readers, args.writers, args.seconds, args.rows)
+        for profile in ('default', 'tuned')
+    }
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for profile, result in results.items():
+            print(f"{profile:<8} reads {result['reads_per_s']:9.1f}/s  writes {result['writes_per_s']:8.1f}/s  "
+                  f"errors {result['errors']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""Serialization time and size of a large transaction list response.
+
+Encodes ``--rows`` (transaction, account, category) rows as:
+
+- handbuilt: the per-row dict the route used to build, stdlib JSON
+- spec: the TRANSACTION field spec, orjson via FastJSONProvider
+- projected: the same with ``?fields=id,amount,transaction_date``
+- columns: ``?layout=columns``, one JSON array per field
+- msgpack / msgpack-columns: ``Accept: application/msgpack``
+
+Rows are built in memory, so only serialization is measured; ``decode_ms``
+is what a client spends parsing the body.
+
+    python benchmark_serialization.py [--rows 5000] [--repeat 20] [--json]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import msgpack
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.models.account import Account  # noqa: E402
+from src.models.transaction import Transaction, Category  # noqa: E402
+from src.serializers import TRANSACTION  # noqa: E402
+from src.utils.serialization import FastJSONProvider  # noqa: E402
+
+PROJECTION = ['id', 'amount', 'transaction_date']
+
+
+def make_rows(count):
+    accounts = [Account(id=i, name=f'Account {i}') for i in range(1, 6)]
+    categories = [Category(id=i, name=f'Category {i}', type='expense', icon='🛒') for i in range(1, 11)]
+    start = datetime(2024, 1, 1)
+    rows = []
+    for i in range(count):
+        account, category = accounts[i % 5], categories[i % 10] if i % 7 else None
+        rows.append((Transaction(
+            id=i + 1, account_id=account.id, category_id=category.id if category else None,
+            amount=-12.5 - i % 100, description=f'Purchase number {i}',
+            transaction_date=start + timedelta(minutes=i), created_at=start + timedelta(minutes=i)
+        ), account, category))
+    return rows
+
+
+def handbuilt(rows):
+    data = []
+    for transaction, account, category in rows:
+        data.append({
+            'id': transaction.id,
+            'account_id': transaction.account_id,
+            'account': {
+                'id': account.id if account else None,
+                'name': account.name if account else 'Unknown'
+            },
+            'category_id': transaction.category_id,
+            'category': {
+                'id': category.id,
+                'name': category.name,
+                'type': category.type,
+                'icon': category.icon
+            } if category else None,
+            'amount': transaction.amount,
+            'description': transaction.description,
+            'transaction_date': transaction.transaction_date.isoformat() if transaction.transaction_date else None,
+            'created_at': transaction.created_at.isoformat() if transaction.created_at else None
+        })
+    return data
+
+
+def best_of(repeat, call):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = call()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000, result
+
+
+def measure(encode, repeat, decode=json.loads):
+    ms, body = best_of(repeat, encode)
+    decode_ms, _ = best_of(repeat, lambda: decode(body))
+    if isinstance(body, str):
+        body = body.encode()
+    return {'ms': round(ms, 2), 'decode_ms': round(decode_ms, 2), 'bytes': len(body)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark transaction list serialization')
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=20, help='runs per variant; the best is reported')
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    args = parser.parse_args(argv)
+
+    app = Flask(__name__)
+    standard, fast = DefaultJSONProvider(app), FastJSONProvider(app)
+    rows = make_rows(args.rows)
+    results = {
+        'handbuilt': measure(lambda: standard.dumps({'transactions': handbuilt(rows)}), args.repeat),
+        'spec': measure(lambda: fast.dumps({'transactions': TRANSACTION.dump_many(rows)}), args.repeat),
+        'projected': measure(lambda: fast.dumps({'transactions': TRANSACTION.dump_many(rows, PROJECTION)}),
+                             args.repeat),
+        'columns': measure(lambda: fast.dumps({'transactions': TRANSACTION.dump_columns(rows)}), args.repeat),
+        'msgpack': measure(lambda: msgpack.packb({'transactions': TRANSACTION.dump_many(rows)}),
+                           args.repeat, msgpack.unpackb),
+        'msgpack-columns': measure(lambda: msgpack.packb({'transactions': TRANSACTION.dump_columns(rows)}),
+                                   args.repeat, msgpack.unpackb)
+    }
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        baseline = results['handbuilt']['ms']
+        for variant, result in results.items():
+            print(f"{variant:<16} {result['ms']:8.2f} ms  x{baseline / result['ms']:4.1f}  "
+                  f"{result['bytes']:>9} bytes  decode {result['decode_ms']:7.2f} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""Measure worker boot and cold-start latency.
+
+Each run starts a fresh interpreter (as a gunicorn worker would), then times
+``import src.main``, building the app, and the first request to
+``/api/health``. Medians and p95s are printed per phase.
+
+    python benchmark_startup.py [--runs 10] [--max-ms 1500] [--json]
+
+With ``--max-ms`` the exit status is 1 when the median boot time (import +
+create_app) goes over the budget, so CI can keep it from creeping up.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Runs in the child interpreter; prints one JSON line of phase timings in ms
+CHILD = """
+import json, time
+started = time.perf_counter()
+import src.main
+imported = time.perf_counter()
+app = src.main.create_app({'SESSION_SWEEP_INTERVAL': 0})
+created = time.perf_counter()
+with app.test_client() as client:
+    status = client.get('/api/health').status_code
+finished = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'boot_ms': (created - started) * 1000,
+    'first_request_ms': (finished - created) * 1000,
+    'status': status
+}))
+"""
+
+PHASES = ('import_ms', 'create_app_ms', 'boot_ms', 'first_request_ms')
+
+
+def measure_once():
+    result = subprocess.run([sys.executable, '-c', CHILD], cwd=BACKEND_DIR,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def run(runs=10):
+    samples = [measure_once() for _ in range(runs)]
+    return {
+        phase: {
+            'median': round(_percentile([sample[phase] for sample in samples], 0.5), 1),
+            'p95': round(_percentile([sample[phase] for sample in samples], 0.95), 1)
+        }
+        for phase in PHASES
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark worker boot and cold-start latency')
+    parser.add_argument('--runs', type=int, default=10, help='fresh interpreters to time')
+    parser.add_argument('--max-ms', type=float, help='fail when the median boot time exceeds this')
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    args = parser.parse_args(argv)
+
+    results = run(args.runs)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for phase, stats in results.items():
+            print(f"{phase:<18} median {stats['median']:8.1f}ms  p95 {stats['p95']:8.1f}ms")
+
+    if args.max_ms is not None and results['boot_ms']['median'] > args.max_ms:
+        print(f"Boot time {results['boot_ms']['median']:.1f}ms is over the {args.max_ms:g}ms budget")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -5,6 +5,7 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 # Import the app from main.py 
 from src.main import app, db
+from src.bootstrap import bootstrap_database
 from src.models.user import User
 from src.models.account import Account, AccountType
 from src.models.transaction import Transaction, Category
@@ -12,6 +13,8 @@ from datetime import datetime, timedelta
 from werkzeug.security import generate_password_hash
 
 with app.app_context():
+    bootstrap_database()
+
     # Create test user
     test_user = User.query.filter_by(email='claude@test.com').first()
     if not test_user:
@@ -0,0 +1,23 @@
+"""Gunicorn settings for the production container (overridable via environment)"""
+import os
+import shutil
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+# The database pool in each worker is sized from these (src/utils/db_engine.py)
+workers = int(os.getenv('GUNICORN_WORKERS', '4'))
+threads = int(os.getenv('GUNICORN_THREADS', '2'))
+# Workers inherit these, so the app sees the real values (replica stickiness needs the worker count)
+os.environ['GUNICORN_WORKERS'] = str(workers)
+os.environ['GUNICORN_THREADS'] = str(threads)
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+loglevel = 'info'
+accesslog = '-'
+errorlog = '-'
+
+
+def on_starting(server):
+    """Start every deployment with an empty metrics directory"""
+    metrics_dir = os.getenv('METRICS_DIR')
+    if metrics_dir:
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+        os.makedirs(metrics_dir, exist_ok=True)
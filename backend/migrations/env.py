@@ -0,0 +1,57 @@
+"""Alembic environment: migrations run against the app's database.
+
+Inside ``flask --app src.main db ...`` the running app is used; the plain
+``alembic`` CLI builds one with ``create_app``. SQLite gets batch mode so
+ALTERs that it cannot run in place are done by table copy.
+"""
+from alembic import context
+from flask import current_app, has_app_context
+
+from src.models.user import db
+
+
+def _run(connection):
+    context.configure(
+        connection=connection,
+        target_metadata=db.metadata,
+        render_as_batch=connection.dialect.name == 'sqlite',
+        compare_type=True
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_offline():
+    """Emit SQL to stdout (alembic upgrade head --sql)"""
+    from src.main import create_app
+    app = create_app({'SESSION_SWEEP_INTERVAL': 0})
+    context.configure(
+        url=app.config['SQLALCHEMY_DATABASE_URI'],
+        target_metadata=db.metadata,
+        literal_binds=True,
+        dialect_opts={'paramstyle': 'named'}
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    connection = context.config.attributes.get('connection')
+    if connection is not None:
+        _run(connection)
+        return
+    if has_app_context():
+        with db.engine.connect() as connection:
+            _run(connection)
+        return
+
+    from src.main import create_app
+    app = create_app({'SESSION_SWEEP_INTERVAL': 0})
+    with app.app_context(), db.engine.connect() as connection:
+        _run(connection)
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
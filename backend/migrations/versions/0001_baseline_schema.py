@@ -0,0 +1,346 @@
+"""Baseline schema
+
+The tables as the models defined them when migrations were introduced.
+Databases created before that are stamped with this revision instead of
+running it (see ``upgrade_database``).
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19 10:46:03.960424
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('account_types',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('description', sa.String(length=200), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.create_table('categories',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('type', sa.String(length=20), nullable=False),
+    sa.Column('icon', sa.String(length=50), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('investment_types',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.create_table('users',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('email', sa.String(length=120), nullable=False),
+    sa.Column('password_hash', sa.String(length=128), nullable=True),
+    sa.Column('first_name', sa.String(length=50), nullable=False),
+    sa.Column('last_name', sa.String(length=50), nullable=False),
+    sa.Column('phone', sa.String(length=20), nullable=True),
+    sa.Column('timezone', sa.String(length=50), nullable=True),
+    sa.Column('currency_preference', sa.String(length=3), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('last_login', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('email')
+    )
+    op.create_table('accounts',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('account_type_id', sa.Integer(), nullable=True),
+    sa.Column('balance', sa.Float(), nullable=True),
+    sa.Column('currency', sa.String(length=3), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['account_type_id'], ['account_types.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('budgets',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('type', sa.String(length=20), nullable=False),
+    sa.Column('amount', sa.Float(), nullable=False),
+    sa.Column('start_date', sa.Date(), nullable=False),
+    sa.Column('end_date', sa.Date(), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=True),
+    sa.Column('rollover_enabled', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('financial_goals',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('target_amount', sa.Float(), nullable=False),
+    sa.Column('current_amount', sa.Float(), nullable=True),
+    sa.Column('target_date', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('investments',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('investment_type_id', sa.Integer(), nullable=True),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('symbol', sa.String(length=20), nullable=True),
+    sa.Column('quantity', sa.Float(), nullable=True),
+    sa.Column('purchase_price', sa.Float(), nullable=True),
+    sa.Column('current_price', sa.Float(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['investment_type_id'], ['investment_types.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('user_relationships',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('partner_id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=True),
+    sa.Column('permissions', sa.Text(), nullable=True),
+    sa.Column('accepted_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['partner_id'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('user_sessions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('token_hash', sa.String(length=100), nullable=True),
+    sa.Column('refresh_token_hash', sa.String(length=100), nullable=True),
+    sa.Column('expires_at', sa.DateTime(), nullable=True),
+    sa.Column('ip_address', sa.String(length=45), nullable=True),
+    sa.Column('user_agent', sa.String(length=255), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('last_used', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('user_sessions', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_user_sessions_expires_at'), ['expires_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_user_sessions_refresh_token_hash'), ['refresh_token_hash'], unique=False)
+        batch_op.create_index(batch_op.f('ix_user_sessions_token_hash'), ['token_hash'], unique=False)
+        batch_op.create_index('ix_user_sessions_user_active', ['user_id', 'is_active'], unique=False)
+
+    op.create_table('account_balance_history',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('account_id', sa.Integer(), nullable=False),
+    sa.Column('balance', sa.Float(), nullable=False),
+    sa.Column('recorded_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['account_id'], ['accounts.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('budget_categories',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('budget_id', sa.Integer(), nullable=False),
+    sa.Column('category_id', sa.Integer(), nullable=False),
+    sa.Column('allocated_amount', sa.Float(), nullable=False),
+    sa.Column('remarks', sa.Text(), nullable=True),
+    sa.Column('alert_threshold_50', sa.Boolean(), nullable=True),
+    sa.Column('alert_threshold_75', sa.Boolean(), nullable=True),
+    sa.Column('alert_threshold_90', sa.Boolean(), nullable=True),
+    sa.Column('alert_threshold_100', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['budget_id'], ['budgets.id'], ),
+    sa.ForeignKeyConstraint(['category_id'], ['categories.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('budget_goals',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('budget_id', sa.Integer(), nullable=False),
+    sa.Column('goal_name', sa.String(length=100), nullable=False),
+    sa.Column('target_amount', sa.Float(), nullable=False),
+    sa.Column('current_amount', sa.Float(), nullable=True),
+    sa.Column('target_date', sa.Date(), nullable=False),
+    sa.Column('auto_contribute_amount', sa.Float(), nullable=True),
+    sa.Column('auto_contribute_frequency', sa.String(length=20), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['budget_id'], ['budgets.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('crypto_accounts',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('account_id', sa.Integer(), nullable=False),
+    sa.Column('wallet_address', sa.String(length=200), nullable=True),
+    sa.ForeignKeyConstraint(['account_id'], ['accounts.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('dividends',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('investment_id', sa.Integer(), nullable=False),
+    sa.Column('amount', sa.Float(), nullable=False),
+    sa.Column('payment_date', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['investment_id'], ['investments.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('goal_contributions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('goal_id', sa.Integer(), nullable=False),
+    sa.Column('amount', sa.Float(), nullable=False),
+    sa.Column('contribution_date', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['goal_id'], ['financial_goals.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('investment_transactions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('investment_id', sa.Integer(), nullable=False),
+    sa.Column('type', sa.String(length=20), nullable=False),
+    sa.Column('quantity', sa.Float(), nullable=False),
+    sa.Column('price', sa.Float(), nullable=False),
+    sa.Column('transaction_date', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['investment_id'], ['investments.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('lot_states',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('investment_id', sa.Integer(), nullable=False),
+    sa.Column('method', sa.String(length=10), nullable=False),
+    sa.Column('last_transaction_id', sa.Integer(), nullable=True),
+    sa.Column('last_transaction_date', sa.DateTime(), nullable=True),
+    sa.Column('processed_count', sa.Integer(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['investment_id'], ['investments.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('investment_id', 'method', name='uq_lot_state_investment_method')
+    )
+    op.create_table('price_history',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('investment_id', sa.Integer(), nullable=False),
+    sa.Column('price', sa.Float(), nullable=False),
+    sa.Column('recorded_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['investment_id'], ['investments.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('price_history', schema=None) as batch_op:
+        batch_op.create_index('ix_price_history_investment_recorded', ['investment_id', 'recorded_at'], unique=False)
+
+    op.create_table('transactions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('account_id', sa.Integer(), nullable=False),
+    sa.Column('category_id', sa.Integer(), nullable=True),
+    sa.Column('amount', sa.Float(), nullable=False),
+    sa.Column('description', sa.String(length=255), nullable=True),
+    sa.Column('transaction_date', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['account_id'], ['accounts.id'], ),
+    sa.ForeignKeyConstraint(['category_id'], ['categories.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('transfers',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('from_account_id', sa.Integer(), nullable=False),
+    sa.Column('to_account_id', sa.Integer(), nullable=False),
+    sa.Column('amount', sa.Float(), nullable=False),
+    sa.Column('transfer_date', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['from_account_id'], ['accounts.id'], ),
+    sa.ForeignKeyConstraint(['to_account_id'], ['accounts.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('realized_gains',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('investment_id', sa.Integer(), nullable=False),
+    sa.Column('method', sa.String(length=10), nullable=False),
+    sa.Column('sell_transaction_id', sa.Integer(), nullable=False),
+    sa.Column('lot_transaction_id', sa.Integer(), nullable=True),
+    sa.Column('acquired_at', sa.DateTime(), nullable=True),
+    sa.Column('sold_at', sa.DateTime(), nullable=True),
+    sa.Column('quantity', sa.Float(), nullable=False),
+    sa.Column('proceeds', sa.Float(), nullable=False),
+    sa.Column('cost_basis', sa.Float(), nullable=False),
+    sa.Column('gain', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['investment_id'], ['investments.id'], ),
+    sa.ForeignKeyConstraint(['lot_transaction_id'], ['investment_transactions.id'], ),
+    sa.ForeignKeyConstraint(['sell_transaction_id'], ['investment_transactions.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('realized_gains', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_realized_gains_investment_id'), ['investment_id'], unique=False)
+
+    op.create_table('tax_lots',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('investment_id', sa.Integer(), nullable=False),
+    sa.Column('method', sa.String(length=10), nullable=False),
+    sa.Column('sequence', sa.Integer(), nullable=False),
+    sa.Column('transaction_id', sa.Integer(), nullable=True),
+    sa.Column('acquired_at', sa.DateTime(), nullable=True),
+    sa.Column('quantity', sa.Float(), nullable=False),
+    sa.Column('cost_per_unit', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['investment_id'], ['investments.id'], ),
+    sa.ForeignKeyConstraint(['transaction_id'], ['investment_transactions.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('tax_lots', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_tax_lots_investment_id'), ['investment_id'], unique=False)
+
+    op.create_table('transaction_splits',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('transaction_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('amount', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['transaction_id'], ['transactions.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('transaction_splits')
+    with op.batch_alter_table('tax_lots', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_tax_lots_investment_id'))
+
+    op.drop_table('tax_lots')
+    with op.batch_alter_table('realized_gains', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_realized_gains_investment_id'))
+
+    op.drop_table('realized_gains')
+    op.drop_table('transfers')
+    op.drop_table('transactions')
+    with op.batch_alter_table('price_history', schema=None) as batch_op:
+        batch_op.drop_index('ix_price_history_investment_recorded')
+
+    op.drop_table('price_history')
+    op.drop_table('lot_states')
+    op.drop_table('investment_transactions')
+    op.drop_table('goal_contributions')
+    op.drop_table('dividends')
+    op.drop_table('crypto_accounts')
+    op.drop_table('budget_goals')
+    op.drop_table('budget_categories')
+    op.drop_table('account_balance_history')
+    with op.batch_alter_table('user_sessions', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_sessions_user_active')
+        batch_op.drop_index(batch_op.f('ix_user_sessions_token_hash'))
+        batch_op.drop_index(batch_op.f('ix_user_sessions_refresh_token_hash'))
+        batch_op.drop_index(batch_op.f('ix_user_sessions_expires_at'))
+
+    op.drop_table('user_sessions')
+    op.drop_table('user_relationships')
+    op.drop_table('investments')
+    op.drop_table('financial_goals')
+    op.drop_table('budgets')
+    op.drop_table('accounts')
+    op.drop_table('users')
+    op.drop_table('investment_types')
+    op.drop_table('categories')
+    op.drop_table('account_types')
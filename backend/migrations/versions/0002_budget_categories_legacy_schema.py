@@ -0,0 +1,74 @@
+"""Bring pre-migration budget_categories tables up to the baseline
+
+Replaces run_remarks_migration.py and remove_unique_constraint_migration.py:
+databases created before either script ran get the ``remarks`` column, and
+lose the UNIQUE (budget_id, category_id) constraint so a category can have
+several allocations. Both steps are no-ops on databases created from 0001.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 11:05:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from src.utils.batch_migrations import rebuild_table
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def _budget_categories():
+    metadata = sa.MetaData()
+    sa.Table('budgets', metadata, sa.Column('id', sa.Integer(), primary_key=True))
+    sa.Table('categories', metadata, sa.Column('id', sa.Integer(), primary_key=True))
+    return sa.Table(
+        'budget_categories', metadata,
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('budget_id', sa.Integer(), nullable=False),
+        sa.Column('category_id', sa.Integer(), nullable=False),
+        sa.Column('allocated_amount', sa.Float(), nullable=False),
+        sa.Column('remarks', sa.Text(), nullable=True),
+        sa.Column('alert_threshold_50', sa.Boolean(), nullable=True),
+        sa.Column('alert_threshold_75', sa.Boolean(), nullable=True),
+        sa.Column('alert_threshold_90', sa.Boolean(), nullable=True),
+        sa.Column('alert_threshold_100', sa.Boolean(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['budget_id'], ['budgets.id']),
+        sa.ForeignKeyConstraint(['category_id'], ['categories.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+
+def upgrade():
+    if op.get_context().as_sql:
+        # Inspects the live schema; nothing to emit for --sql on a fresh database
+        return
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if 'remarks' not in {column['name'] for column in inspector.get_columns('budget_categories')}:
+        op.add_column('budget_categories', sa.Column('remarks', sa.Text(), nullable=True))
+
+    allocation_unique = [
+        constraint for constraint in inspector.get_unique_constraints('budget_categories')
+        if set(constraint['column_names']) == {'budget_id', 'category_id'}
+    ]
+    if not allocation_unique:
+        return
+    if bind.dialect.name == 'sqlite':
+        # SQLite cannot drop a constraint in place; copy the table in batches
+        with op.get_context().autocommit_block():
+            rebuild_table(bind.engine, _budget_categories())
+    else:
+        for constraint in allocation_unique:
+            op.drop_constraint(constraint['name'], 'budget_categories', type_='unique')
+
+
+def downgrade():
+    # The legacy shape is not restored: the remarks column and repeated
+    # allocations are part of the baseline
+    pass
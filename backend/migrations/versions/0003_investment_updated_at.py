@@ -0,0 +1,32 @@
+"""Add investments.updated_at
+
+Price refreshes and re-imported price points change rows in place, which
+the count and max id of each table do not reveal. ``updated_at`` is touched
+by those writes so the portfolio version sees them from every worker.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 12:10:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if not op.get_context().as_sql:
+        # Databases adopted from create_all() already have the column
+        columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('investments')}
+        if 'updated_at' in columns:
+            return
+    op.add_column('investments', sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('investments') as batch_op:
+        batch_op.drop_column('updated_at')
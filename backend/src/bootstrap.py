@@ -0,0 +1,98 @@
+"""Database schema and seed data, run once per deployment.
+
+    flask --app src.main bootstrap [--skip-seed]
+    flask --app src.main db upgrade|downgrade|current|revision
+
+Kept out of ``create_app`` so gunicorn workers boot without querying or
+committing anything. The schema is managed by the Alembic revisions in
+``migrations/``; ``alembic`` run from the backend directory works too.
+"""
+import os
+
+import click
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect
+
+from src.utils.logger import app_logger
+from src.models.user import db
+from src.models.account import init_account_types
+from src.models.transaction import init_default_categories
+from src.models.investment import init_investment_types
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_REVISION = '0001'
+
+
+def alembic_config():
+    config = Config(os.path.join(BACKEND_DIR, 'alembic.ini'))
+    config.set_main_option('script_location', os.path.join(BACKEND_DIR, 'migrations'))
+    return config
+
+
+def upgrade_database(revision='head'):
+    """Migrate to ``revision``; databases created before migrations are adopted first"""
+    inspector = inspect(db.engine)
+    if not inspector.has_table('alembic_version') and inspector.has_table('users'):
+        # Created by the old create_all() on boot: add any missing tables,
+        # then record it as the baseline so only later revisions run
+        app_logger.info(f"Existing database has no migration history, stamping {BASELINE_REVISION}")
+        db.create_all(bind_key=None)
+        command.stamp(alembic_config(), BASELINE_REVISION)
+    command.upgrade(alembic_config(), revision)
+
+
+def bootstrap_database(seed=True):
+    """Migrate the schema to head and, with ``seed``, add the default reference data"""
+    upgrade_database()
+    if not seed:
+        return False
+
+    # Initialize default data
+    try:
+        init_account_types()
+        init_default_categories()
+        init_investment_types()
+    except Exception as e:
+        db.session.rollback()
+        app_logger.error(f"Error initializing default data: {e}")
+        raise
+    app_logger.info("Default data initialized successfully")
+    return True
+
+
+def register_commands(app):
+    @app.cli.command('bootstrap')
+    @click.option('--skip-seed', is_flag=True, help='Only migrate the schema')
+    def bootstrap_command(skip_seed):
+        """Migrate the database schema and create the default data."""
+        seeded = bootstrap_database(seed=not skip_seed)
+        click.echo(f"Database ready ({'schema and default data' if seeded else 'schema only'})")
+
+    @app.cli.group('db')
+    def db_group():
+        """Schema migrations (Alembic)."""
+
+    @db_group.command('upgrade')
+    @click.argument('revision', default='head')
+    def upgrade_command(revision):
+        """Migrate up to REVISION (default: head)."""
+        upgrade_database(revision)
+
+    @db_group.command('downgrade')
+    @click.argument('revision')
+    def downgrade_command(revision):
+        """Migrate down to REVISION (e.g. -1)."""
+        command.downgrade(alembic_config(), revision)
+
+    @db_group.command('current')
+    def current_command():
+        """Show the revision the database is at."""
+        command.current(alembic_config(), verbose=True)
+
+    @db_group.command('revision')
+    @click.option('-m', '--message', required=True, help='Revision message')
+    @click.option('--autogenerate', is_flag=True, help='Diff the models against the database')
+    def revision_command(message, autogenerate):
+        """Create a new revision file."""
+        command.revision(alembic_config(), message=message, autogenerate=autogenerate)
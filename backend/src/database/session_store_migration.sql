@@ -0,0 +1,15 @@
+-- Session store migration
+-- Sessions are now identified by the SHA-256 digest of each token's JTI
+-- and expire together with the refresh token.
+
+-- Lookups by token digest (blocklist checks, refresh)
+CREATE INDEX IF NOT EXISTS ix_user_sessions_token_hash ON user_sessions(token_hash);
+CREATE INDEX IF NOT EXISTS ix_user_sessions_refresh_token_hash ON user_sessions(refresh_token_hash);
+
+-- Bulk revocation by user and the expiry sweeper
+CREATE INDEX IF NOT EXISTS ix_user_sessions_user_active ON user_sessions(user_id, is_active);
+CREATE INDEX IF NOT EXISTS ix_user_sessions_expires_at ON user_sessions(expires_at);
+
+-- Rows written before this change hold raw token prefixes that can never
+-- match a digest; drop them instead of keeping them forever
+DELETE FROM user_sessions WHERE token_hash IS NULL OR LENGTH(token_hash) <> 64;
@@ -7,116 +7,83 @@ from dotenv import load_dotenv
 # Load environment variables from .env file
 load_dotenv()
 
-from flask import Flask, send_from_directory
+import importlib
+from flask import Flask, current_app, send_from_directory
 from flask_cors import CORS
-from flask_jwt_extended import JWTManager
 from datetime import timedelta, datetime
 from sqlalchemy import text
 
 # Import logging utilities
 from src.utils.logger import (
-    setup_logger, log_request_info, log_response_info, 
+    setup_logger, log_request_info, log_response_info,
     log_jwt_operation, log_auth_event, app_logger
 )
+from src.utils.passwords import get_password_hasher
+from src.services.sessions import is_token_revoked, SessionSweeper
+from src.utils.auth_cache import CachingJWTManager
+from src.utils.metrics import init_metrics
+from src.utils.db_engine import engine_options, init_engine, pool_stats
+from src.utils.db_routing import REPLICA_BIND, init_replica_routing, get_replica_router, replica_url
+from src.utils.queries import init_query_tracking
+from src.utils.slow_queries import init_slow_query_log
+from src.utils.profiler import init_profiler
+from src.utils.tracing import init_tracing, start_span
+from src.utils.compression import init_compression
+from src.bootstrap import bootstrap_database, register_commands
 
 # Import all models to ensure they're registered
 from src.models.user import db, User, UserRelationship, UserSession
-from src.models.account import Account, AccountType, CryptoAccount, AccountBalanceHistory, init_account_types
-from src.models.transaction import Transaction, Category, TransactionSplit, Transfer, init_default_categories
-from src.models.investment import Investment, InvestmentType, InvestmentTransaction, PriceHistory, Dividend, init_investment_types
+from src.models.account import Account, AccountType, CryptoAccount, AccountBalanceHistory
+from src.models.transaction import Transaction, Category, TransactionSplit, Transfer
+from src.models.investment import Investment, InvestmentType, InvestmentTransaction, PriceHistory, Dividend
 from src.models.budget import Budget, BudgetCategory, BudgetGoal, FinancialGoal, GoalContribution
 
-# Import route blueprints
-from src.routes.auth import auth_bp
-from src.routes.user import user_bp
-from src.routes.account import account_bp
-from src.routes.transaction import transaction_bp
-from src.routes.investment import investment_bp
-from src.routes.budget import budget_bp
-
-# Setup logging first
-setup_logger()
-
-app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
-
-# Configuration from environment variables
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key-change-in-production')
-app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'jwt-secret-string-change-in-production')
-app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(seconds=int(os.getenv('JWT_ACCESS_TOKEN_EXPIRES', '3600')))
-app.config['JWT_REFRESH_TOKEN_EXPIRES'] = timedelta(seconds=int(os.getenv('JWT_REFRESH_TOKEN_EXPIRES', '2592000')))
-
-# Database configuration
-default_db_path = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
-app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', default_db_path)
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-# Initialize extensions
-db.init_app(app)
-jwt = JWTManager(app)
-# CORS Configuration
-if os.getenv('FLASK_ENV') == 'development':
-    # For development, allow any origin on ports 3000 and 5100
-    CORS(app, 
-         origins="*",  # Allow all origins in development
-         supports_credentials=True,
-         allow_headers=["Content-Type", "Authorization", "X-Requested-With"],
-         methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"])
-else:
-    # For production with nginx proxy, no CORS needed (same origin)
-    # CORS is disabled since nginx proxy serves both frontend and backend from same origin
-    pass
-
-# Register blueprints
-app.register_blueprint(auth_bp, url_prefix='/api/auth')
-app.register_blueprint(user_bp, url_prefix='/api')
-app.register_blueprint(account_bp, url_prefix='/api')
-app.register_blueprint(transaction_bp, url_prefix='/api')
-app.register_blueprint(investment_bp, url_prefix='/api')
-app.register_blueprint(budget_bp, url_prefix='/api')
-
-# Request/Response logging hooks
-@app.before_request
-def before_request():
-    log_request_info()
-
-@app.after_request
-def after_request(response):
-    return log_response_info(response)
+# Route blueprints as (module, blueprint, url prefix); a route module is
+# only imported when an app is built, not when src.main is imported for db
+BLUEPRINTS = (
+    ('src.routes.auth', 'auth_bp', '/api/auth'),
+    ('src.routes.user', 'user_bp', '/api'),
+    ('src.routes.account', 'account_bp', '/api'),
+    ('src.routes.transaction', 'transaction_bp', '/api'),
+    ('src.routes.investment', 'investment_bp', '/api'),
+    ('src.routes.budget', 'budget_bp', '/api'),
+    ('src.routes.admin', 'admin_bp', '/api'),
+)
+
+def register_blueprints(app):
+    for module_name, attribute, url_prefix in BLUEPRINTS:
+        blueprint = getattr(importlib.import_module(module_name), attribute)
+        app.register_blueprint(blueprint, url_prefix=url_prefix)
 
 # JWT error handlers
-@jwt.expired_token_loader
-def expired_token_callback(jwt_header, jwt_payload):
-    log_jwt_operation('EXPIRED', details=f"User ID: {jwt_payload.get('sub', 'unknown')}")
-    return {'message': 'Token has expired'}, 401
-
-@jwt.invalid_token_loader
-def invalid_token_callback(error):
-    log_jwt_operation('INVALID', details=f"Error: {str(error)}")
-    app_logger.error(f"🔑 Invalid JWT token: {error}")
-    return {'message': 'Invalid token', 'details': str(error)}, 401
-
-@jwt.unauthorized_loader
-def missing_token_callback(error):
-    log_jwt_operation('MISSING', details=f"Error: {str(error)}")
-    return {'message': 'Authorization token is required'}, 401
-
-# Initialize database and default data
-with app.app_context():
-    db.create_all()
-    
-    # Initialize default data
-    try:
-        init_account_types()
-        init_default_categories()
-        init_investment_types()
-        print("Default data initialized successfully")
-    except Exception as e:
-        print(f"Error initializing default data: {e}")
+def register_jwt_handlers(jwt):
+    @jwt.expired_token_loader
+    def expired_token_callback(jwt_header, jwt_payload):
+        log_jwt_operation('EXPIRED', details=f"User ID: {jwt_payload.get('sub', 'unknown')}")
+        return {'message': 'Token has expired'}, 401
+
+    @jwt.invalid_token_loader
+    def invalid_token_callback(error):
+        log_jwt_operation('INVALID', details=f"Error: {str(error)}")
+        app_logger.error(f"🔑 Invalid JWT token: {error}")
+        return {'message': 'Invalid token', 'details': str(error)}, 401
+
+    @jwt.token_in_blocklist_loader
+    def check_if_token_revoked(jwt_header, jwt_payload):
+        return is_token_revoked(jwt_payload)
+
+    @jwt.revoked_token_loader
+    def revoked_token_callback(jwt_header, jwt_payload):
+        log_jwt_operation('REVOKED', details=f"User ID: {jwt_payload.get('sub', 'unknown')}")
+        return {'message': 'Token has been revoked'}, 401
+
+    @jwt.unauthorized_loader
+    def missing_token_callback(error):
+        log_jwt_operation('MISSING', details=f"Error: {str(error)}")
+        return {'message': 'Authorization token is required'}, 401
 
-@app.route('/', defaults={'path': ''})
-@app.route('/<path:path>')
 def serve(path):
-    static_folder_path = app.static_folder
+    static_folder_path = current_app.static_folder
     if static_folder_path is None:
         return "Static folder not configured", 404
 
@@ -129,7 +96,6 @@ def serve(path):
         else:
             return "index.html not found", 404
 
-@app.route('/api/health')
 def health_check():
     """Health check endpoint that verifies API and database connectivity"""
     health_status = {
@@ -139,9 +105,13 @@ def health_check():
         'checks': {
             'api': 'ok',
             'database': 'unknown'
-        }
+        },
+        'password_hasher': get_password_hasher().stats(),
+        'db_pool': pool_stats(db.engine)
     }
-    
+    if REPLICA_BIND in db.engines:
+        health_status['db_replica'] = {**pool_stats(db.engines[REPLICA_BIND]), **get_replica_router().stats()}
+
     # Check database connectivity
     try:
         # Execute a simple query to verify database connection
@@ -153,10 +123,109 @@ def health_check():
         health_status['error'] = str(e)
         app_logger.error(f"Database health check failed: {str(e)}")
         return health_status, 503
-    
+
     return health_status, 200
 
+def create_app(config=None):
+    """Build the app without touching the database.
+
+    Schema and seed data come from ``flask --app src.main bootstrap``, run
+    once per deployment instead of in every worker. ``config`` overrides
+    the environment settings.
+    """
+    # Setup logging first
+    setup_logger()
+
+    app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
+
+    # Configuration from environment variables
+    app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key-change-in-production')
+    app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'jwt-secret-string-change-in-production')
+    app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(seconds=int(os.getenv('JWT_ACCESS_TOKEN_EXPIRES', '3600')))
+    app.config['JWT_REFRESH_TOKEN_EXPIRES'] = timedelta(seconds=int(os.getenv('JWT_REFRESH_TOKEN_EXPIRES', '2592000')))
+
+    # Database configuration
+    default_db_path = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', default_db_path)
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Purge expired sessions in the background (SESSION_SWEEP_INTERVAL=0 disables it)
+    app.config['SESSION_SWEEP_INTERVAL'] = int(os.getenv('SESSION_SWEEP_INTERVAL', '3600'))
+    app.config.update(config or {})
+    # Pool sized to gunicorn threads (DB_POOL_*), timed checkouts, SQLite busy timeout
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config['SQLALCHEMY_DATABASE_URI']))
+    # Optional read replica for GET requests
+    if replica_url() and REPLICA_BIND not in app.config.get('SQLALCHEMY_BINDS', {}):
+        app.config.setdefault('SQLALCHEMY_BINDS', {})[REPLICA_BIND] = {'url': replica_url(), **engine_options(replica_url())}
+
+    # Initialize extensions
+    db.init_app(app)
+    init_engine(app, db)
+    jwt = CachingJWTManager(app)
+    register_jwt_handlers(jwt)
+    # CORS Configuration
+    if os.getenv('FLASK_ENV') == 'development':
+        # For development, allow any origin on ports 3000 and 5100
+        CORS(app,
+             origins="*",  # Allow all origins in development
+             supports_credentials=True,
+             allow_headers=["Content-Type", "Authorization", "X-Requested-With"],
+             methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"])
+    else:
+        # For production with nginx proxy, no CORS needed (same origin)
+        # CORS is disabled since nginx proxy serves both frontend and backend from same origin
+        pass
+
+    # Register blueprints and the app-level routes
+    register_blueprints(app)
+    app.add_url_rule('/', 'serve', serve, defaults={'path': ''})
+    app.add_url_rule('/<path:path>', 'serve', serve)
+    app.add_url_rule('/api/health', 'health_check', health_check)
+    register_commands(app)
+
+    # Registered first so it runs after every other after_request hook
+    init_compression(app)
+
+    # Correlation ids and tracing first so every later hook runs inside the request trace
+    init_tracing(app)
+
+    # Per-request SQL headers, slow-query log, and metrics at /metrics (Prometheus text format)
+    init_query_tracking(app)
+    init_replica_routing(app)
+    init_slow_query_log()
+    init_profiler(app)
+    init_metrics(app)
+
+    # Request/Response logging hooks
+    @app.before_request
+    def before_request():
+        with start_span('log.request'):
+            log_request_info()
+
+    @app.after_request
+    def after_request(response):
+        with start_span('log.response'):
+            return log_response_info(response)
+
+    if app.config['SESSION_SWEEP_INTERVAL'] > 0:
+        app.extensions['session_sweeper'] = SessionSweeper(app, interval=app.config['SESSION_SWEEP_INTERVAL']).start()
+
+    return app
+
+_app = None
+
+def __getattr__(name):
+    # ``src.main:app`` (gunicorn, flask --app, tests) builds the app on first use
+    global _app
+    if name == 'app':
+        if _app is None:
+            _app = create_app()
+        return _app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 if __name__ == '__main__':
+    app = create_app()
+    # The development server bootstraps its own database
+    with app.app_context():
+        bootstrap_database()
     port = int(os.environ.get('PORT', 5001))
     app.run(host='0.0.0.0', port=port, debug=True)
-
@@ -19,6 +19,7 @@ class Investment(db.Model):
     purchase_price = db.Column(db.Float)
     current_price = db.Column(db.Float)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 class InvestmentTransaction(db.Model):
     __tablename__ = 'investment_transactions'
@@ -32,6 +33,7 @@ class InvestmentTransaction(db.Model):
 
 class PriceHistory(db.Model):
     __tablename__ = 'price_history'
+    __table_args__ = (db.Index('ix_price_history_investment_recorded', 'investment_id', 'recorded_at'),)
     
     id = db.Column(db.Integer, primary_key=True)
     investment_id = db.Column(db.Integer, db.ForeignKey('investments.id'), nullable=False)
@@ -46,5 +48,71 @@ class Dividend(db.Model):
     amount = db.Column(db.Float, nullable=False)
     payment_date = db.Column(db.DateTime, default=datetime.utcnow)
 
+class TaxLot(db.Model):
+    """An open lot left after replaying trades with a given matching method"""
+    __tablename__ = 'tax_lots'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    investment_id = db.Column(db.Integer, db.ForeignKey('investments.id'), nullable=False, index=True)
+    method = db.Column(db.String(10), nullable=False)
+    sequence = db.Column(db.Integer, nullable=False)
+    transaction_id = db.Column(db.Integer, db.ForeignKey('investment_transactions.id'))
+    acquired_at = db.Column(db.DateTime)
+    quantity = db.Column(db.Float, nullable=False)
+    cost_per_unit = db.Column(db.Float, nullable=False)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'investment_id': self.investment_id,
+            'method': self.method,
+            'transaction_id': self.transaction_id,
+            'acquired_at': self.acquired_at.isoformat() if self.acquired_at else None,
+            'quantity': self.quantity,
+            'cost_per_unit': self.cost_per_unit,
+            'cost_basis': self.quantity * self.cost_per_unit
+        }
+
+class LotState(db.Model):
+    """Replay checkpoint so new trades only process the delta"""
+    __tablename__ = 'lot_states'
+    __table_args__ = (db.UniqueConstraint('investment_id', 'method', name='uq_lot_state_investment_method'),)
+    
+    id = db.Column(db.Integer, primary_key=True)
+    investment_id = db.Column(db.Integer, db.ForeignKey('investments.id'), nullable=False)
+    method = db.Column(db.String(10), nullable=False)
+    last_transaction_id = db.Column(db.Integer, default=0)
+    last_transaction_date = db.Column(db.DateTime)
+    processed_count = db.Column(db.Integer, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class RealizedGain(db.Model):
+    """One sell matched against one lot"""
+    __tablename__ = 'realized_gains'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    investment_id = db.Column(db.Integer, db.ForeignKey('investments.id'), nullable=False, index=True)
+    method = db.Column(db.String(10), nullable=False)
+    sell_transaction_id = db.Column(db.Integer, db.ForeignKey('investment_transactions.id'), nullable=False)
+    lot_transaction_id = db.Column(db.Integer, db.ForeignKey('investment_transactions.id'))
+    acquired_at = db.Column(db.DateTime)
+    sold_at = db.Column(db.DateTime)
+    quantity = db.Column(db.Float, nullable=False)
+    proceeds = db.Column(db.Float, nullable=False)
+    cost_basis = db.Column(db.Float, nullable=False)
+    gain = db.Column(db.Float, nullable=False)
+
 def init_investment_types():
-    pass
\ No newline at end of file
+    """Initialize default investment types if they don't exist"""
+    default_types = ['Stock', 'ETF', 'Mutual Fund', 'Bond', 'REIT', 'Crypto', 'Cash', 'Other']
+    
+    for name in default_types:
+        existing = InvestmentType.query.filter_by(name=name).first()
+        if not existing:
+            db.session.add(InvestmentType(name=name))
+    
+    try:
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error initializing investment types: {e}")
@@ -1,9 +1,12 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
-import bcrypt
 import json
 
-db = SQLAlchemy()
+from ..utils.passwords import get_password_hasher
+from ..utils.db_routing import RoutingSession
+
+# GET requests may read from the replica bind (see utils/db_routing.py)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -22,10 +25,14 @@ class User(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     def set_password(self, password):
-        self.password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        self.password_hash = get_password_hasher().hash(password)
     
     def check_password(self, password):
-        return bcrypt.checkpw(password.encode('utf-8'), self.password_hash.encode('utf-8'))
+        return get_password_hasher().verify(password, self.password_hash)
+    
+    def password_needs_rehash(self):
+        """True when the stored hash was made with a different cost factor"""
+        return get_password_hasher().needs_rehash(self.password_hash)
     
     def to_dict(self, include_sensitive=False):
         data = {
@@ -74,12 +81,16 @@ class UserRelationship(db.Model):
 
 class UserSession(db.Model):
     __tablename__ = 'user_sessions'
+    __table_args__ = (
+        db.Index('ix_user_sessions_user_active', 'user_id', 'is_active'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    token_hash = db.Column(db.String(100))
-    refresh_token_hash = db.Column(db.String(100))
-    expires_at = db.Column(db.DateTime)
+    # SHA-256 hex digests of the access and refresh token JTIs
+    token_hash = db.Column(db.String(100), index=True)
+    refresh_token_hash = db.Column(db.String(100), index=True)
+    expires_at = db.Column(db.DateTime, index=True)
     ip_address = db.Column(db.String(45))
     user_agent = db.Column(db.String(255))
     is_active = db.Column(db.Boolean, default=True)
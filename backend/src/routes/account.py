@@ -1,7 +1,9 @@
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from ..models.account import Account, AccountType, AccountBalanceHistory, db
+from ..serializers import ACCOUNT, ACCOUNT_TYPE, BALANCE_HISTORY
 from ..utils.logger import app_logger
+from ..utils.serialization import list_items, requested_fields, respond
 
 account_bp = Blueprint('account', __name__)
 logger = app_logger
@@ -13,26 +15,21 @@ def get_accounts():
         user_id = get_jwt_identity()
         logger.info(f"Getting accounts for user {user_id}")
         
-        accounts = Account.query.filter_by(user_id=int(user_id), is_active=True).all()
-        
-        account_data = []
-        for account in accounts:
-            account_data.append({
-                'id': account.id,
-                'name': account.name,
-                'account_type_id': account.account_type_id,
-                'balance': account.balance,
-                'currency': account.currency,
-                'is_active': account.is_active,
-                'created_at': account.created_at.isoformat() if account.created_at else None
-            })
-        
-        logger.info(f"Found {len(account_data)} accounts for user {user_id}")
-        return jsonify({
+        fields = requested_fields(ACCOUNT)
+        accounts = ACCOUNT.load_only(
+            Account.query.filter_by(user_id=int(user_id), is_active=True), fields
+        ).all()
+        
+        account_data = list_items(ACCOUNT, accounts, fields)
+        
+        logger.info(f"Found {len(accounts)} accounts for user {user_id}")
+        return respond({
             'message': 'Accounts retrieved successfully',
             'accounts': account_data
-        }), 200
+        })
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error retrieving accounts for user {user_id}: {str(e)}")
         return jsonify({'error': 'Failed to retrieve accounts'}), 500
@@ -82,15 +79,7 @@ def create_account():
         
         return jsonify({
             'message': 'Account created successfully',
-            'account': {
-                'id': account.id,
-                'name': account.name,
-                'account_type_id': account.account_type_id,
-                'balance': account.balance,
-                'currency': account.currency,
-                'is_active': account.is_active,
-                'created_at': account.created_at.isoformat()
-            }
+            'account': ACCOUNT.dump(account)
         }), 201
         
     except ValueError as e:
@@ -106,29 +95,24 @@ def create_account():
 def get_account(account_id):
     try:
         user_id = get_jwt_identity()
+        fields = requested_fields(ACCOUNT)
         
-        account = Account.query.filter_by(
+        account = ACCOUNT.load_only(Account.query.filter_by(
             id=account_id, 
             user_id=int(user_id), 
             is_active=True
-        ).first()
+        ), fields).first()
         
         if not account:
             return jsonify({'error': 'Account not found'}), 404
         
         return jsonify({
             'message': 'Account retrieved successfully',
-            'account': {
-                'id': account.id,
-                'name': account.name,
-                'account_type_id': account.account_type_id,
-                'balance': account.balance,
-                'currency': account.currency,
-                'is_active': account.is_active,
-                'created_at': account.created_at.isoformat() if account.created_at else None
-            }
+            'account': ACCOUNT.dump(account, fields)
         }), 200
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error retrieving account {account_id} for user {user_id}: {str(e)}")
         return jsonify({'error': 'Failed to retrieve account'}), 500
@@ -185,15 +169,7 @@ def update_account(account_id):
         
         return jsonify({
             'message': 'Account updated successfully',
-            'account': {
-                'id': account.id,
-                'name': account.name,
-                'account_type_id': account.account_type_id,
-                'balance': account.balance,
-                'currency': account.currency,
-                'is_active': account.is_active,
-                'created_at': account.created_at.isoformat() if account.created_at else None
-            }
+            'account': ACCOUNT.dump(account)
         }), 200
         
     except ValueError as e:
@@ -240,19 +216,15 @@ def get_account_types():
     try:
         account_types = AccountType.query.all()
         
-        types_data = []
-        for account_type in account_types:
-            types_data.append({
-                'id': account_type.id,
-                'name': account_type.name,
-                'description': account_type.description
-            })
+        types_data = list_items(ACCOUNT_TYPE, account_types)
         
-        return jsonify({
+        return respond({
             'message': 'Account types retrieved successfully',
             'account_types': types_data
-        }), 200
+        })
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error retrieving account types: {str(e)}")
         return jsonify({'error': 'Failed to retrieve account types'}), 500
@@ -277,19 +249,15 @@ def get_account_balance_history(account_id):
             account_id=account_id
         ).order_by(AccountBalanceHistory.recorded_at.desc()).limit(100).all()
         
-        history_data = []
-        for record in history:
-            history_data.append({
-                'id': record.id,
-                'balance': record.balance,
-                'recorded_at': record.recorded_at.isoformat() if record.recorded_at else None
-            })
+        history_data = list_items(BALANCE_HISTORY, history)
         
-        return jsonify({
+        return respond({
             'message': 'Balance history retrieved successfully',
             'balance_history': history_data
-        }), 200
+        })
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error retrieving balance history for account {account_id}: {str(e)}")
         return jsonify({'error': 'Failed to retrieve balance history'}), 500
\ No newline at end of file
@@ -0,0 +1,85 @@
+import functools
+import os
+
+from flask import Blueprint, jsonify, request, send_from_directory
+from flask_jwt_extended import jwt_required, get_jwt_identity
+
+from ..utils.auth_cache import get_cached_user
+from ..utils.logger import api_logger as logger
+from ..utils.profiler import get_profiler, profile_dir, profiler_enabled, start_profiler
+
+admin_bp = Blueprint('admin', __name__)
+
+def admin_emails():
+    return {email.strip().lower() for email in os.getenv('ADMIN_EMAILS', '').split(',') if email.strip()}
+
+def admin_required(view):
+    """JWT user whose email is listed in ADMIN_EMAILS"""
+    @functools.wraps(view)
+    @jwt_required()
+    def wrapper(*args, **kwargs):
+        user = get_cached_user(get_jwt_identity())
+        if user is None or not user.is_active or user.email.lower() not in admin_emails():
+            return jsonify({'error': 'Admin access required'}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+def profiler_required(view):
+    """Hide the profiler endpoints unless PROFILER_ENABLED is set"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not profiler_enabled():
+            return jsonify({'error': 'Not found'}), 404
+        return view(*args, **kwargs)
+    return wrapper
+
+@admin_bp.route('/admin/profiler', methods=['GET'])
+@profiler_required
+@admin_required
+def profiler_status():
+    """Status of this worker's profile and the profiles written so far"""
+    profiler = get_profiler()
+    files = sorted(name for name in os.listdir(profile_dir()) if name.startswith('profile-'))
+    return jsonify({
+        'profile': profiler.status() if profiler else None,
+        'files': files
+    }), 200
+
+@admin_bp.route('/admin/profiler', methods=['POST'])
+@profiler_required
+@admin_required
+def start_profile():
+    """Sample this worker for ``seconds``, optionally only requests matching ``route``"""
+    try:
+        data = request.get_json(silent=True) or {}
+        rate = float(data.get('rate_hz', 100))
+        if rate <= 0:
+            raise ValueError('rate_hz must be positive')
+        profiler = start_profiler(
+            interval=1.0 / rate,
+            duration=float(data.get('seconds', 30)),
+            route=data.get('route')
+        )
+        logger.warning(f"Profiler started by user {get_jwt_identity()}: {profiler.status()}")
+        return jsonify({'profile': profiler.status()}), 202
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+
+@admin_bp.route('/admin/profiler', methods=['DELETE'])
+@profiler_required
+@admin_required
+def stop_profile():
+    """Stop the running profile early; its files are still written"""
+    profiler = get_profiler()
+    if profiler is None or not profiler.running:
+        return jsonify({'error': 'No profile running in this worker'}), 404
+    profiler.stop()
+    return jsonify({'profile': profiler.status()}), 200
+
+@admin_bp.route('/admin/profiler/files/<path:filename>', methods=['GET'])
+@profiler_required
+@admin_required
+def download_profile(filename):
+    if not filename.startswith('profile-'):
+        return jsonify({'error': 'Not found'}), 404
+    return send_from_directory(profile_dir(), filename, as_attachment=True)
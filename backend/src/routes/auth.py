@@ -1,13 +1,25 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, get_jwt_identity, get_jwt
-from datetime import datetime, timedelta
+from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
+from datetime import datetime
 import re
 
-from src.models.user import db, User, UserRelationship, UserSession
+from src.models.user import db, User, UserRelationship
 from src.utils.logger import log_auth_event, log_jwt_operation, log_db_operation, auth_logger
+from src.utils.passwords import PasswordHasherBusy
+from src.utils.rate_limit import rate_limit
+from src.services.sessions import (
+    create_session, issue_access_token, issue_tokens, rotate_access_token, revoke_user_sessions
+)
+from src.utils.auth_cache import get_cached_user
 
 auth_bp = Blueprint('auth', __name__)
 
+def hasher_busy_response():
+    """503 returned when the password hashing queue is saturated"""
+    response = jsonify({'error': 'Server is busy, please try again shortly'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
 def validate_email(email):
     """Validate email format"""
     pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
@@ -26,6 +38,7 @@ def validate_password(password):
     return True, "Password is valid"
 
 @auth_bp.route('/register', methods=['POST'])
+@rate_limit('register')
 def register():
     """Register a new user"""
     try:
@@ -71,19 +84,11 @@ def register():
         db.session.commit()
         
         # Create access and refresh tokens
-        access_token = create_access_token(identity=user.id)
-        refresh_token = create_refresh_token(identity=user.id)
+        access_token, refresh_token = issue_tokens(user.id)
         
         # Create session record
-        session = UserSession(
-            user_id=user.id,
-            token_hash=access_token[:50],  # Store partial hash for identification
-            refresh_token_hash=refresh_token[:50],
-            expires_at=datetime.utcnow() + timedelta(hours=1),
-            ip_address=request.remote_addr,
-            user_agent=request.headers.get('User-Agent', '')
-        )
-        db.session.add(session)
+        create_session(user.id, access_token, refresh_token,
+                       request.remote_addr, request.headers.get('User-Agent', ''))
         db.session.commit()
         
         return jsonify({
@@ -93,11 +98,15 @@ def register():
             'refresh_token': refresh_token
         }), 201
         
+    except PasswordHasherBusy:
+        db.session.rollback()
+        return hasher_busy_response()
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': 'Registration failed', 'details': str(e)}), 500
 
 @auth_bp.route('/login', methods=['POST'])
+@rate_limit('login')
 def login():
     """Login user"""
     try:
@@ -130,27 +139,24 @@ def login():
         
         auth_logger.info(f"✅ User authenticated: {email} (ID: {user.id})")
         
+        # Upgrade hashes made with an old cost factor while the plaintext is at hand
+        if user.password_needs_rehash():
+            user.set_password(password)
+            auth_logger.info(f"🔁 Rehashed password for user {user.id}")
+        
         # Update last login
         user.last_login = datetime.utcnow()
         
         # Create access and refresh tokens
         auth_logger.info(f"🔑 Creating tokens for user {user.id}")
-        access_token = create_access_token(identity=str(user.id))
-        refresh_token = create_refresh_token(identity=str(user.id))
+        access_token, refresh_token = issue_tokens(user.id)
         
         log_jwt_operation('CREATED', user_id=user.id, token_type='access', details=f"Token: {access_token[:20]}...")
         log_jwt_operation('CREATED', user_id=user.id, token_type='refresh')
         
         # Create session record
-        session = UserSession(
-            user_id=user.id,
-            token_hash=access_token[:50],
-            refresh_token_hash=refresh_token[:50],
-            expires_at=datetime.utcnow() + timedelta(hours=1),
-            ip_address=request.remote_addr,
-            user_agent=request.headers.get('User-Agent', '')
-        )
-        db.session.add(session)
+        session = create_session(user.id, access_token, refresh_token,
+                                 request.remote_addr, request.headers.get('User-Agent', ''))
         db.session.commit()
         
         log_auth_event('LOGIN', user_email=email, user_id=user.id, success=True, details="Login successful")
@@ -165,6 +171,10 @@ def login():
             'refresh_token': refresh_token
         }), 200
         
+    except PasswordHasherBusy:
+        db.session.rollback()
+        auth_logger.warning("⏳ Login rejected: password hashing queue is full")
+        return hasher_busy_response()
     except Exception as e:
         db.session.rollback()
         auth_logger.error(f"💥 Login failed with exception: {str(e)}", exc_info=True)
@@ -176,24 +186,17 @@ def refresh():
     """Refresh access token"""
     try:
         current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
+        user = get_cached_user(current_user_id)
         
         if not user or not user.is_active:
             return jsonify({'error': 'User not found or inactive'}), 404
         
         # Create new access token
-        access_token = create_access_token(identity=str(user.id))
-        
-        # Update session
-        session = UserSession.query.filter_by(
-            user_id=user.id,
-            is_active=True
-        ).order_by(UserSession.created_at.desc()).first()
-        
-        if session:
-            session.token_hash = access_token[:50]
-            session.expires_at = datetime.utcnow() + timedelta(hours=1)
-            session.last_used = datetime.utcnow()
+        refresh_jti = get_jwt()['jti']
+        access_token = issue_access_token(user.id, refresh_jti)
+        
+        # Update the session this refresh token belongs to
+        if rotate_access_token(refresh_jti, access_token):
             db.session.commit()
         
         return jsonify({
@@ -210,13 +213,9 @@ def logout():
     """Logout user"""
     try:
         current_user_id = get_jwt_identity()
-        jti = get_jwt()['jti']
         
         # Deactivate user sessions
-        sessions = UserSession.query.filter_by(user_id=current_user_id, is_active=True).all()
-        for session in sessions:
-            session.is_active = False
-        
+        revoke_user_sessions(current_user_id)
         db.session.commit()
         
         return jsonify({'message': 'Logout successful'}), 200
@@ -245,8 +244,8 @@ def get_current_user():
             auth_logger.error(f"❌ Invalid user ID format: {current_user_id}")
             return jsonify({'error': 'Invalid token - bad user ID format'}), 401
         
-        auth_logger.info(f"🔍 Looking up user in database: ID {user_id}")
-        user = User.query.get(user_id)
+        auth_logger.info(f"🔍 Looking up user: ID {user_id}")
+        user = get_cached_user(user_id)
         
         if not user:
             auth_logger.error(f"❌ User {current_user_id} not found in database")
@@ -266,6 +265,7 @@ def get_current_user():
 
 @auth_bp.route('/change-password', methods=['POST'])
 @jwt_required()
+@rate_limit('change_password')
 def change_password():
     """Change user password"""
     try:
@@ -296,14 +296,14 @@ def change_password():
         user.updated_at = datetime.utcnow()
         
         # Deactivate all existing sessions
-        sessions = UserSession.query.filter_by(user_id=user.id, is_active=True).all()
-        for session in sessions:
-            session.is_active = False
-        
+        revoke_user_sessions(user.id)
         db.session.commit()
         
         return jsonify({'message': 'Password changed successfully'}), 200
         
+    except PasswordHasherBusy:
+        db.session.rollback()
+        return hasher_busy_response()
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': 'Password change failed', 'details': str(e)}), 500
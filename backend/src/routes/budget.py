@@ -8,9 +8,26 @@ from ..models.user import db
 from ..models.budget import Budget, BudgetCategory, BudgetGoal
 from ..models.transaction import Transaction, Category
 from ..utils.logger import api_logger as logger
+from ..utils.tracing import traced
 
 budget_bp = Blueprint('budget', __name__)
 
+def _with_categories(query):
+    """Load budget categories and their Category rows with the budget itself"""
+    return query.options(joinedload(Budget.categories).joinedload(BudgetCategory.category))
+
+@traced('budget.spent_by_category')
+def _spent_by_category(user_id, category_ids, *conditions):
+    """{category_id: summed amount} for one user, in a single grouped query"""
+    if not category_ids:
+        return {}
+    rows = db.session.query(Transaction.category_id, func.sum(Transaction.amount)).filter(
+        Transaction.user_id == user_id,
+        Transaction.category_id.in_(category_ids),
+        *conditions
+    ).group_by(Transaction.category_id).all()
+    return {category_id: total for category_id, total in rows}
+
 @budget_bp.route('/budgets', methods=['GET'])
 @jwt_required()
 def get_budgets():
@@ -53,7 +70,7 @@ def get_current_budget():
         current_date = date.today()
         
         # Find active monthly budget for current month
-        budget = Budget.query.filter(
+        budget = _with_categories(Budget.query).filter(
             and_(
                 Budget.user_id == user_id,
                 Budget.type == 'monthly',
@@ -73,19 +90,16 @@ def get_current_budget():
         # Load categories with spending
         budget_data = budget.to_dict()
         budget_data['categories'] = []
+        spent_by_category = _spent_by_category(
+            user_id,
+            [bc.category_id for bc in budget.categories],
+            extract('year', Transaction.transaction_date) == current_date.year,
+            extract('month', Transaction.transaction_date) == current_date.month
+        )
         
         for bc in budget.categories:
             category_data = bc.to_dict()
-            
-            # Calculate spent amount for this category
-            spent = db.session.query(func.sum(Transaction.amount)).filter(
-                and_(
-                    Transaction.user_id == user_id,
-                    Transaction.category_id == bc.category_id,
-                    extract('year', Transaction.transaction_date) == current_date.year,
-                    extract('month', Transaction.transaction_date) == current_date.month
-                )
-            ).scalar() or 0
+            spent = spent_by_category.get(bc.category_id) or 0
             
             # Convert positive expenses to negative for calculation
             if category_data['category'] and category_data['category']['type'] == 'expense':
@@ -116,7 +130,7 @@ def get_budget(budget_id):
     try:
         user_id = get_jwt_identity()
         
-        budget = Budget.query.filter_by(id=budget_id, user_id=user_id).first()
+        budget = _with_categories(Budget.query).filter_by(id=budget_id, user_id=user_id).first()
         if not budget:
             return jsonify({
                 'success': False,
@@ -128,21 +142,15 @@ def get_budget(budget_id):
         if budget.type == 'monthly':
             # Include categories with spending
             budget_data['categories'] = []
+            spent_by_category = _spent_by_category(
+                user_id,
+                [bc.category_id for bc in budget.categories],
+                Transaction.transaction_date >= budget.start_date,
+                Transaction.transaction_date <= (budget.end_date or date.today())
+            )
             for bc in budget.categories:
                 category_data = bc.to_dict()
-                
-                # Calculate spent amount
-                start_date = budget.start_date
-                end_date = budget.end_date or date.today()
-                
-                spent = db.session.query(func.sum(Transaction.amount)).filter(
-                    and_(
-                        Transaction.user_id == user_id,
-                        Transaction.category_id == bc.category_id,
-                        Transaction.transaction_date >= start_date,
-                        Transaction.transaction_date <= end_date
-                    )
-                ).scalar() or 0
+                spent = spent_by_category.get(bc.category_id) or 0
                 
                 if category_data['category'] and category_data['category']['type'] == 'expense':
                     spent = abs(spent)
@@ -345,7 +353,7 @@ def get_budget_summary(budget_id):
     try:
         user_id = get_jwt_identity()
         
-        budget = Budget.query.filter_by(id=budget_id, user_id=user_id).first()
+        budget = _with_categories(Budget.query).filter_by(id=budget_id, user_id=user_id).first()
         if not budget:
             return jsonify({
                 'success': False,
@@ -361,19 +369,14 @@ def get_budget_summary(budget_id):
         }
         
         if budget.type == 'monthly':
+            spent_by_category = _spent_by_category(
+                user_id,
+                [bc.category_id for bc in budget.categories],
+                Transaction.transaction_date >= budget.start_date,
+                Transaction.transaction_date <= (budget.end_date or date.today())
+            )
             for bc in budget.categories:
-                # Calculate spent amount
-                start_date = budget.start_date
-                end_date = budget.end_date or date.today()
-                
-                spent = db.session.query(func.sum(Transaction.amount)).filter(
-                    and_(
-                        Transaction.user_id == user_id,
-                        Transaction.category_id == bc.category_id,
-                        Transaction.transaction_date >= start_date,
-                        Transaction.transaction_date <= end_date
-                    )
-                ).scalar() or 0
+                spent = spent_by_category.get(bc.category_id) or 0
                 
                 if bc.category and bc.category.type == 'expense':
                     spent = abs(spent)
@@ -1,12 +1,489 @@
-from flask import Blueprint, jsonify
-from flask_jwt_extended import jwt_required
+from flask import Blueprint, jsonify, request
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from datetime import datetime
+import io
+
+from ..models.user import db
+from ..models.investment import Investment, InvestmentType, InvestmentTransaction, Dividend
+from ..services.portfolio import value_portfolio, BUY_TYPES, SELL_TYPES
+from ..services.performance import get_performance
+from ..services.income import get_income
+from ..services.rebalance import rebalance
+from ..services.quotes import get_quote_client, refresh_prices, QuoteProviderError
+from ..services.price_history import query_prices, ingest_price_file, parse_timestamp
+from ..services.lots import (
+    sync_trade_lots, open_lots, realized_gains_report, LotMatchingError, LOT_METHODS, DEFAULT_LOT_METHOD
+)
+from ..utils.logger import app_logger
 
 investment_bp = Blueprint('investment', __name__)
+logger = app_logger
+
+def parse_datetime(value):
+    """Parse an ISO date/datetime string, defaulting to now"""
+    if not value:
+        return datetime.utcnow()
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).replace(tzinfo=None)
+
+def get_lot_method():
+    """Read and validate the ?method= cost basis parameter"""
+    method = request.args.get('method', DEFAULT_LOT_METHOD).lower()
+    if method not in LOT_METHODS:
+        raise ValueError(f"method must be one of {', '.join(LOT_METHODS)}")
+    return method
 
-@investment_bp.route('/investments')
+def transaction_to_dict(transaction):
+    return {
+        'id': transaction.id,
+        'investment_id': transaction.investment_id,
+        'type': transaction.type,
+        'quantity': transaction.quantity,
+        'price': transaction.price,
+        'transaction_date': transaction.transaction_date.isoformat() if transaction.transaction_date else None
+    }
+
+@investment_bp.route('/investments', methods=['GET'])
 @jwt_required()
 def get_investments():
-    return jsonify({
-        'message': 'Investments endpoint',
-        'investments': []
-    }), 200
\ No newline at end of file
+    try:
+        user_id = get_jwt_identity()
+        portfolio = value_portfolio(user_id)
+
+        return jsonify({
+            'message': 'Investments retrieved successfully',
+            'investments': portfolio.holdings()
+        }), 200
+
+    except Exception as e:
+        logger.error(f"Error retrieving investments: {str(e)}")
+        return jsonify({'error': 'Failed to retrieve investments'}), 500
+
+@investment_bp.route('/investments', methods=['POST'])
+@jwt_required()
+def create_investment():
+    try:
+        user_id = get_jwt_identity()
+        data = request.get_json()
+
+        if not data:
+            return jsonify({'error': 'No data provided'}), 400
+        if not data.get('name'):
+            return jsonify({'error': 'name is required'}), 400
+
+        investment_type_id = data.get('investment_type_id')
+        if investment_type_id is not None and not InvestmentType.query.get(investment_type_id):
+            return jsonify({'error': 'Invalid investment type'}), 400
+
+        quantity = float(data.get('quantity') or 0.0)
+        purchase_price = float(data['purchase_price']) if data.get('purchase_price') is not None else None
+
+        investment = Investment(
+            user_id=int(user_id),
+            investment_type_id=investment_type_id,
+            name=data['name'].strip(),
+            symbol=data['symbol'].strip().upper() if data.get('symbol') else None,
+            quantity=quantity,
+            purchase_price=purchase_price,
+            current_price=float(data['current_price']) if data.get('current_price') is not None else purchase_price
+        )
+        db.session.add(investment)
+        db.session.flush()
+
+        # An opening position is recorded as a buy so valuation has a trade history
+        if quantity > 0 and purchase_price is not None:
+            db.session.add(InvestmentTransaction(
+                investment_id=investment.id,
+                type='buy',
+                quantity=quantity,
+                price=purchase_price,
+                transaction_date=parse_datetime(data.get('purchase_date'))
+            ))
+            db.session.flush()
+            sync_trade_lots(user_id, investment.id)
+
+        db.session.commit()
+        logger.info(f"Created investment {investment.id} for user {user_id}")
+
+        return jsonify({
+            'message': 'Investment created successfully',
+            'investment': {
+                'id': investment.id,
+                'name': investment.name,
+                'symbol': investment.symbol,
+                'investment_type_id': investment.investment_type_id,
+                'quantity': investment.quantity,
+                'purchase_price': investment.purchase_price,
+                'current_price': investment.current_price,
+                'created_at': investment.created_at.isoformat() if investment.created_at else None
+            }
+        }), 201
+
+    except ValueError as e:
+        logger.error(f"Validation error creating investment: {str(e)}")
+        db.session.rollback()
+        return jsonify({'error': 'Invalid data format'}), 400
+    except Exception as e:
+        logger.error(f"Error creating investment: {str(e)}")
+        db.session.rollback()
+        return jsonify({'error': 'Failed to create investment'}), 500
+
+@investment_bp.route('/investments/portfolio', methods=['GET'])
+@jwt_required()
+def get_portfolio():
+    try:
+        user_id = get_jwt_identity()
+        portfolio = value_portfolio(user_id)
+
+        return jsonify({
+            'message': 'Portfolio retrieved successfully',
+            'summary': portfolio.summary(),
+            'holdings': portfolio.holdings(),
+            'allocation': portfolio.allocation()
+        }), 200
+
+    except Exception as e:
+        logger.error(f"Error valuing portfolio: {str(e)}")
+        return jsonify({'error': 'Failed to retrieve portfolio'}), 500
+
+@investment_bp.route('/investments/performance', methods=['GET'])
+@jwt_required()
+def get_portfolio_performance():
+    try:
+        user_id = get_jwt_identity()
+
+        return jsonify({
+            'message': 'Performance retrieved successfully',
+            **get_performance(user_id)
+        }), 200
+
+    except Exception as e:
+        logger.error(f"Error computing performance: {str(e)}")
+        return jsonify({'error': 'Failed to compute performance'}), 500
+
+@investment_bp.route('/investments/rebalance', methods=['POST'])
+@jwt_required()
+def rebalance_portfolio():
+    try:
+        user_id = get_jwt_identity()
+        data = request.get_json()
+
+        if not data:
+            return jsonify({'error': 'No data provided'}), 400
+
+        plan = rebalance(
+            user_id,
+            data.get('targets'),
+            group_by=data.get('group_by', 'type'),
+            mode=data.get('mode', 'full'),
+            cash=data.get('cash', 0.0)
+        )
+
+        return jsonify({
+            'message': 'Rebalance plan calculated successfully',
+            **plan
+        }), 200
+
+    except (TypeError, ValueError) as e:
+        logger.error(f"Validation error calculating rebalance: {str(e)}")
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error calculating rebalance: {str(e)}")
+        return jsonify({'error': 'Failed to calculate rebalance'}), 500
+
+@investment_bp.route('/investments/income', methods=['GET'])
+@jwt_required()
+def get_dividend_income():
+    try:
+        user_id = get_jwt_identity()
+        months = request.args.get('months', 12, type=int)
+        if months < 1 or months > 120:
+            return jsonify({'error': 'months must be between 1 and 120'}), 400
+
+        return jsonify({
+            'message': 'Dividend income retrieved successfully',
+            **get_income(user_id, months)
+        }), 200
+
+    except Exception as e:
+        logger.error(f"Error computing dividend income: {str(e)}")
+        return jsonify({'error': 'Failed to retrieve dividend income'}), 500
+
+@investment_bp.route('/investments/<int:investment_id>/dividends', methods=['POST'])
+@jwt_required()
+def create_dividend(investment_id):
+    try:
+        user_id = get_jwt_identity()
+        data = request.get_json()
+
+        if not data:
+            return jsonify({'error': 'No data provided'}), 400
+
+        investment = Investment.query.filter_by(id=investment_id, user_id=int(user_id)).first()
+        if not investment:
+            return jsonify({'error': 'Investment not found'}), 404
+
+        amount = float(data['amount'])
+        if amount <= 0:
+            return jsonify({'error': 'amount must be positive'}), 400
+
+        dividend = Dividend(
+            investment_id=investment.id,
+            amount=amount,
+            payment_date=parse_datetime(data.get('payment_date'))
+        )
+        db.session.add(dividend)
+        db.session.commit()
+
+        return jsonify({
+            'message': 'Dividend recorded successfully',
+            'dividend': {
+                'id': dividend.id,
+                'investment_id': dividend.investment_id,
+                'amount': dividend.amount,
+                'payment_date': dividend.payment_date.isoformat()
+            }
+        }), 201
+
+    except (KeyError, ValueError) as e:
+        db.session.rollback()
+        logger.error(f"Validation error recording dividend: {str(e)}")
+        return jsonify({'error': 'amount is required and must be a number'}), 400
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error recording dividend for investment {investment_id}: {str(e)}")
+        return jsonify({'error': 'Failed to record dividend'}), 500
+
+@investment_bp.route('/investments/<int:investment_id>/transactions', methods=['GET'])
+@jwt_required()
+def get_investment_transactions(investment_id):
+    try:
+        user_id = get_jwt_identity()
+
+        investment = Investment.query.filter_by(id=investment_id, user_id=int(user_id)).first()
+        if not investment:
+            return jsonify({'error': 'Investment not found'}), 404
+
+        transactions = InvestmentTransaction.query.filter_by(investment_id=investment_id).order_by(
+            InvestmentTransaction.transaction_date.desc()
+        ).all()
+
+        return jsonify({
+            'message': 'Investment transactions retrieved successfully',
+            'transactions': [transaction_to_dict(t) for t in transactions]
+        }), 200
+
+    except Exception as e:
+        logger.error(f"Error retrieving transactions for investment {investment_id}: {str(e)}")
+        return jsonify({'error': 'Failed to retrieve investment transactions'}), 500
+
+@investment_bp.route('/investments/<int:investment_id>/transactions', methods=['POST'])
+@jwt_required()
+def create_investment_transaction(investment_id):
+    try:
+        user_id = get_jwt_identity()
+        data = request.get_json()
+
+        if not data:
+            return jsonify({'error': 'No data provided'}), 400
+
+        investment = Investment.query.filter_by(id=investment_id, user_id=int(user_id)).first()
+        if not investment:
+            return jsonify({'error': 'Investment not found'}), 404
+
+        transaction_type = str(data.get('type', '')).lower()
+        if transaction_type not in BUY_TYPES + SELL_TYPES:
+            return jsonify({'error': 'type must be buy or sell'}), 400
+
+        quantity = float(data['quantity'])
+        price = float(data['price'])
+        if quantity <= 0 or price < 0:
+            return jsonify({'error': 'quantity must be positive and price non-negative'}), 400
+
+        held = investment.quantity or 0.0
+        if transaction_type in SELL_TYPES and quantity > held + 1e-9:
+            return jsonify({'error': 'Cannot sell more than the quantity held'}), 400
+
+        transaction = InvestmentTransaction(
+            investment_id=investment.id,
+            type=transaction_type,
+            quantity=quantity,
+            price=price,
+            transaction_date=parse_datetime(data.get('transaction_date'))
+        )
+        db.session.add(transaction)
+
+        # Keep the denormalized position on Investment in step with the trade log
+        if transaction_type in BUY_TYPES:
+            total_cost = held * (investment.purchase_price or 0.0) + quantity * price
+            investment.quantity = held + quantity
+            investment.purchase_price = total_cost / investment.quantity
+        else:
+            investment.quantity = held - quantity
+
+        # Only the new trade is matched against the persisted lots, in the same transaction
+        db.session.flush()
+        try:
+            sync_trade_lots(user_id, investment.id)
+        except LotMatchingError as e:
+            db.session.rollback()
+            logger.warning(f"Lot matching failed for investment {investment_id}: {str(e)}")
+            return jsonify({'error': str(e)}), 400
+
+        db.session.commit()
+        logger.info(f"Recorded {transaction_type} of {quantity} for investment {investment_id}")
+
+        return jsonify({
+            'message': 'Investment transaction recorded successfully',
+            'transaction': transaction_to_dict(transaction)
+        }), 201
+
+    except (KeyError, ValueError) as e:
+        logger.error(f"Validation error recording investment transaction: {str(e)}")
+        db.session.rollback()
+        return jsonify({'error': 'quantity and price are required numbers'}), 400
+    except Exception as e:
+        logger.error(f"Error recording transaction for investment {investment_id}: {str(e)}")
+        db.session.rollback()
+        return jsonify({'error': 'Failed to record investment transaction'}), 500
+
+@investment_bp.route('/investments/<int:investment_id>/lots', methods=['GET'])
+@jwt_required()
+def get_investment_lots(investment_id):
+    try:
+        user_id = get_jwt_identity()
+        method = get_lot_method()
+
+        investment = Investment.query.filter_by(id=investment_id, user_id=int(user_id)).first()
+        if not investment:
+            return jsonify({'error': 'Investment not found'}), 404
+
+        lots = open_lots(investment_id, method)
+
+        return jsonify({
+            'message': 'Tax lots retrieved successfully',
+            'method': method,
+            'lots': lots,
+            'quantity': sum(lot['quantity'] for lot in lots),
+            'cost_basis': sum(lot['cost_basis'] for lot in lots)
+        }), 200
+
+    except (ValueError, LotMatchingError) as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error retrieving lots for investment {investment_id}: {str(e)}")
+        return jsonify({'error': 'Failed to retrieve tax lots'}), 500
+
+@investment_bp.route('/investments/realized-gains', methods=['GET'])
+@jwt_required()
+def get_realized_gains():
+    try:
+        user_id = get_jwt_identity()
+        method = get_lot_method()
+        year = request.args.get('year', type=int)
+
+        report = realized_gains_report(user_id, method, year)
+
+        return jsonify({
+            'message': 'Realized gains retrieved successfully',
+            **report
+        }), 200
+
+    except (ValueError, LotMatchingError) as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error building realized gains report: {str(e)}")
+        return jsonify({'error': 'Failed to retrieve realized gains'}), 500
+
+@investment_bp.route('/investments/<int:investment_id>/prices', methods=['GET'])
+@jwt_required()
+def get_investment_prices(investment_id):
+    try:
+        user_id = get_jwt_identity()
+
+        investment = Investment.query.filter_by(id=investment_id, user_id=int(user_id)).first()
+        if not investment:
+            return jsonify({'error': 'Investment not found'}), 404
+
+        start = parse_timestamp(request.args['start']) if request.args.get('start') else None
+        end = parse_timestamp(request.args['end']) if request.args.get('end') else None
+        points = request.args.get('points', type=int)
+        if points is not None and points < 1:
+            return jsonify({'error': 'points must be positive'}), 400
+
+        return jsonify({
+            'message': 'Price history retrieved successfully',
+            'investment_id': investment_id,
+            'prices': query_prices(investment_id, start, end, points)
+        }), 200
+
+    except ValueError:
+        return jsonify({'error': 'Invalid date format. Use ISO 8601'}), 400
+    except Exception as e:
+        logger.error(f"Error retrieving prices for investment {investment_id}: {str(e)}")
+        return jsonify({'error': 'Failed to retrieve price history'}), 500
+
+@investment_bp.route('/investments/prices/import', methods=['POST'])
+@jwt_required()
+def import_prices():
+    try:
+        user_id = get_jwt_identity()
+
+        upload = request.files.get('file')
+        stream = upload.stream if upload else io.BytesIO(request.get_data())
+
+        result = ingest_price_file(user_id, stream)
+        logger.info(f"Imported prices for user {user_id}: {result['inserted']} inserted, {result['updated']} updated")
+
+        return jsonify({
+            'message': 'Prices imported successfully',
+            **result
+        }), 200
+
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error importing prices: {str(e)}")
+        return jsonify({'error': 'Failed to import prices'}), 500
+
+@investment_bp.route('/investments/prices/refresh', methods=['POST'])
+@jwt_required()
+def refresh_investment_prices():
+    try:
+        user_id = get_jwt_identity()
+
+        client = get_quote_client()
+        if client is None:
+            return jsonify({'error': 'No quote provider configured'}), 503
+
+        result = refresh_prices(client, user_id)
+
+        return jsonify({
+            'message': 'Prices refreshed successfully',
+            **result
+        }), 200
+
+    except QuoteProviderError as e:
+        db.session.rollback()
+        logger.error(f"Quote provider error: {str(e)}")
+        return jsonify({'error': 'Quote provider unavailable'}), 502
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error refreshing prices: {str(e)}")
+        return jsonify({'error': 'Failed to refresh prices'}), 500
+
+@investment_bp.route('/investment-types', methods=['GET'])
+@jwt_required()
+def get_investment_types():
+    try:
+        investment_types = InvestmentType.query.order_by(InvestmentType.name).all()
+
+        return jsonify({
+            'message': 'Investment types retrieved successfully',
+            'investment_types': [{'id': t.id, 'name': t.name} for t in investment_types]
+        }), 200
+
+    except Exception as e:
+        logger.error(f"Error retrieving investment types: {str(e)}")
+        return jsonify({'error': 'Failed to retrieve investment types'}), 500
@@ -3,46 +3,34 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from ..models.user import db
 from ..models.transaction import Transaction, Category, Transfer
 from ..models.account import Account
+from ..serializers import CATEGORY, TRANSACTION, TRANSACTION_DETAIL, TRANSACTION_SUMMARY
+from ..utils.serialization import list_items, requested_fields, respond
 from datetime import datetime
 
 transaction_bp = Blueprint('transaction', __name__)
 
+def _transactions_with_refs(user_id):
+    """Transactions of a user joined to their account and category in one query"""
+    return db.session.query(Transaction, Account, Category).outerjoin(
+        Account, Account.id == Transaction.account_id
+    ).outerjoin(
+        Category, Category.id == Transaction.category_id
+    ).filter(Transaction.user_id == user_id)
+
 @transaction_bp.route('/transactions', methods=['GET'])
 @jwt_required()
 def get_transactions():
     try:
         user_id = get_jwt_identity()
-        transactions = Transaction.query.filter_by(user_id=user_id).all()
-        
-        transactions_data = []
-        for transaction in transactions:
-            account = Account.query.get(transaction.account_id)
-            category = Category.query.get(transaction.category_id) if transaction.category_id else None
-            
-            transactions_data.append({
-                'id': transaction.id,
-                'account_id': transaction.account_id,
-                'account': {
-                    'id': account.id if account else None,
-                    'name': account.name if account else 'Unknown'
-                },
-                'category_id': transaction.category_id,
-                'category': {
-                    'id': category.id if category else None,
-                    'name': category.name if category else 'Uncategorized',
-                    'type': category.type if category else 'expense',
-                    'icon': category.icon if category else None
-                } if category else None,
-                'amount': transaction.amount,
-                'description': transaction.description,
-                'transaction_date': transaction.transaction_date.isoformat() if transaction.transaction_date else None,
-                'created_at': transaction.created_at.isoformat() if transaction.created_at else None
-            })
+        fields = requested_fields(TRANSACTION)
+        rows = TRANSACTION.load_only(_transactions_with_refs(user_id), fields).all()
         
-        return jsonify({
+        return respond({
             'success': True,
-            'transactions': transactions_data
-        }), 200
+            'transactions': list_items(TRANSACTION, rows, fields)
+        })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -83,17 +71,7 @@ def create_transaction():
         
         return jsonify({
             'success': True,
-            'transaction': {
-                'id': transaction.id,
-                'account_id': transaction.account_id,
-                'account_name': account.name if account else 'Unknown',
-                'category_id': transaction.category_id,
-                'category_name': category.name if category else 'Uncategorized',
-                'amount': transaction.amount,
-                'description': transaction.description,
-                'transaction_date': transaction.transaction_date.isoformat(),
-                'created_at': transaction.created_at.isoformat()
-            }
+            'transaction': TRANSACTION.dump((transaction, account, category), TRANSACTION_DETAIL)
         }), 201
     except Exception as e:
         db.session.rollback()
@@ -104,28 +82,20 @@ def create_transaction():
 def get_transaction(transaction_id):
     try:
         user_id = get_jwt_identity()
-        transaction = Transaction.query.filter_by(id=transaction_id, user_id=user_id).first()
+        fields = requested_fields(TRANSACTION) or TRANSACTION_DETAIL
+        row = TRANSACTION.load_only(_transactions_with_refs(user_id), fields).filter(
+            Transaction.id == transaction_id
+        ).first()
         
-        if not transaction:
+        if not row:
             return jsonify({'error': 'Transaction not found'}), 404
         
-        account = Account.query.get(transaction.account_id)
-        category = Category.query.get(transaction.category_id) if transaction.category_id else None
-        
         return jsonify({
             'success': True,
-            'transaction': {
-                'id': transaction.id,
-                'account_id': transaction.account_id,
-                'account_name': account.name if account else 'Unknown',
-                'category_id': transaction.category_id,
-                'category_name': category.name if category else 'Uncategorized',
-                'amount': transaction.amount,
-                'description': transaction.description,
-                'transaction_date': transaction.transaction_date.isoformat() if transaction.transaction_date else None,
-                'created_at': transaction.created_at.isoformat() if transaction.created_at else None
-            }
+            'transaction': TRANSACTION.dump(row, fields)
         }), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -164,17 +134,7 @@ def update_transaction(transaction_id):
         
         return jsonify({
             'success': True,
-            'transaction': {
-                'id': transaction.id,
-                'account_id': transaction.account_id,
-                'account_name': account.name if account else 'Unknown',
-                'category_id': transaction.category_id,
-                'category_name': category.name if category else 'Uncategorized',
-                'amount': transaction.amount,
-                'description': transaction.description,
-                'transaction_date': transaction.transaction_date.isoformat() if transaction.transaction_date else None,
-                'created_at': transaction.created_at.isoformat() if transaction.created_at else None
-            }
+            'transaction': TRANSACTION.dump((transaction, account, category), TRANSACTION_DETAIL)
         }), 200
     except Exception as e:
         db.session.rollback()
@@ -206,17 +166,14 @@ def delete_transaction(transaction_id):
 def get_categories():
     try:
         categories = Category.query.all()
-        categories_data = [{
-            'id': category.id,
-            'name': category.name,
-            'type': category.type,
-            'icon': category.icon
-        } for category in categories]
+        categories_data = list_items(CATEGORY, categories)
         
-        return jsonify({
+        return respond({
             'success': True,
             'categories': categories_data
-        }), 200
+        })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -240,12 +197,7 @@ def create_category():
         
         return jsonify({
             'success': True,
-            'category': {
-                'id': category.id,
-                'name': category.name,
-                'type': category.type,
-                'icon': category.icon
-            }
+            'category': CATEGORY.dump(category)
         }), 201
     except Exception as e:
         db.session.rollback()
@@ -332,23 +284,11 @@ def get_transactions_summary():
         ).scalar() or 0
         
         # Get recent transactions
-        recent_transactions = Transaction.query.filter_by(user_id=user_id).order_by(
+        recent_transactions = TRANSACTION.load_only(_transactions_with_refs(user_id), TRANSACTION_SUMMARY).order_by(
             Transaction.transaction_date.desc()
         ).limit(5).all()
         
-        recent_data = []
-        for transaction in recent_transactions:
-            account = Account.query.get(transaction.account_id)
-            category = Category.query.get(transaction.category_id) if transaction.category_id else None
-            
-            recent_data.append({
-                'id': transaction.id,
-                'account_name': account.name if account else 'Unknown',
-                'category_name': category.name if category else 'Uncategorized',
-                'amount': transaction.amount,
-                'description': transaction.description,
-                'transaction_date': transaction.transaction_date.isoformat() if transaction.transaction_date else None
-            })
+        recent_data = TRANSACTION.dump_many(recent_transactions, TRANSACTION_SUMMARY)
         
         return jsonify({
             'success': True,
@@ -0,0 +1,44 @@
+"""Response fields of each model, shared by the routes.
+
+Clients can ask for a subset with ``?fields=`` on the list and detail
+endpoints that accept it; see ``src.utils.serialization``.
+"""
+from .models.account import Account, AccountType, AccountBalanceHistory
+from .models.transaction import Transaction, Category
+from .utils.serialization import Field, Nested, Spec, iso
+
+ACCOUNT = Spec(Account, [
+    'id', 'name', 'account_type_id', 'balance', 'currency', 'is_active', iso('created_at')
+])
+
+ACCOUNT_TYPE = Spec(AccountType, ['id', 'name', 'description'])
+
+BALANCE_HISTORY = Spec(AccountBalanceHistory, ['id', 'balance', iso('recorded_at')])
+
+CATEGORY = Spec(Category, ['id', 'name', 'type', 'icon'])
+
+# Rows of (Transaction, Account, Category); either side may be missing
+TRANSACTION = Spec(Transaction, [
+    'id',
+    'account_id',
+    Nested('account', ACCOUNT, ('id', 'name'), missing={'id': None, 'name': 'Unknown'}),
+    Field('account_name', 'name', entity=Account, default='Unknown'),
+    'category_id',
+    Nested('category', CATEGORY),
+    Field('category_name', 'name', entity=Category, default='Uncategorized'),
+    'amount',
+    'description',
+    iso('transaction_date'),
+    iso('created_at')
+], entities=(Transaction, Account, Category), default=(
+    'id', 'account_id', 'account', 'category_id', 'category',
+    'amount', 'description', 'transaction_date', 'created_at'
+))
+
+# A single transaction names its account and category inline
+TRANSACTION_DETAIL = (
+    'id', 'account_id', 'account_name', 'category_id', 'category_name',
+    'amount', 'description', 'transaction_date', 'created_at'
+)
+
+TRANSACTION_SUMMARY = ('id', 'account_name', 'category_name', 'amount', 'description', 'transaction_date')
@@ -0,0 +1,153 @@
+"""Dividend income aggregation and forward projection.
+
+History comes from one GROUP BY (holding, year, month) query. The
+12-month projection infers each holding's payment cadence from the months
+it paid in and projects all holdings at once by broadcasting payment
+offsets over a (holdings x payments) grid. Holdings whose last payment is
+more than ``LAPSED_AFTER_CADENCES`` intervals old have stopped paying and
+are left out of the projection. Reports are cached until the portfolio
+version changes, i.e. until the next trade or dividend write.
+"""
+from datetime import date
+
+import numpy as np
+from sqlalchemy import extract, func
+
+from ..models.user import db
+from ..models.investment import Investment, InvestmentType, Dividend
+from .portfolio import portfolio_version, VersionedCache, UNCATEGORIZED
+from ..utils.tracing import traced
+
+CADENCES = {1: 'monthly', 3: 'quarterly', 6: 'semi-annual', 12: 'annual'}
+PROJECTION_MONTHS = 12
+# A payer that let this many of its own intervals pass without paying has stopped
+LAPSED_AFTER_CADENCES = 2
+
+income_cache = VersionedCache()
+
+
+def _month_label(index):
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+def _snap_cadence(gaps):
+    """Snap average month gaps to the nearest known cadence"""
+    known = np.array(sorted(CADENCES))
+    return known[np.argmin(np.abs(gaps[:, None] - known[None, :]), axis=1)]
+
+
+def compute_income(user_id, months=12, today=None):
+    user_id = int(user_id)
+    today = today or date.today()
+    current = today.year * 12 + today.month - 1
+    window_start = current - months + 1
+
+    year = extract('year', Dividend.payment_date)
+    month = extract('month', Dividend.payment_date)
+    rows = db.session.query(
+        Investment.id, Investment.name, Investment.symbol, Investment.investment_type_id, Investment.quantity,
+        year.label('year'), month.label('month'),
+        func.sum(Dividend.amount).label('amount'), func.count(Dividend.id).label('payments')
+    ).join(Dividend, Dividend.investment_id == Investment.id).filter(
+        Investment.user_id == user_id,
+        Dividend.payment_date.isnot(None)
+    ).group_by(
+        Investment.id, Investment.name, Investment.symbol, Investment.investment_type_id, Investment.quantity,
+        year, month
+    ).order_by(Investment.id, year, month).all()
+
+    type_names = dict(db.session.query(InvestmentType.id, InvestmentType.name).all())
+
+    if not rows:
+        return {
+            'period': {'start': _month_label(window_start), 'end': _month_label(current)},
+            'total': 0.0, 'by_month': [], 'by_holding': [], 'by_type': [],
+            'projection': {'total': 0.0, 'by_month': [
+                {'month': _month_label(current + k), 'amount': 0.0} for k in range(PROJECTION_MONTHS)
+            ], 'by_holding': []}
+        }
+
+    holding_ids = np.array([row.id for row in rows], dtype=np.int64)
+    month_index = np.array([int(row.year) * 12 + int(row.month) - 1 for row in rows], dtype=np.int64)
+    amounts = np.array([row.amount for row in rows], dtype=float)
+    payments = np.array([row.payments for row in rows], dtype=np.int64)
+
+    holdings, holding_of = np.unique(holding_ids, return_inverse=True)
+    info = {row.id: row for row in rows}
+    in_window = month_index >= window_start
+
+    # Historical aggregates over the window
+    months_present, month_of = np.unique(month_index[in_window], return_inverse=True)
+    month_totals = np.bincount(month_of, weights=amounts[in_window], minlength=len(months_present))
+    holding_totals = np.bincount(holding_of[in_window], weights=amounts[in_window], minlength=len(holdings))
+    holding_payments = np.bincount(holding_of[in_window], weights=payments[in_window], minlength=len(holdings))
+
+    by_type = {}
+    for i, investment_id in enumerate(holdings):
+        type_name = type_names.get(info[int(investment_id)].investment_type_id, UNCATEGORIZED)
+        by_type[type_name] = by_type.get(type_name, 0.0) + float(holding_totals[i])
+
+    # Cadence, last paying month and last payment per holding (rows are ordered by holding, month)
+    first_row = np.r_[True, holding_of[1:] != holding_of[:-1]]
+    last_row = np.r_[holding_of[1:] != holding_of[:-1], True]
+    first_month = month_index[first_row]
+    last_month = month_index[last_row]
+    last_amount = amounts[last_row]
+    paying_months = np.bincount(holding_of, minlength=len(holdings))
+    average_gap = np.divide(last_month - first_month, paying_months - 1,
+                            out=np.full(len(holdings), 12.0), where=paying_months > 1)
+    cadence = _snap_cadence(average_gap)
+
+    quantity = np.array([info[int(h)].quantity or 0.0 for h in holdings])
+    lapsed = current - last_month > LAPSED_AFTER_CADENCES * cadence
+    active = (quantity > 0) & ~lapsed
+
+    # Broadcast k = 1..12 future payments per holding, keep those landing in
+    # the projection window (this month and the following eleven)
+    k = np.arange(1, PROJECTION_MONTHS + 1)
+    due = last_month[:, None] + cadence[:, None] * k[None, :]
+    offset = due - current
+    mask = (offset >= 0) & (offset < PROJECTION_MONTHS) & active[:, None]
+    projected = np.zeros(PROJECTION_MONTHS)
+    np.add.at(projected, offset[mask], np.broadcast_to(last_amount[:, None], due.shape)[mask])
+    holding_projection = (mask * last_amount[:, None]).sum(axis=1)
+
+    return {
+        'period': {'start': _month_label(window_start), 'end': _month_label(current)},
+        'total': float(month_totals.sum()),
+        'by_month': [
+            {'month': _month_label(int(m)), 'amount': float(a)} for m, a in zip(months_present, month_totals)
+        ],
+        'by_holding': [{
+            'investment_id': int(h),
+            'name': info[int(h)].name,
+            'symbol': info[int(h)].symbol,
+            'amount': float(holding_totals[i]),
+            'payments': int(holding_payments[i])
+        } for i, h in enumerate(holdings) if holding_payments[i] > 0],
+        'by_type': [{'investment_type': name, 'amount': amount} for name, amount in sorted(by_type.items())
+                    if amount],
+        'projection': {
+            'total': float(projected.sum()),
+            'by_month': [
+                {'month': _month_label(current + k), 'amount': float(projected[k])}
+                for k in range(PROJECTION_MONTHS)
+            ],
+            'by_holding': [{
+                'investment_id': int(h),
+                'cadence': CADENCES[int(cadence[i])],
+                'amount': float(holding_projection[i])
+            } for i, h in enumerate(holdings) if active[i]]
+        }
+    }
+
+
+@traced()
+def get_income(user_id, months=12):
+    """Cached compute_income; a trade or dividend write changes the version key"""
+    today = date.today()
+    key = (int(user_id), portfolio_version(user_id), months, today.year, today.month)
+    cached = income_cache.get(key)
+    if cached is not None:
+        return cached
+    return income_cache.set(key, compute_income(user_id, months, today))
@@ -0,0 +1,365 @@
+"""Tax-lot engine.
+
+Buys open lots and sells consume them through a deque: FIFO pops from the
+left, LIFO from the right, and average cost keeps a single pooled lot.
+Open lots and a checkpoint (last processed trade) are persisted per
+investment and method, so recording a trade only replays the new trades.
+A full replay happens only when history before the checkpoint changed.
+
+Lots are only written on the trade write path (``sync_trade_lots``), in the
+same transaction as the trade. Reports never write: when the persisted lots
+of an investment are behind its trade log (trades inserted by an import or
+a migration), its history is replayed in memory instead.
+"""
+import os
+from collections import deque
+from datetime import timedelta
+
+from sqlalchemy import extract, func, insert
+
+from ..models.user import db
+from ..utils.db_routing import pin_primary
+from ..models.investment import Investment, InvestmentTransaction, TaxLot, LotState, RealizedGain
+from .portfolio import BUY_TYPES, SELL_TYPES
+
+LOT_METHODS = ('fifo', 'lifo', 'average')
+DEFAULT_LOT_METHOD = os.getenv('COST_BASIS_METHOD', 'fifo').lower()
+LONG_TERM_HOLDING = timedelta(days=365)
+QUANTITY_EPSILON = 1e-9
+
+
+class LotMatchingError(ValueError):
+    """Raised when a sell cannot be matched against open lots"""
+
+
+class Lot:
+    __slots__ = ('transaction_id', 'acquired_at', 'quantity', 'cost_per_unit')
+
+    def __init__(self, transaction_id, acquired_at, quantity, cost_per_unit):
+        self.transaction_id = transaction_id
+        self.acquired_at = acquired_at
+        self.quantity = quantity
+        self.cost_per_unit = cost_per_unit
+
+
+class LotMatcher:
+    """Incrementally match sells against open lots for one investment"""
+
+    def __init__(self, method, lots=()):
+        if method not in LOT_METHODS:
+            raise ValueError(f"Unknown cost basis method: {method}")
+        self.method = method
+        self.lots = deque(lots)
+
+    @property
+    def quantity(self):
+        return sum(lot.quantity for lot in self.lots)
+
+    def buy(self, transaction_id, acquired_at, quantity, price):
+        if self.method == 'average' and self.lots:
+            pooled = self.lots[0]
+            total = pooled.quantity + quantity
+            pooled.cost_per_unit = (pooled.quantity * pooled.cost_per_unit + quantity * price) / total
+            pooled.quantity = total
+            return
+        self.lots.append(Lot(transaction_id, acquired_at, quantity, price))
+
+    def sell(self, quantity, price):
+        """Consume lots and return a list of (lot, matched_quantity) pairs"""
+        if quantity > self.quantity + QUANTITY_EPSILON:
+            raise LotMatchingError(f"Sell of {quantity} exceeds open quantity {self.quantity}")
+
+        take = self.lots.pop if self.method == 'lifo' else self.lots.popleft
+        put_back = self.lots.append if self.method == 'lifo' else self.lots.appendleft
+        matches = []
+        remaining = quantity
+        while remaining > QUANTITY_EPSILON:
+            lot = take()
+            matched = min(lot.quantity, remaining)
+            matches.append((Lot(lot.transaction_id, lot.acquired_at, matched, lot.cost_per_unit), matched))
+            lot.quantity -= matched
+            remaining -= matched
+            if lot.quantity > QUANTITY_EPSILON:
+                put_back(lot)
+        return matches
+
+
+def _sell_rows(investment_id, method, transaction, matches):
+    rows = []
+    for lot, matched in matches:
+        cost_basis = matched * lot.cost_per_unit
+        proceeds = matched * transaction.price
+        rows.append({
+            'investment_id': investment_id,
+            'method': method,
+            'sell_transaction_id': transaction.id,
+            'lot_transaction_id': lot.transaction_id,
+            'acquired_at': lot.acquired_at,
+            'sold_at': transaction.transaction_date,
+            'quantity': matched,
+            'proceeds': proceeds,
+            'cost_basis': cost_basis,
+            'gain': proceeds - cost_basis
+        })
+    return rows
+
+
+def _apply(matcher, investment_id, transactions):
+    """Feed trades ordered by (date, id) to ``matcher``; return realized gain rows"""
+    gains = []
+    for transaction in transactions:
+        transaction_type = (transaction.type or '').lower()
+        if transaction_type in BUY_TYPES:
+            matcher.buy(transaction.id, transaction.transaction_date, transaction.quantity, transaction.price)
+        elif transaction_type in SELL_TYPES:
+            gains.extend(_sell_rows(investment_id, matcher.method, transaction,
+                                    matcher.sell(transaction.quantity, transaction.price)))
+    return gains
+
+
+def _history(investment_id):
+    return InvestmentTransaction.query.filter_by(investment_id=investment_id).order_by(
+        InvestmentTransaction.transaction_date, InvestmentTransaction.id
+    ).all()
+
+
+def _reset(investment_id, method):
+    TaxLot.query.filter_by(investment_id=investment_id, method=method).delete(synchronize_session=False)
+    RealizedGain.query.filter_by(investment_id=investment_id, method=method).delete(synchronize_session=False)
+
+
+def _needs_replay(state, new_transactions, processed_count):
+    """A trade inserted before the checkpoint, or a deleted one, invalidates the lots"""
+    if processed_count != state.processed_count:
+        return True
+    if state.last_transaction_date is None:
+        return False
+    return any(t.transaction_date < state.last_transaction_date for t in new_transactions)
+
+
+def _sync(investment_id, method, state, transactions, processed_count):
+    """Apply transactions newer than the checkpoint; transactions are ordered by (date, id)"""
+    if state is None:
+        state = LotState(investment_id=investment_id, method=method, last_transaction_id=0, processed_count=0)
+        db.session.add(state)
+        lots = []
+    elif _needs_replay(state, transactions, processed_count):
+        return None
+    else:
+        if not transactions:
+            return state
+        lots = [
+            Lot(row.transaction_id, row.acquired_at, row.quantity, row.cost_per_unit)
+            for row in TaxLot.query.filter_by(investment_id=investment_id, method=method).order_by(TaxLot.sequence)
+        ]
+
+    matcher = LotMatcher(method, lots)
+    gains = _apply(matcher, investment_id, transactions)
+
+    TaxLot.query.filter_by(investment_id=investment_id, method=method).delete(synchronize_session=False)
+    if matcher.lots:
+        db.session.execute(insert(TaxLot), [{
+            'investment_id': investment_id,
+            'method': method,
+            'sequence': sequence,
+            'transaction_id': lot.transaction_id,
+            'acquired_at': lot.acquired_at,
+            'quantity': lot.quantity,
+            'cost_per_unit': lot.cost_per_unit
+        } for sequence, lot in enumerate(matcher.lots)])
+    if gains:
+        db.session.execute(insert(RealizedGain), gains)
+
+    if transactions:
+        state.last_transaction_id = max(state.last_transaction_id or 0, max(t.id for t in transactions))
+        state.last_transaction_date = max(
+            [t.transaction_date for t in transactions] +
+            ([state.last_transaction_date] if state.last_transaction_date else [])
+        )
+    state.processed_count = (state.processed_count or 0) + len(transactions)
+    return state
+
+
+def sync_lots(user_id, method=DEFAULT_LOT_METHOD, investment_id=None):
+    """Bring persisted lots up to date for all (or one) of a user's investments.
+
+    Uses a constant number of queries for the checkpoint scan regardless of
+    how many investments or trades exist; only new trades are loaded. Only
+    flushes: the caller commits, or rolls back on LotMatchingError.
+    """
+    if method not in LOT_METHODS:
+        raise ValueError(f"Unknown cost basis method: {method}")
+    # The checkpoint scan must see the rows it is about to rewrite
+    pin_primary()
+
+    investment_query = db.session.query(Investment.id).filter(Investment.user_id == int(user_id))
+    if investment_id is not None:
+        investment_query = investment_query.filter(Investment.id == investment_id)
+    investment_ids = [row.id for row in investment_query.all()]
+    if not investment_ids:
+        return
+
+    states = {
+        state.investment_id: state
+        for state in LotState.query.filter(LotState.investment_id.in_(investment_ids), LotState.method == method)
+    }
+
+    # Count trades at or below each checkpoint to detect deletions in one grouped query
+    processed_counts = {}
+    if states:
+        rows = db.session.query(
+            InvestmentTransaction.investment_id, func.count(InvestmentTransaction.id)
+        ).join(LotState, LotState.investment_id == InvestmentTransaction.investment_id).filter(
+            LotState.method == method,
+            LotState.investment_id.in_(investment_ids),
+            InvestmentTransaction.id <= LotState.last_transaction_id
+        ).group_by(InvestmentTransaction.investment_id).all()
+        processed_counts = dict(rows)
+
+    min_checkpoint = min((states[i].last_transaction_id or 0) if i in states else 0 for i in investment_ids)
+    new_transactions = {}
+    for transaction in InvestmentTransaction.query.filter(
+        InvestmentTransaction.investment_id.in_(investment_ids),
+        InvestmentTransaction.id > min_checkpoint
+    ).order_by(InvestmentTransaction.transaction_date, InvestmentTransaction.id):
+        state = states.get(transaction.investment_id)
+        if state is None or transaction.id > (state.last_transaction_id or 0):
+            new_transactions.setdefault(transaction.investment_id, []).append(transaction)
+
+    for inv_id in investment_ids:
+        state = states.get(inv_id)
+        processed = processed_counts.get(inv_id, 0)
+        result = _sync(inv_id, method, state, new_transactions.get(inv_id, []), processed)
+        if result is None:
+            # History before the checkpoint changed; replay this investment from scratch
+            _reset(inv_id, method)
+            db.session.delete(state)
+            db.session.flush()
+            _sync(inv_id, method, None, _history(inv_id), 0)
+
+    db.session.flush()
+
+
+def sync_trade_lots(user_id, investment_id):
+    """Match an investment's new trades for every method, in the caller's transaction.
+
+    Raises LotMatchingError when a sell exceeds the open lots; the caller
+    rolls back so the trade is not stored either.
+    """
+    for method in LOT_METHODS:
+        sync_lots(user_id, method, investment_id=investment_id)
+
+
+def _stale_investments(investment_ids, method):
+    """Ids whose persisted lots do not cover every trade in their log"""
+    if not investment_ids:
+        return set()
+    states = {
+        state.investment_id: state
+        for state in LotState.query.filter(LotState.investment_id.in_(investment_ids), LotState.method == method)
+    }
+    trades = db.session.query(
+        InvestmentTransaction.investment_id, func.count(InvestmentTransaction.id), func.max(InvestmentTransaction.id)
+    ).filter(InvestmentTransaction.investment_id.in_(investment_ids)).group_by(
+        InvestmentTransaction.investment_id
+    ).all()
+    stale = set()
+    for inv_id, count, last_id in trades:
+        state = states.get(inv_id)
+        if state is None or state.processed_count != count or state.last_transaction_id != last_id:
+            stale.add(inv_id)
+    return stale
+
+
+def _replay(investment_id, method):
+    """Open lots and gain rows from the full history, without writing anything"""
+    matcher = LotMatcher(method)
+    gains = _apply(matcher, investment_id, _history(investment_id))
+    return matcher.lots, gains
+
+
+def open_lots(investment_id, method=DEFAULT_LOT_METHOD):
+    """Open lots of one investment as dicts; read-only"""
+    if method not in LOT_METHODS:
+        raise ValueError(f"Unknown cost basis method: {method}")
+    if investment_id not in _stale_investments([investment_id], method):
+        return [lot.to_dict() for lot in
+                TaxLot.query.filter_by(investment_id=investment_id, method=method).order_by(TaxLot.sequence)]
+
+    lots, _ = _replay(investment_id, method)
+    return [{
+        'id': None,
+        'investment_id': investment_id,
+        'method': method,
+        'transaction_id': lot.transaction_id,
+        'acquired_at': lot.acquired_at.isoformat() if lot.acquired_at else None,
+        'quantity': lot.quantity,
+        'cost_per_unit': lot.cost_per_unit,
+        'cost_basis': lot.quantity * lot.cost_per_unit
+    } for lot in lots]
+
+
+def realized_gains_report(user_id, method=DEFAULT_LOT_METHOD, year=None):
+    """Realized gains split into short and long term; read-only.
+
+    Persisted matches are used for investments whose lots are current, and
+    the rest are replayed in memory.
+    """
+    if method not in LOT_METHODS:
+        raise ValueError(f"Unknown cost basis method: {method}")
+
+    investments = {
+        row.id: row for row in
+        db.session.query(Investment.id, Investment.name, Investment.symbol).filter(Investment.user_id == int(user_id))
+    }
+    stale = _stale_investments(list(investments), method)
+
+    rows = []
+    current = [inv_id for inv_id in investments if inv_id not in stale]
+    if current:
+        query = RealizedGain.query.filter(RealizedGain.investment_id.in_(current), RealizedGain.method == method)
+        if year is not None:
+            query = query.filter(extract('year', RealizedGain.sold_at) == year)
+        rows.extend({
+            'investment_id': gain.investment_id,
+            'sell_transaction_id': gain.sell_transaction_id,
+            'lot_transaction_id': gain.lot_transaction_id,
+            'acquired_at': gain.acquired_at,
+            'sold_at': gain.sold_at,
+            'quantity': gain.quantity,
+            'proceeds': gain.proceeds,
+            'cost_basis': gain.cost_basis,
+            'gain': gain.gain
+        } for gain in query.order_by(RealizedGain.id))
+    for inv_id in sorted(stale):
+        _, gains = _replay(inv_id, method)
+        rows.extend(gain for gain in gains
+                    if year is None or (gain['sold_at'] and gain['sold_at'].year == year))
+    rows.sort(key=lambda gain: (gain['sold_at'] is None, gain['sold_at'] or 0, gain['sell_transaction_id']))
+
+    entries = []
+    totals = {'proceeds': 0.0, 'cost_basis': 0.0, 'gain': 0.0, 'short_term_gain': 0.0, 'long_term_gain': 0.0}
+    for gain in rows:
+        acquired_at, sold_at = gain['acquired_at'], gain['sold_at']
+        long_term = bool(acquired_at and sold_at and sold_at - acquired_at > LONG_TERM_HOLDING)
+        investment = investments[gain['investment_id']]
+        entries.append({
+            'investment_id': gain['investment_id'],
+            'name': investment.name,
+            'symbol': investment.symbol,
+            'sell_transaction_id': gain['sell_transaction_id'],
+            'lot_transaction_id': gain['lot_transaction_id'],
+            'acquired_at': acquired_at.isoformat() if acquired_at else None,
+            'sold_at': sold_at.isoformat() if sold_at else None,
+            'quantity': gain['quantity'],
+            'proceeds': gain['proceeds'],
+            'cost_basis': gain['cost_basis'],
+            'gain': gain['gain'],
+            'term': 'long' if long_term else 'short'
+        })
+        totals['proceeds'] += gain['proceeds']
+        totals['cost_basis'] += gain['cost_basis']
+        totals['gain'] += gain['gain']
+        totals['long_term_gain' if long_term else 'short_term_gain'] += gain['gain']
+
+    return {'method': method, 'year': year, 'gains': entries, 'totals': totals}
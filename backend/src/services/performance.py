@@ -0,0 +1,229 @@
+"""Portfolio performance analytics.
+
+Money-weighted returns (XIRR) are solved for every holding and for the
+whole portfolio in one vectorized, safeguarded Newton iteration. Cash
+flows are kept as a flat (row, amount, years) layout, i.e. a sparse
+cash-flow matrix, so the NPV of every row is one ``bincount`` per step.
+Time-weighted returns are chained from daily valuations built on the
+cached price series. Results are cached per portfolio version.
+"""
+from datetime import date, datetime, time as dt_time
+
+import numpy as np
+
+from ..models.user import db
+from ..models.investment import Investment, InvestmentTransaction, Dividend
+from .portfolio import value_portfolio, portfolio_version, VersionedCache, BUY_TYPES, SELL_TYPES
+from .price_history import price_cache, to_epoch
+from ..utils.tracing import traced
+
+DAYS_PER_YEAR = 365.25
+SECONDS_PER_DAY = 86400
+# Rates are searched in log(1 + r) space between -99.99% and +100000%
+MIN_LOG_RATE = np.log1p(-0.9999)
+MAX_LOG_RATE = np.log1p(1000.0)
+
+performance_cache = VersionedCache()
+
+
+def xirr(rows, amounts, years, row_count, tol=1e-10, max_iter=100):
+    """Solve sum(amount * (1 + r) ** -years) = 0 for every row at once.
+
+    ``rows`` assigns each flow to a row, ``years`` is the time of each flow
+    since its row's first flow. Newton steps on x = log(1 + r) are kept
+    inside a sign-change bracket and fall back to bisection when they leave
+    it, which converges for any row whose NPV changes sign over the range.
+    Rows without a root (e.g. only outflows) get NaN.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    amounts = np.asarray(amounts, dtype=float)
+    years = np.asarray(years, dtype=float)
+
+    def npv(x):
+        discounted = amounts * np.exp(-x[rows] * years)
+        return (np.bincount(rows, weights=discounted, minlength=row_count),
+                np.bincount(rows, weights=-years * discounted, minlength=row_count))
+
+    lo = np.full(row_count, MIN_LOG_RATE)
+    hi = np.full(row_count, MAX_LOG_RATE)
+    with np.errstate(over='ignore', invalid='ignore'):
+        f_lo, _ = npv(lo)
+        f_hi, _ = npv(hi)
+    valid = np.isfinite(f_lo) & np.isfinite(f_hi) & (np.sign(f_lo) * np.sign(f_hi) < 0)
+
+    x = np.full(row_count, np.log1p(0.1))
+    for _ in range(max_iter):
+        with np.errstate(over='ignore', invalid='ignore', divide='ignore'):
+            f, df = npv(x)
+            same_side = np.sign(f) == np.sign(f_lo)
+            lo = np.where(same_side, x, lo)
+            f_lo = np.where(same_side, f, f_lo)
+            hi = np.where(same_side, hi, x)
+
+            candidate = x - f / df
+            lower, upper = np.minimum(lo, hi), np.maximum(lo, hi)
+            outside = ~np.isfinite(candidate) | (candidate <= lower) | (candidate >= upper)
+            candidate = np.where(outside, (lo + hi) / 2, candidate)
+
+        done = (np.abs(candidate - x) < tol) | (f == 0) | ~valid
+        x = candidate
+        if done.all():
+            break
+
+    rates = np.expm1(x)
+    rates[~valid] = np.nan
+    return rates
+
+
+def _to_years(timestamps, rows, row_count):
+    """Seconds since each row's first flow, in years"""
+    first = np.full(row_count, np.iinfo(np.int64).max)
+    np.minimum.at(first, rows, timestamps)
+    return (timestamps - first[rows]) / (SECONDS_PER_DAY * DAYS_PER_YEAR)
+
+
+def _load_flows(user_id):
+    transactions = db.session.query(
+        InvestmentTransaction.investment_id, InvestmentTransaction.type, InvestmentTransaction.quantity,
+        InvestmentTransaction.price, InvestmentTransaction.transaction_date
+    ).join(Investment, Investment.id == InvestmentTransaction.investment_id).filter(
+        Investment.user_id == user_id,
+        InvestmentTransaction.transaction_date.isnot(None)
+    ).all()
+    dividends = db.session.query(
+        Dividend.investment_id, Dividend.amount, Dividend.payment_date
+    ).join(Investment, Investment.id == Dividend.investment_id).filter(
+        Investment.user_id == user_id,
+        Dividend.payment_date.isnot(None)
+    ).all()
+    return transactions, dividends
+
+
+def _time_weighted(day_grid, values, net_inflows, payouts):
+    """Chain daily returns r_t = (V_t - inflow_t + payout_t) / V_(t-1) - 1"""
+    if len(day_grid) < 2:
+        return None, None
+    previous = values[:-1]
+    growth = values[1:] - net_inflows[1:] + payouts[1:]
+    active = previous > 0
+    if not active.any():
+        return None, None
+    factors = np.ones_like(previous)
+    np.divide(growth, previous, out=factors, where=active)
+    twr = float(np.prod(factors) - 1)
+    years = (len(day_grid) - 1) / DAYS_PER_YEAR
+    annualized = float((1 + twr) ** (1 / years) - 1) if years >= 1 and twr > -1 else None
+    return twr, annualized
+
+
+def _nan_to_none(value):
+    return None if value is None or not np.isfinite(value) else float(value)
+
+
+def compute_performance(user_id, as_of=None):
+    """XIRR and TWR per holding and for the whole portfolio"""
+    user_id = int(user_id)
+    as_of = as_of or date.today()
+    portfolio = value_portfolio(user_id)
+    transactions, dividends = _load_flows(user_id)
+    n = len(portfolio)
+    if n == 0:
+        return {'as_of': as_of.isoformat(), 'portfolio': {'xirr': None, 'twr': None, 'twr_annualized': None},
+                'holdings': []}
+
+    end_ts = to_epoch(datetime.combine(as_of, dt_time()))
+
+    # Flat cash-flow layout: trades, dividends and a terminal market value per holding
+    txn_rows = np.searchsorted(portfolio.ids, np.fromiter((t.investment_id for t in transactions), dtype=np.int64))
+    txn_types = np.array([(t.type or '').lower() for t in transactions])
+    txn_qty = np.fromiter((t.quantity for t in transactions), dtype=float)
+    txn_price = np.fromiter((t.price for t in transactions), dtype=float)
+    txn_ts = np.fromiter((to_epoch(t.transaction_date) for t in transactions), dtype=np.int64)
+    txn_sign = np.where(np.isin(txn_types, BUY_TYPES), -1.0, np.where(np.isin(txn_types, SELL_TYPES), 1.0, 0.0))
+
+    div_rows = np.searchsorted(portfolio.ids, np.fromiter((d.investment_id for d in dividends), dtype=np.int64))
+    div_amounts = np.fromiter((d.amount for d in dividends), dtype=float)
+    div_ts = np.fromiter((to_epoch(d.payment_date) for d in dividends), dtype=np.int64)
+
+    holding_rows = np.concatenate([txn_rows, div_rows, np.arange(n)])
+    amounts = np.concatenate([txn_sign * txn_qty * txn_price, div_amounts, portfolio.market_value])
+    timestamps = np.concatenate([txn_ts, div_ts, np.full(n, end_ts, dtype=np.int64)])
+
+    # Row n is the whole portfolio: every flow again, under one row
+    rows = np.concatenate([holding_rows, np.full(len(holding_rows), n)])
+    all_amounts = np.concatenate([amounts, amounts])
+    all_timestamps = np.concatenate([timestamps, timestamps])
+    rates = xirr(rows, all_amounts, _to_years(all_timestamps, rows, n + 1), n + 1)
+
+    # Daily valuations for TWR
+    start_day = int(timestamps.min() // SECONDS_PER_DAY)
+    end_day = end_ts // SECONDS_PER_DAY
+    day_grid = np.arange(start_day, end_day + 1, dtype=np.int64)
+    day_seconds = day_grid * SECONDS_PER_DAY + (SECONDS_PER_DAY - 1)
+    total_values = np.zeros(len(day_grid))
+    total_inflows = np.zeros(len(day_grid))
+    total_payouts = np.zeros(len(day_grid))
+    holding_twr = []
+    price_series = price_cache.get_many([int(investment_id) for investment_id in portfolio.ids])
+
+    for i in range(n):
+        trades = txn_rows == i
+        t_ts, t_qty, t_sign = txn_ts[trades], txn_qty[trades], txn_sign[trades]
+        order = np.argsort(t_ts, kind='stable')
+        t_ts, t_qty, t_sign, t_price = t_ts[order], t_qty[order], t_sign[order], txn_price[trades][order]
+
+        # Quantity held at the end of each day
+        held = np.concatenate([[0.0], np.cumsum(-t_sign * t_qty)])
+        quantity = held[np.searchsorted(t_ts, day_seconds, side='right')]
+
+        # Last known price: recorded history, trade prices, and today's market price
+        series = price_series[int(portfolio.ids[i])]
+        p_ts = np.concatenate([series.timestamps, t_ts, [end_ts]])
+        p_val = np.concatenate([series.prices, t_price, [portfolio.market_price[i]]])
+        order = np.argsort(p_ts, kind='stable')
+        p_ts, p_val = p_ts[order], p_val[order]
+        price_index = np.searchsorted(p_ts, day_seconds, side='right') - 1
+        prices = np.where(price_index >= 0, p_val[np.clip(price_index, 0, None)], 0.0)
+
+        values = quantity * prices
+        trade_days = t_ts // SECONDS_PER_DAY - start_day
+        inflows = np.bincount(trade_days, weights=-t_sign * t_qty * t_price, minlength=len(day_grid))
+        d_mask = div_rows == i
+        payouts = np.bincount(div_ts[d_mask] // SECONDS_PER_DAY - start_day,
+                              weights=div_amounts[d_mask], minlength=len(day_grid))
+        inflows, payouts = inflows[:len(day_grid)], payouts[:len(day_grid)]
+
+        holding_twr.append(_time_weighted(day_grid, values, inflows, payouts))
+        total_values += values
+        total_inflows += inflows
+        total_payouts += payouts
+
+    portfolio_twr, portfolio_twr_annualized = _time_weighted(day_grid, total_values, total_inflows, total_payouts)
+
+    return {
+        'as_of': as_of.isoformat(),
+        'portfolio': {
+            'xirr': _nan_to_none(rates[n]),
+            'twr': portfolio_twr,
+            'twr_annualized': portfolio_twr_annualized,
+            'market_value': float(portfolio.market_value.sum())
+        },
+        'holdings': [{
+            'id': int(portfolio.ids[i]),
+            'name': portfolio.names[i],
+            'symbol': portfolio.symbols[i],
+            'xirr': _nan_to_none(rates[i]),
+            'twr': holding_twr[i][0],
+            'twr_annualized': holding_twr[i][1]
+        } for i in range(n)]
+    }
+
+
+@traced()
+def get_performance(user_id):
+    """Cached compute_performance keyed by portfolio version and day"""
+    key = (int(user_id), portfolio_version(user_id), date.today())
+    cached = performance_cache.get(key)
+    if cached is not None:
+        return cached
+    return performance_cache.set(key, compute_performance(user_id))
@@ -0,0 +1,255 @@
+"""Vectorized portfolio valuation.
+
+A user's holdings are valued from three column-only queries (investments,
+investment transactions, latest prices) and NumPy arithmetic, so no ORM
+objects are built per lot and no per-holding queries are issued.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from sqlalchemy import and_, func, select
+
+from ..models.user import db
+from ..models.investment import Investment, InvestmentType, InvestmentTransaction, PriceHistory, Dividend
+from ..utils.tracing import traced
+
+BUY_TYPES = ('buy',)
+SELL_TYPES = ('sell',)
+UNCATEGORIZED = 'Uncategorized'
+
+
+def portfolio_version(user_id):
+    """Cheap fingerprint of a user's trades, dividends and prices.
+
+    Count and max id of each table change on every insert or delete, and
+    the latest ``Investment.updated_at`` on in-place changes such as price
+    refreshes, so results cached under this key go stale as soon as any
+    worker writes.
+    """
+    user_id = int(user_id)
+    owned = select(Investment.id).where(Investment.user_id == user_id).scalar_subquery()
+
+    def fingerprint(model):
+        return (
+            select(func.count(model.id)).where(model.investment_id.in_(owned)).scalar_subquery(),
+            select(func.max(model.id)).where(model.investment_id.in_(owned)).scalar_subquery()
+        )
+
+    row = db.session.execute(select(
+        select(func.count(Investment.id)).where(Investment.user_id == user_id).scalar_subquery(),
+        select(func.max(Investment.updated_at)).where(Investment.user_id == user_id).scalar_subquery(),
+        *fingerprint(InvestmentTransaction),
+        *fingerprint(Dividend),
+        *fingerprint(PriceHistory)
+    )).one()
+    return tuple(row)
+
+
+class VersionedCache:
+    """Small thread-safe LRU whose keys include a portfolio version"""
+
+    def __init__(self, max_size=128):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        return None
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return value
+
+
+def _latest_prices(user_id):
+    """Return {investment_id: price} for the newest PriceHistory row of each holding"""
+    latest = db.session.query(
+        PriceHistory.investment_id,
+        func.max(PriceHistory.recorded_at).label('recorded_at')
+    ).join(Investment, Investment.id == PriceHistory.investment_id).filter(
+        Investment.user_id == user_id
+    ).group_by(PriceHistory.investment_id).subquery()
+
+    rows = db.session.query(PriceHistory.investment_id, PriceHistory.price).join(
+        latest,
+        and_(
+            PriceHistory.investment_id == latest.c.investment_id,
+            PriceHistory.recorded_at == latest.c.recorded_at
+        )
+    ).all()
+    return {investment_id: price for investment_id, price in rows}
+
+
+def _safe_divide(numerator, denominator):
+    out = np.zeros_like(numerator, dtype=float)
+    np.divide(numerator, denominator, out=out, where=denominator != 0)
+    return out
+
+
+def _running_cost(txn_index, txn_qty, txn_price, is_buy, is_sell, n):
+    """Held quantity, remaining cost and realized P&L per holding, in trade order.
+
+    Buys add to the average cost; sells leave it unchanged and realize the
+    difference to it, so a buy after a full sell starts from a fresh average.
+    """
+    quantity, cost, realized = np.zeros(n), np.zeros(n), np.zeros(n)
+    for index, qty, price, buy, sell in zip(txn_index.tolist(), txn_qty.tolist(), txn_price.tolist(),
+                                            is_buy.tolist(), is_sell.tolist()):
+        if buy:
+            quantity[index] += qty
+            cost[index] += qty * price
+        elif sell:
+            average = cost[index] / quantity[index] if quantity[index] > 0 else 0.0
+            realized[index] += qty * (price - average)
+            cost[index] -= qty * average
+            quantity[index] -= qty
+    return quantity, cost, realized
+
+
+class PortfolioValuation:
+    """Column arrays describing every holding of one user, aligned by index"""
+
+    def __init__(self, ids, names, symbols, type_ids, type_names, quantity, average_cost,
+                 cost_basis, market_price, market_value, realized_pl):
+        self.ids = ids
+        self.names = names
+        self.symbols = symbols
+        self.type_ids = type_ids
+        self.type_names = type_names
+        self.quantity = quantity
+        self.average_cost = average_cost
+        self.cost_basis = cost_basis
+        self.market_price = market_price
+        self.market_value = market_value
+        self.realized_pl = realized_pl
+        self.unrealized_pl = market_value - cost_basis
+
+    def __len__(self):
+        return len(self.ids)
+
+    def holdings(self):
+        unrealized_pct = _safe_divide(self.unrealized_pl, self.cost_basis) * 100
+        return [{
+            'id': int(self.ids[i]),
+            'name': self.names[i],
+            'symbol': self.symbols[i],
+            'investment_type_id': int(self.type_ids[i]) if self.type_ids[i] >= 0 else None,
+            'investment_type': self.type_names[i],
+            'quantity': float(self.quantity[i]),
+            'average_cost': float(self.average_cost[i]),
+            'cost_basis': float(self.cost_basis[i]),
+            'market_price': float(self.market_price[i]),
+            'market_value': float(self.market_value[i]),
+            'unrealized_pl': float(self.unrealized_pl[i]),
+            'unrealized_pl_percent': round(float(unrealized_pct[i]), 2),
+            'realized_pl': float(self.realized_pl[i])
+        } for i in range(len(self.ids))]
+
+    def summary(self):
+        market_value = float(self.market_value.sum())
+        cost_basis = float(self.cost_basis.sum())
+        unrealized = market_value - cost_basis
+        return {
+            'holdings_count': int(np.count_nonzero(self.quantity > 0)),
+            'market_value': market_value,
+            'cost_basis': cost_basis,
+            'unrealized_pl': unrealized,
+            'unrealized_pl_percent': round(unrealized / cost_basis * 100, 2) if cost_basis > 0 else 0,
+            'realized_pl': float(self.realized_pl.sum())
+        }
+
+    def allocation(self):
+        """Market value grouped by InvestmentType"""
+        if len(self.ids) == 0:
+            return []
+        type_keys, inverse = np.unique(self.type_ids, return_inverse=True)
+        values = np.bincount(inverse, weights=self.market_value, minlength=len(type_keys))
+        total = values.sum()
+        first_index = {int(key): int(np.argmax(self.type_ids == key)) for key in type_keys}
+        return [{
+            'investment_type_id': int(key) if key >= 0 else None,
+            'investment_type': self.type_names[first_index[int(key)]],
+            'market_value': float(value),
+            'percentage': round(float(value / total * 100), 2) if total > 0 else 0
+        } for key, value in zip(type_keys, values)]
+
+
+@traced()
+def value_portfolio(user_id):
+    """Value every holding of a user at the running average cost of its trades"""
+    user_id = int(user_id)
+
+    investments = db.session.query(
+        Investment.id, Investment.name, Investment.symbol, Investment.investment_type_id,
+        Investment.quantity, Investment.purchase_price, Investment.current_price
+    ).filter(Investment.user_id == user_id).order_by(Investment.id).all()
+
+    transactions = db.session.query(
+        InvestmentTransaction.investment_id, InvestmentTransaction.type,
+        InvestmentTransaction.quantity, InvestmentTransaction.price
+    ).join(Investment, Investment.id == InvestmentTransaction.investment_id).filter(
+        Investment.user_id == user_id
+    ).order_by(InvestmentTransaction.transaction_date, InvestmentTransaction.id).all()
+
+    prices = _latest_prices(user_id)
+    type_names = dict(db.session.query(InvestmentType.id, InvestmentType.name).all())
+
+    n = len(investments)
+    ids = np.fromiter((row.id for row in investments), dtype=np.int64, count=n)
+    type_ids = np.fromiter(
+        (row.investment_type_id if row.investment_type_id is not None else -1 for row in investments),
+        dtype=np.int64, count=n
+    )
+
+    if transactions:
+        txn_index = np.searchsorted(ids, np.fromiter((t.investment_id for t in transactions), dtype=np.int64))
+        txn_qty = np.fromiter((t.quantity for t in transactions), dtype=float)
+        txn_price = np.fromiter((t.price for t in transactions), dtype=float)
+        txn_type = np.array([(t.type or '').lower() for t in transactions])
+        is_buy = np.isin(txn_type, BUY_TYPES)
+        is_sell = np.isin(txn_type, SELL_TYPES)
+
+        trade_count = np.bincount(txn_index, minlength=n)
+        quantity, cost_basis, realized_pl = _running_cost(txn_index, txn_qty, txn_price, is_buy, is_sell, n)
+    else:
+        trade_count = np.zeros(n, dtype=np.int64)
+        quantity = cost_basis = realized_pl = np.zeros(n)
+
+    # Holdings entered without any trade history keep their manual quantity/price
+    manual_qty = np.array([row.quantity or 0.0 for row in investments], dtype=float)
+    manual_price = np.array([row.purchase_price or 0.0 for row in investments], dtype=float)
+    manual = trade_count == 0
+    quantity = np.where(manual, manual_qty, quantity)
+    cost_basis = np.where(manual, manual_qty * manual_price, cost_basis)
+    average_cost = _safe_divide(cost_basis, quantity)
+
+    # Latest recorded price, then the stored current price, then cost
+    market_price = np.array([
+        prices.get(row.id, row.current_price if row.current_price is not None else np.nan)
+        for row in investments
+    ], dtype=float)
+    market_price = np.where(np.isnan(market_price), average_cost, market_price)
+    market_value = quantity * market_price
+
+    return PortfolioValuation(
+        ids=ids,
+        names=[row.name for row in investments],
+        symbols=[row.symbol for row in investments],
+        type_ids=type_ids,
+        type_names=[type_names.get(row.investment_type_id, UNCATEGORIZED) for row in investments],
+        quantity=quantity,
+        average_cost=average_cost,
+        cost_basis=cost_basis,
+        market_price=market_price,
+        market_value=market_value,
+        realized_pl=realized_pl
+    )
@@ -0,0 +1,274 @@
+"""Columnar price-history store.
+
+Each investment's price history is loaded once as two parallel NumPy
+arrays (epoch seconds and prices) and kept in a bounded LRU cache. Range
+and downsampled queries slice those arrays with ``searchsorted`` and
+``reduceat`` instead of materializing one ORM object per price point.
+"""
+import csv
+import io
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+import numpy as np
+from sqlalchemy import insert, tuple_, update
+
+from ..models.user import db
+from ..models.investment import Investment, PriceHistory
+
+PRICE_CACHE_SIZE = int(os.getenv('PRICE_CACHE_SIZE', '256'))
+PRICE_CACHE_TTL = float(os.getenv('PRICE_CACHE_TTL', '300'))
+# (investment_id, recorded_at) pairs per lookup; two bound parameters each
+UPSERT_LOOKUP_CHUNK = 400
+
+
+def to_epoch(value):
+    """Naive UTC datetime -> epoch seconds"""
+    return int(value.replace(tzinfo=timezone.utc).timestamp())
+
+
+def from_epoch(seconds):
+    return datetime.fromtimestamp(int(seconds), tz=timezone.utc).replace(tzinfo=None)
+
+
+def parse_timestamp(value):
+    """Parse an ISO date/datetime into a naive UTC datetime truncated to seconds"""
+    parsed = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed.replace(microsecond=0)
+
+
+class PriceSeries:
+    """Sorted, de-duplicated price points for one investment"""
+
+    __slots__ = ('timestamps', 'prices')
+
+    def __init__(self, timestamps, prices):
+        self.timestamps = timestamps
+        self.prices = prices
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def range(self, start=None, end=None):
+        """Points with start <= t <= end (epoch seconds, either bound optional)"""
+        lo = 0 if start is None else np.searchsorted(self.timestamps, start, side='left')
+        hi = len(self.timestamps) if end is None else np.searchsorted(self.timestamps, end, side='right')
+        return PriceSeries(self.timestamps[lo:hi], self.prices[lo:hi])
+
+    def downsample(self, points):
+        """Bucket into at most ``points`` equal time intervals.
+
+        Returns (timestamps, open, high, low, close) arrays where the
+        timestamp is that of each bucket's closing point.
+        """
+        n = len(self.timestamps)
+        if n == 0 or points is None or n <= points:
+            return self.timestamps, self.prices, self.prices, self.prices, self.prices
+
+        first, last = self.timestamps[0], self.timestamps[-1]
+        span = max(int(last - first), 1)
+        buckets = ((self.timestamps - first) * points // (span + 1)).astype(np.int64)
+        starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        ends = np.r_[starts[1:], n] - 1
+        return (
+            self.timestamps[ends],
+            self.prices[starts],
+            np.maximum.reduceat(self.prices, starts),
+            np.minimum.reduceat(self.prices, starts),
+            self.prices[ends]
+        )
+
+
+class PriceSeriesCache:
+    """Thread-safe LRU of PriceSeries keyed by investment id"""
+
+    def __init__(self, max_size=PRICE_CACHE_SIZE, ttl=PRICE_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, investment_id):
+        return self.get_many([investment_id])[investment_id]
+
+    def get_many(self, investment_ids):
+        """{investment_id: PriceSeries}; every miss is loaded with one query"""
+        now = time.monotonic()
+        found, missing = {}, []
+        with self._lock:
+            for investment_id in investment_ids:
+                entry = self._entries.get(investment_id)
+                if entry is not None and now - entry[0] < self.ttl:
+                    self._entries.move_to_end(investment_id)
+                    self.hits += 1
+                    found[investment_id] = entry[1]
+                else:
+                    self.misses += 1
+                    missing.append(investment_id)
+
+        if missing:
+            loaded = load_many_series(missing)
+            found.update(loaded)
+            with self._lock:
+                for investment_id, series in loaded.items():
+                    self._entries[investment_id] = (now, series)
+                    self._entries.move_to_end(investment_id)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return found
+
+    def invalidate(self, investment_ids=None):
+        with self._lock:
+            if investment_ids is None:
+                self._entries.clear()
+                return
+            for investment_id in investment_ids:
+                self._entries.pop(investment_id, None)
+
+
+def _to_series(rows):
+    count = len(rows)
+    timestamps = np.fromiter((to_epoch(row[0]) for row in rows), dtype=np.int64, count=count)
+    prices = np.fromiter((row[1] for row in rows), dtype=float, count=count)
+    if count:
+        # Duplicate timestamps keep the most recently inserted price
+        keep = np.r_[timestamps[1:] != timestamps[:-1], True]
+        timestamps, prices = timestamps[keep], prices[keep]
+    return PriceSeries(timestamps, prices)
+
+
+def load_many_series(investment_ids):
+    """Load several investments' histories with one three-column query"""
+    rows = {investment_id: [] for investment_id in investment_ids}
+    for investment_id, recorded_at, price in db.session.query(
+        PriceHistory.investment_id, PriceHistory.recorded_at, PriceHistory.price
+    ).filter(
+        PriceHistory.investment_id.in_(list(rows)),
+        PriceHistory.recorded_at.isnot(None)
+    ).order_by(PriceHistory.investment_id, PriceHistory.recorded_at, PriceHistory.id):
+        rows[investment_id].append((recorded_at, price))
+    return {investment_id: _to_series(points) for investment_id, points in rows.items()}
+
+
+price_cache = PriceSeriesCache()
+
+
+def query_prices(investment_id, start=None, end=None, points=None):
+    """Serve a range, optionally downsampled, straight from the cached arrays"""
+    series = price_cache.get(investment_id).range(
+        to_epoch(start) if start else None,
+        to_epoch(end) if end else None
+    )
+    timestamps, opens, highs, lows, closes = series.downsample(points)
+    iso = np.datetime_as_string(timestamps.astype('datetime64[s]'))
+    return {
+        'count': int(len(series)),
+        'timestamps': iso.tolist(),
+        'open': opens.tolist(),
+        'high': highs.tolist(),
+        'low': lows.tolist(),
+        'close': closes.tolist()
+    }
+
+
+def upsert_prices(points):
+    """Write {(investment_id, recorded_at): price} with one bulk insert and one bulk update.
+
+    Existing rows at the same (investment_id, recorded_at) are updated in
+    place so re-importing a file never duplicates points. They are found
+    with one ``(investment_id, recorded_at) IN (...)`` lookup per
+    ``UPSERT_LOOKUP_CHUNK`` points, however many investments are involved.
+    The caller commits.
+    """
+    if not points:
+        return {'inserted': 0, 'updated': 0}
+
+    keys = list(points)
+    existing = {}
+    for start in range(0, len(keys), UPSERT_LOOKUP_CHUNK):
+        chunk = keys[start:start + UPSERT_LOOKUP_CHUNK]
+        for investment_id, recorded_at, row_id in db.session.query(
+            PriceHistory.investment_id, PriceHistory.recorded_at, PriceHistory.id
+        ).filter(tuple_(PriceHistory.investment_id, PriceHistory.recorded_at).in_(chunk)):
+            existing[(investment_id, recorded_at)] = row_id
+
+    updates, inserts = [], []
+    for (investment_id, recorded_at), price in points.items():
+        row_id = existing.get((investment_id, recorded_at))
+        if row_id is not None:
+            updates.append({'id': row_id, 'price': price})
+        else:
+            inserts.append({'investment_id': investment_id, 'recorded_at': recorded_at, 'price': price})
+
+    if inserts:
+        db.session.execute(insert(PriceHistory), inserts)
+    if updates:
+        db.session.execute(update(PriceHistory), updates)
+
+    investment_ids = {investment_id for investment_id, _ in keys}
+    price_cache.invalidate(investment_ids)
+    # In-place price updates do not change row counts; this moves the portfolio version
+    db.session.execute(
+        update(Investment).where(Investment.id.in_(list(investment_ids))).values(updated_at=datetime.utcnow()),
+        execution_options={'synchronize_session': False}
+    )
+    return {'inserted': len(inserts), 'updated': len(updates)}
+
+
+def ingest_price_file(user_id, stream):
+    """Bulk-import a CSV of ``symbol|investment_id, date, price`` rows.
+
+    Rows are de-duplicated within the file (last row wins) and upserted
+    against existing history. Returns counts plus any rejected row numbers.
+    """
+    investments = db.session.query(Investment.id, Investment.symbol).filter(
+        Investment.user_id == int(user_id)
+    ).all()
+    owned_ids = {row.id for row in investments}
+    by_symbol = {row.symbol.upper(): row.id for row in investments if row.symbol}
+
+    text = stream.read()
+    if isinstance(text, bytes):
+        text = text.decode('utf-8-sig')
+    reader = csv.DictReader(io.StringIO(text))
+    fields = {name.strip().lower(): name for name in (reader.fieldnames or [])}
+    date_field = fields.get('date') or fields.get('recorded_at')
+    price_field = fields.get('price') or fields.get('close')
+    if not date_field or not price_field or not ('symbol' in fields or 'investment_id' in fields):
+        raise ValueError('CSV must have symbol or investment_id, date and price columns')
+
+    points = {}
+    rejected = []
+    rows = 0
+    for line_number, row in enumerate(reader, start=2):
+        rows += 1
+        try:
+            if 'investment_id' in fields and row.get(fields['investment_id']):
+                investment_id = int(row[fields['investment_id']])
+            else:
+                investment_id = by_symbol.get(row[fields['symbol']].strip().upper())
+            if investment_id not in owned_ids:
+                raise ValueError('unknown investment')
+            price = float(row[price_field])
+            if not (math.isfinite(price) and price > 0):
+                raise ValueError('price must be a positive number')
+            points[(investment_id, parse_timestamp(row[date_field]))] = price
+        except (KeyError, TypeError, ValueError, AttributeError):
+            rejected.append(line_number)
+
+    result = upsert_prices(points)
+    db.session.commit()
+    return {
+        'rows': rows,
+        'duplicates': rows - len(rejected) - len(points),
+        'rejected_rows': rejected,
+        **result
+    }
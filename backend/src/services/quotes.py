@@ -0,0 +1,318 @@
+"""Quote providers and a batching, pooled, TTL-cached client.
+
+Providers implement ``fetch(symbols) -> {symbol: price}`` for one batch.
+``QuoteClient`` splits requests into batches, serves fresh quotes from
+its cache, and ``refresh_prices`` writes results back with bulk
+statements. ``StubQuoteServer`` and ``FileQuoteProvider`` exist so tests
+and local development never need a real market-data vendor.
+"""
+import csv
+import http.client
+import json
+import math
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, urlencode, parse_qs
+
+from sqlalchemy import update
+
+from ..models.user import db
+from ..models.investment import Investment
+from .price_history import upsert_prices
+from ..utils.logger import app_logger
+
+logger = app_logger
+
+
+class QuoteProviderError(Exception):
+    """Raised when a provider cannot return quotes"""
+
+
+class QuoteProvider:
+    """Interface for a source of latest prices"""
+
+    max_batch_size = 500
+
+    def fetch(self, symbols):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class FileQuoteProvider(QuoteProvider):
+    """Reads quotes from a JSON object or a ``symbol,price`` CSV, reloading on change"""
+
+    max_batch_size = 100000
+
+    def __init__(self, path):
+        self.path = path
+        self._mtime = None
+        self._quotes = {}
+        self._lock = threading.Lock()
+
+    def _load(self):
+        mtime = os.path.getmtime(self.path)
+        if mtime == self._mtime:
+            return
+        with open(self.path, newline='') as handle:
+            if self.path.endswith('.json'):
+                quotes = {str(k).upper(): float(v) for k, v in json.load(handle).items()}
+            else:
+                quotes = {row['symbol'].strip().upper(): float(row['price']) for row in csv.DictReader(handle)}
+        self._quotes, self._mtime = quotes, mtime
+
+    def fetch(self, symbols):
+        with self._lock:
+            try:
+                self._load()
+            except (OSError, ValueError, KeyError) as e:
+                raise QuoteProviderError(f"Cannot read quote file {self.path}: {e}")
+            return {symbol: self._quotes[symbol] for symbol in symbols if symbol in self._quotes}
+
+
+class ConnectionPool:
+    """Keep-alive HTTP connections to one host, reused across batches"""
+
+    def __init__(self, base_url, size=4, timeout=10):
+        parts = urlsplit(base_url)
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.prefix = parts.path.rstrip('/')
+        self.timeout = timeout
+        self._idle = queue.LifoQueue(maxsize=size)
+        self.created = 0
+
+    def _new_connection(self):
+        self.created += 1
+        cls = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+        return cls(self.host, self.port, timeout=self.timeout)
+
+    def request(self, method, path):
+        """Return (status, body); retries once on a stale pooled connection"""
+        for attempt in range(2):
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                connection = self._new_connection()
+            try:
+                connection.request(method, self.prefix + path, headers={'Connection': 'keep-alive'})
+                response = connection.getresponse()
+                body = response.read()
+            except (http.client.HTTPException, OSError):
+                connection.close()
+                if attempt:
+                    raise
+                continue
+            if response.will_close:
+                connection.close()
+            else:
+                try:
+                    self._idle.put_nowait(connection)
+                except queue.Full:
+                    connection.close()
+            return response.status, body
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class HttpQuoteProvider(QuoteProvider):
+    """``GET {base}/quotes?symbols=A,B`` returning ``{"quotes": {"A": 1.0}}``"""
+
+    def __init__(self, base_url, batch_size=500, pool_size=4, timeout=10):
+        self.max_batch_size = batch_size
+        self.pool = ConnectionPool(base_url, size=pool_size, timeout=timeout)
+
+    def fetch(self, symbols):
+        try:
+            status, body = self.pool.request('GET', '/quotes?' + urlencode({'symbols': ','.join(symbols)}))
+        except (http.client.HTTPException, OSError) as e:
+            raise QuoteProviderError(f"Quote request failed: {e}")
+        if status != 200:
+            raise QuoteProviderError(f"Quote provider returned HTTP {status}")
+        try:
+            quotes = {str(symbol).upper(): float(price)
+                      for symbol, price in json.loads(body).get('quotes', {}).items() if price is not None}
+        except (ValueError, AttributeError, TypeError) as e:
+            raise QuoteProviderError(f"Malformed quote response: {e}")
+        # A NaN or infinite quote counts as no quote rather than a price to store
+        return {symbol: price for symbol, price in quotes.items() if math.isfinite(price)}
+
+    def close(self):
+        self.pool.close()
+
+
+class QuoteClient:
+    """Batches symbols per provider request and caches quotes for ``ttl`` seconds"""
+
+    def __init__(self, provider, batch_size=None, ttl=60):
+        self.provider = provider
+        self.batch_size = min(batch_size or provider.max_batch_size, provider.max_batch_size)
+        self.ttl = ttl
+        self._cache = {}
+        self._lock = threading.Lock()
+        self.requests = 0
+
+    def get_quotes(self, symbols):
+        now = time.monotonic()
+        wanted = sorted({symbol.upper() for symbol in symbols if symbol})
+        quotes, missing = {}, []
+        with self._lock:
+            for symbol in wanted:
+                entry = self._cache.get(symbol)
+                if entry and now - entry[0] < self.ttl:
+                    quotes[symbol] = entry[1]
+                else:
+                    missing.append(symbol)
+
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start:start + self.batch_size]
+            self.requests += 1
+            fetched = self.provider.fetch(batch)
+            with self._lock:
+                for symbol, price in fetched.items():
+                    self._cache[symbol] = (now, price)
+            quotes.update(fetched)
+        return quotes
+
+    def close(self):
+        self.provider.close()
+
+
+class StubQuoteServer:
+    """Local quote server speaking the HttpQuoteProvider protocol"""
+
+    def __init__(self, quotes=None, host='127.0.0.1', port=0):
+        self.quotes = {k.upper(): v for k, v in (quotes or {}).items()}
+        self.requests = 0
+        self.connections = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                stub.connections += 1
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                if parts.path.rstrip('/') != '/quotes':
+                    self.send_error(404)
+                    return
+                stub.requests += 1
+                symbols = parse_qs(parts.query).get('symbols', [''])[0].split(',')
+                body = json.dumps({'quotes': {s: stub.quotes.get(s.upper()) for s in symbols if s}}).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def build_quote_client():
+    """Create a client from QUOTE_PROVIDER (``http`` or ``file``) settings, or None"""
+    kind = os.getenv('QUOTE_PROVIDER', '').lower()
+    batch_size = int(os.getenv('QUOTE_BATCH_SIZE', '500'))
+    ttl = float(os.getenv('QUOTE_CACHE_TTL', '60'))
+    if kind == 'http' and os.getenv('QUOTE_PROVIDER_URL'):
+        provider = HttpQuoteProvider(
+            os.getenv('QUOTE_PROVIDER_URL'),
+            batch_size=batch_size,
+            pool_size=int(os.getenv('QUOTE_POOL_SIZE', '4')),
+            timeout=float(os.getenv('QUOTE_TIMEOUT', '10'))
+        )
+    elif kind == 'file' and os.getenv('QUOTE_FILE'):
+        provider = FileQuoteProvider(os.getenv('QUOTE_FILE'))
+    else:
+        return None
+    return QuoteClient(provider, batch_size=batch_size, ttl=ttl)
+
+
+def get_quote_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = build_quote_client()
+        return _client
+
+
+def set_quote_client(client):
+    """Install a client explicitly (tests, scripts)"""
+    global _client
+    with _client_lock:
+        _client = client
+
+
+def refresh_prices(client, user_id=None):
+    """Fetch quotes for all (or one user's) symbols and persist them in bulk.
+
+    One column query finds the investments, the client batches the symbols,
+    then one bulk UPDATE sets ``current_price`` and ``upsert_prices`` writes
+    the PriceHistory rows.
+    """
+    query = db.session.query(Investment.id, Investment.symbol).filter(Investment.symbol.isnot(None))
+    if user_id is not None:
+        query = query.filter(Investment.user_id == int(user_id))
+    investments = query.all()
+
+    quotes = client.get_quotes(row.symbol for row in investments)
+    recorded_at = datetime.utcnow().replace(microsecond=0)
+
+    updates, points = [], {}
+    for row in investments:
+        price = quotes.get(row.symbol.upper())
+        if price is None:
+            continue
+        updates.append({'id': row.id, 'current_price': price})
+        points[(row.id, recorded_at)] = price
+
+    if updates:
+        db.session.execute(update(Investment), updates)
+    result = upsert_prices(points)
+    db.session.commit()
+
+    symbols = {row.symbol.upper() for row in investments}
+    logger.info(f"Refreshed {len(updates)} investment prices from {len(quotes)} quotes")
+    return {
+        'symbols': len(symbols),
+        'quoted': len(symbols & set(quotes)),
+        'updated_investments': len(updates),
+        'price_points': result['inserted'] + result['updated'],
+        'missing': sorted(symbols - set(quotes))
+    }
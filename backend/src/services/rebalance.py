@@ -0,0 +1,170 @@
+"""Target-allocation rebalancing.
+
+Holdings are grouped by InvestmentType or symbol and the trades that move
+each group to its target weight are solved over the group arrays:
+
+* ``full``      - buy and sell; trade = target * total - current
+* ``no_sell``   - buys only, funded with at least the new cash required
+* ``cash_only`` - buys only, limited to the cash contributed; the cash is
+                  water-filled into the most underweight groups first
+
+Group trades are spread over the group's holdings pro rata to market
+value. The valuation is cached per portfolio version so repeated calls
+while targets are being edited only redo the array arithmetic.
+"""
+import math
+
+import numpy as np
+
+from .portfolio import value_portfolio, portfolio_version, VersionedCache
+from ..utils.tracing import traced
+
+REBALANCE_MODES = ('full', 'no_sell', 'cash_only')
+GROUP_BY = ('type', 'symbol')
+WEIGHT_TOLERANCE = 0.01
+
+valuation_cache = VersionedCache(max_size=64)
+
+
+def _cached_valuation(user_id):
+    key = (int(user_id), portfolio_version(user_id))
+    cached = valuation_cache.get(key)
+    if cached is not None:
+        return cached
+    return valuation_cache.set(key, value_portfolio(user_id))
+
+
+def _parse_targets(targets):
+    """Validate {key: percent} and return (keys, weights summing to 1)"""
+    if not isinstance(targets, dict) or not targets:
+        raise ValueError('targets must be a non-empty object of {key: percent}')
+    keys = [str(key) for key in targets]
+    values = [float(value) for value in targets.values()]
+    if not all(math.isfinite(value) for value in values):
+        raise ValueError('target percentages must be finite numbers')
+    weights = np.array(values)
+    if (weights < 0).any():
+        raise ValueError('target percentages cannot be negative')
+    if abs(weights.sum() - 100) > WEIGHT_TOLERANCE:
+        raise ValueError('target percentages must add up to 100')
+    return keys, weights / weights.sum()
+
+
+def _water_fill(current, weights, cash):
+    """Buys b >= 0 with sum(b) == cash that minimize the largest shortfall.
+
+    b_i = max(weights_i * L - current_i, 0) for the level L where the buys
+    use exactly ``cash``. That function of L is piecewise linear with
+    breakpoints current_i / weights_i, so L is found with one sort and
+    cumulative sums rather than an iterative search.
+    """
+    buys = np.zeros_like(current)
+    eligible = weights > 0
+    if cash <= 0 or not eligible.any():
+        return buys
+    w, g = weights[eligible], current[eligible]
+    breakpoints = g / w
+    order = np.argsort(breakpoints)
+    b, w_cum, g_cum = breakpoints[order], np.cumsum(w[order]), np.cumsum(g[order])
+    spent_at = w_cum * b - g_cum
+    j = max(int(np.searchsorted(spent_at, cash, side='right')) - 1, 0)
+    level = (cash + g_cum[j]) / w_cum[j]
+    buys[eligible] = np.maximum(w * level - g, 0)
+    return buys
+
+
+def solve_rebalance(current, weights, cash=0.0, mode='full'):
+    """Group trade values (positive = buy) that reach ``weights``"""
+    current = np.asarray(current, dtype=float)
+    weights = np.asarray(weights, dtype=float)
+    if mode == 'full':
+        return weights * (current.sum() + cash) - current
+    if mode == 'no_sell':
+        # New cash needed so no targeted group stays below its share, and at least ``cash``
+        funded = weights > 0
+        level = (current[funded] / weights[funded]).max() if funded.any() else 0.0
+        required = np.maximum(weights * level - current, 0).sum()
+        return _water_fill(current, weights, max(required, cash))
+    if mode == 'cash_only':
+        return _water_fill(current, weights, cash)
+    raise ValueError(f"mode must be one of {', '.join(REBALANCE_MODES)}")
+
+
+@traced()
+def rebalance(user_id, targets, group_by='type', mode='full', cash=0.0):
+    if group_by not in GROUP_BY:
+        raise ValueError(f"group_by must be one of {', '.join(GROUP_BY)}")
+    if mode not in REBALANCE_MODES:
+        raise ValueError(f"mode must be one of {', '.join(REBALANCE_MODES)}")
+    cash = float(cash or 0.0)
+    if not math.isfinite(cash) or cash < 0:
+        raise ValueError('cash must be a non-negative number')
+
+    portfolio = _cached_valuation(user_id)
+    target_keys, target_weights = _parse_targets(targets)
+    if group_by == 'symbol':
+        target_keys = [key.upper() for key in target_keys]
+        holding_keys = [symbol.upper() if symbol else portfolio.names[i]
+                        for i, symbol in enumerate(portfolio.symbols)]
+    else:
+        holding_keys = list(portfolio.type_names)
+
+    # Groups: every target key, then any held key without a target (target 0)
+    group_keys = list(dict.fromkeys(target_keys + holding_keys))
+    group_index = {key: i for i, key in enumerate(group_keys)}
+    holding_group = np.array([group_index[key] for key in holding_keys], dtype=np.int64)
+
+    weights = np.zeros(len(group_keys))
+    np.add.at(weights, [group_index[key] for key in target_keys], target_weights)
+    value = np.maximum(portfolio.market_value, 0)
+    current = np.bincount(holding_group, weights=value, minlength=len(group_keys))
+
+    trades = solve_rebalance(current, weights, cash, mode)
+    resulting = current + trades
+    invested = trades.sum()
+
+    # Spread each group's trade over its holdings by market value (evenly when all are zero)
+    group_count = np.bincount(holding_group, minlength=len(group_keys))
+    share = np.where(current[holding_group] > 0,
+                     value / np.where(current[holding_group] > 0, current[holding_group], 1),
+                     1 / np.maximum(group_count[holding_group], 1))
+    holding_trade = trades[holding_group] * share
+    price = portfolio.market_price
+    holding_quantity = np.divide(holding_trade, price, out=np.zeros_like(holding_trade), where=price > 0)
+
+    def percent(values, total):
+        return np.round(values / total * 100, 2) if total > 0 else np.zeros_like(values)
+
+    before_total, after_total = current.sum(), resulting.sum()
+    before_pct, after_pct = percent(current, before_total), percent(resulting, after_total)
+
+    return {
+        'group_by': group_by,
+        'mode': mode,
+        'total_value': float(before_total),
+        'cash': cash,
+        'cash_used': float(max(invested, 0)),
+        'cash_required': float(max(invested - cash, 0)),
+        'groups': [{
+            'key': key,
+            'current_value': float(current[i]),
+            'current_percent': float(before_pct[i]),
+            'target_percent': round(float(weights[i] * 100), 2),
+            'trade_value': float(trades[i]),
+            'resulting_value': float(resulting[i]),
+            'resulting_percent': float(after_pct[i])
+        } for i, key in enumerate(group_keys)],
+        'trades': [{
+            'investment_id': int(portfolio.ids[i]),
+            'name': portfolio.names[i],
+            'symbol': portfolio.symbols[i],
+            'action': 'buy' if holding_trade[i] > 0 else 'sell',
+            'value': round(float(abs(holding_trade[i])), 2),
+            'quantity': float(abs(holding_quantity[i])),
+            'price': float(price[i])
+        } for i in np.flatnonzero(np.abs(holding_trade) >= 0.005)],
+        'unallocated': [{
+            'key': key,
+            'trade_value': float(trades[i])
+        } for i, key in enumerate(group_keys) if group_count[i] == 0 and abs(trades[i]) >= 0.005]
+    }
@@ -0,0 +1,227 @@
+"""Login sessions, token revocation and expiry sweeping.
+
+A session row stores SHA-256 digests of its access and refresh token JTIs
+(indexed), so lookups never compare raw token text. Access tokens carry
+the refresh digest as a ``sid`` claim, so every access token a session
+ever issued (not just the latest one, which is all ``token_hash`` keeps
+after a refresh) is revoked with it. Revocation is one
+``UPDATE`` per call. The JWT blocklist check reads an in-process LRU:
+revoked entries are final and cached until evicted, active entries are
+only trusted for ``SESSION_CACHE_TTL`` seconds so a revocation made by
+another worker is seen quickly. ``SessionSweeper`` deletes expired rows in
+batches from a daemon thread.
+"""
+import hashlib
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from flask_jwt_extended import create_access_token, create_refresh_token, decode_token
+from sqlalchemy import delete, select, update, or_
+
+from ..models.user import db, UserSession
+from ..utils.logger import app_logger
+
+logger = app_logger
+
+SESSION_CACHE_SIZE = int(os.getenv('SESSION_CACHE_SIZE', '10000'))
+SESSION_CACHE_TTL = float(os.getenv('SESSION_CACHE_TTL', '5'))
+SESSION_CLAIM = 'sid'
+
+
+def hash_jti(jti):
+    return hashlib.sha256(jti.encode('utf-8')).hexdigest()
+
+
+class JtiBlocklist:
+    """LRU of {jti digest: (user_id, revoked, cached_at)}"""
+
+    def __init__(self, max_size=SESSION_CACHE_SIZE, active_ttl=SESSION_CACHE_TTL):
+        self.max_size = max_size
+        self.active_ttl = active_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, digest):
+        """True/False when known, None when the database must be asked"""
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None or (not entry[1] and time.monotonic() - entry[2] >= self.active_ttl):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, digest, user_id, revoked):
+        with self._lock:
+            self._entries[digest] = (user_id, revoked, time.monotonic())
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def revoke(self, digests=(), user_id=None):
+        """Mark digests (and every cached digest of ``user_id``) revoked"""
+        now = time.monotonic()
+        with self._lock:
+            for digest in digests:
+                if digest:
+                    self._entries[digest] = (user_id, True, now)
+            if user_id is not None:
+                for digest, entry in list(self._entries.items()):
+                    if entry[0] == user_id:
+                        self._entries[digest] = (user_id, True, now)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+blocklist = JtiBlocklist()
+
+
+def issue_access_token(user_id, refresh_jti):
+    """Access token tied to the session of the refresh token ``refresh_jti``"""
+    return create_access_token(identity=str(user_id), additional_claims={SESSION_CLAIM: hash_jti(refresh_jti)})
+
+
+def issue_tokens(user_id):
+    """(access_token, refresh_token) for a new session"""
+    refresh_token = create_refresh_token(identity=str(user_id))
+    return issue_access_token(user_id, decode_token(refresh_token)['jti']), refresh_token
+
+
+def create_session(user_id, access_token, refresh_token, ip_address=None, user_agent=None):
+    """Add a session for a freshly issued token pair; the caller commits"""
+    refresh_claims = decode_token(refresh_token)
+    session = UserSession(
+        user_id=user_id,
+        token_hash=hash_jti(decode_token(access_token)['jti']),
+        refresh_token_hash=hash_jti(refresh_claims['jti']),
+        expires_at=datetime.utcfromtimestamp(refresh_claims['exp']),
+        ip_address=ip_address,
+        user_agent=(user_agent or '')[:255]
+    )
+    db.session.add(session)
+    return session
+
+
+def rotate_access_token(refresh_jti, access_token):
+    """Point the session owning ``refresh_jti`` at a new access token.
+
+    Returns False when the session is missing or revoked. The caller commits.
+    """
+    result = db.session.execute(
+        update(UserSession).where(
+            UserSession.refresh_token_hash == hash_jti(refresh_jti),
+            UserSession.is_active.is_(True)
+        ).values(
+            token_hash=hash_jti(decode_token(access_token)['jti']),
+            last_used=datetime.utcnow()
+        )
+    )
+    return result.rowcount > 0
+
+
+def revoke_user_sessions(user_id):
+    """Deactivate every active session of a user with one UPDATE; the caller commits"""
+    user_id = int(user_id)
+    result = db.session.execute(
+        update(UserSession).where(
+            UserSession.user_id == user_id,
+            UserSession.is_active.is_(True)
+        ).values(is_active=False)
+    )
+    blocklist.revoke(user_id=user_id)
+    return result.rowcount
+
+
+def is_token_revoked(jwt_payload):
+    """Blocklist check for a decoded JWT.
+
+    Tokens that belong to a deactivated session are revoked: access tokens
+    through their ``sid`` claim, refresh tokens by digest. Tokens with no
+    session (e.g. issued by scripts or tests) are not.
+    """
+    jti = jwt_payload.get('jti')
+    if not jti:
+        return False
+    digest = hash_jti(jti)
+    cached = blocklist.get(digest)
+    if cached is not None:
+        return cached
+
+    sid = jwt_payload.get(SESSION_CLAIM)
+    if sid:
+        owner = UserSession.refresh_token_hash == sid
+    else:
+        owner = or_(UserSession.token_hash == digest, UserSession.refresh_token_hash == digest)
+    row = db.session.execute(
+        select(UserSession.user_id, UserSession.is_active).where(owner).limit(1)
+    ).first()
+    revoked = row is not None and not row.is_active
+    blocklist.set(digest, row.user_id if row is not None else None, revoked)
+    return revoked
+
+
+def purge_expired_sessions(batch_size=1000, now=None):
+    """Delete expired sessions ``batch_size`` rows at a time; returns rows deleted.
+
+    Small batches keep each transaction (and its locks) short on a busy table.
+    """
+    now = now or datetime.utcnow()
+    deleted = 0
+    while True:
+        ids = select(UserSession.id).where(UserSession.expires_at < now).limit(batch_size)
+        result = db.session.execute(
+            delete(UserSession).where(UserSession.id.in_(ids)).execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        deleted += result.rowcount
+        if result.rowcount < batch_size:
+            return deleted
+
+
+class SessionSweeper:
+    """Daemon thread that calls purge_expired_sessions every ``interval`` seconds"""
+
+    def __init__(self, app, interval=3600, batch_size=1000):
+        self.app = app
+        self.interval = interval
+        self.batch_size = batch_size
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run_once(self):
+        with self.app.app_context():
+            try:
+                deleted = purge_expired_sessions(self.batch_size)
+                if deleted:
+                    logger.info(f"Purged {deleted} expired sessions")
+                return deleted
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Session sweep failed: {e}")
+                return 0
+            finally:
+                db.session.remove()
+
+    def _loop(self):
+        # Spread workers out so they do not all sweep at the same moment
+        while not self._stop.wait(self.interval * random.uniform(0.9, 1.1)):
+            self.run_once()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name='session-sweeper', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
@@ -0,0 +1,208 @@
+"""Per-worker caches for the authenticated request path.
+
+``CachingJWTManager`` remembers the claims of tokens it has already
+verified, keyed by the encoded token (which includes its signature) and
+the decode key, so a repeat request skips the HMAC check and JSON parsing
+for ``CLAIMS_CACHE_TTL`` seconds; ``exp``/``nbf`` are still enforced on
+every hit. ``get_cached_user`` serves a read-only snapshot of a user for
+``USER_CACHE_TTL`` seconds.
+
+Both caches carry a per-user version. Committing any change to a User row
+(password, deactivation, profile) bumps it, which drops that user's
+cached claims and snapshot in this worker; other workers pick the change
+up when their short TTL expires, while revoked tokens are already refused
+by the session blocklist. Versions are kept for the ``USER_VERSIONS_SIZE``
+most recently changed users and drawn from one counter, so a user whose
+version was evicted gets a version newer than any cached entry's.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from flask_jwt_extended import JWTManager
+from flask_jwt_extended.config import config
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from ..models.user import db, User
+from .tracing import start_span
+
+CLAIMS_CACHE_SIZE = int(os.getenv('CLAIMS_CACHE_SIZE', '4096'))
+USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', '4096'))
+USER_CACHE_TTL = float(os.getenv('USER_CACHE_TTL', '30'))
+CLAIMS_CACHE_TTL = float(os.getenv('CLAIMS_CACHE_TTL', str(USER_CACHE_TTL)))
+USER_VERSIONS_SIZE = int(os.getenv('USER_VERSIONS_SIZE', '4096'))
+
+
+class _UserVersions:
+    """Bounded ``user -> version`` of recently changed users"""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._versions = OrderedDict()
+        self._lock = threading.Lock()
+        self._counter = 0
+        # Version of every user not tracked; above any version an evicted user had
+        self._floor = 0
+
+    def get(self, key):
+        with self._lock:
+            return self._versions.get(key, self._floor)
+
+    def bump(self, key):
+        with self._lock:
+            self._counter += 1
+            self._versions[key] = self._counter
+            self._versions.move_to_end(key)
+            while len(self._versions) > self.max_size:
+                self._versions.popitem(last=False)
+                self._floor = self._counter
+
+    def __len__(self):
+        return len(self._versions)
+
+
+_versions = _UserVersions(USER_VERSIONS_SIZE)
+
+
+def user_version(user_id):
+    return _versions.get(str(user_id))
+
+
+class _LRU:
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {'size': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+claims_cache = _LRU(CLAIMS_CACHE_SIZE)
+user_cache = _LRU(USER_CACHE_SIZE)
+
+
+def invalidate_user(user_id):
+    """Drop cached state for a user in this worker by bumping its version"""
+    key = str(user_id)
+    _versions.bump(key)
+    user_cache.pop(key)
+
+
+class CachingJWTManager(JWTManager):
+    """JWTManager that reuses the claims of already verified tokens"""
+
+    def _decode_jwt_from_config(self, encoded_token, csrf_value=None, allow_expired=False):
+        with start_span('jwt.decode') as span:
+            claims, hit = self._decode_cached(encoded_token, csrf_value, allow_expired)
+            if span is not None:
+                span.set_attribute('jwt.cache_hit', hit)
+            return claims
+
+    def _decode_cached(self, encoded_token, csrf_value, allow_expired):
+        """(claims, served from cache)"""
+        if csrf_value is not None or allow_expired:
+            return super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired), False
+
+        key = (encoded_token, config.decode_key)
+        entry = claims_cache.get(key)
+        if entry is not None:
+            claims, version, cached_at = entry
+            leeway = config.leeway
+            leeway = leeway.total_seconds() if isinstance(leeway, timedelta) else (leeway or 0)
+            now = time.time()
+            if (version == user_version(claims.get(config.identity_claim_key))
+                    and time.monotonic() - cached_at < CLAIMS_CACHE_TTL
+                    and ('exp' not in claims or now <= claims['exp'] + leeway)
+                    and ('nbf' not in claims or now >= claims['nbf'] - leeway)):
+                return dict(claims), True
+            claims_cache.pop(key)
+
+        claims = super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+        claims_cache.set(key, (dict(claims), user_version(claims.get(config.identity_claim_key)), time.monotonic()))
+        return claims, False
+
+
+class CachedUser:
+    """Read-only snapshot of the user fields the auth routes need"""
+
+    __slots__ = ('id', 'email', 'is_active', 'version', '_data')
+
+    def __init__(self, user, version):
+        self.id = user.id
+        self.email = user.email
+        self.is_active = user.is_active
+        self.version = version
+        self._data = user.to_dict(include_sensitive=True)
+
+    def to_dict(self, include_sensitive=False):
+        data = dict(self._data)
+        if not include_sensitive:
+            data.pop('last_login', None)
+        return data
+
+
+def get_cached_user(user_id):
+    """Snapshot of a user, reloaded after USER_CACHE_TTL seconds or a version change"""
+    key = str(user_id)
+    version = user_version(key)
+    entry = user_cache.get(key)
+    if entry is not None:
+        snapshot, cached_at = entry
+        if snapshot.version == version and time.monotonic() - cached_at < USER_CACHE_TTL:
+            return snapshot
+
+    user = db.session.get(User, int(user_id))
+    if user is None:
+        return None
+    snapshot = CachedUser(user, version)
+    user_cache.set(key, (snapshot, time.monotonic()))
+    return snapshot
+
+
+@event.listens_for(User, 'after_update')
+def _mark_user_changed(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('changed_users', set()).add(target.id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_changed_users(session):
+    for user_id in session.info.pop('changed_users', ()):
+        invalidate_user(user_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_changed_users(session):
+    session.info.pop('changed_users', None)
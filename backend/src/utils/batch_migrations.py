@@ -0,0 +1,235 @@
+"""Batched, resumable data changes for migrations on large tables.
+
+A single ``INSERT ... SELECT`` or ``UPDATE`` over millions of rows holds
+its locks (on SQLite, the whole database) until it finishes. These helpers
+walk the table by primary key instead, committing every ``batch_size`` rows
+and sleeping ``pause`` seconds between batches so application writes get
+through. Progress is logged with a rate and ETA.
+
+Each helper can be re-run after an interruption and picks up where it
+stopped: ``copy_in_batches`` resumes from the highest key already copied,
+``backfill_in_batches`` only touches rows still matching ``pending``.
+
+Call them from a revision inside ``op.get_context().autocommit_block()`` so
+Alembic's own transaction is not holding locks while the batches run::
+
+    with op.get_context().autocommit_block():
+        backfill_in_batches(op.get_bind().engine, 'transactions',
+                            "remarks = ''", pending='remarks IS NULL')
+
+The helpers run on SQLite and PostgreSQL (``rebuild_table`` has sync
+triggers for those two only). The test suite covers SQLite always and
+PostgreSQL only when ``TEST_POSTGRES_URL`` points at a scratch database;
+revision 0002 uses ``rebuild_table`` on SQLite alone, since PostgreSQL can
+drop the constraint in place.
+"""
+import os
+import time
+
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateTable
+
+from .logger import app_logger
+
+logger = app_logger
+
+MIGRATION_BATCH_SIZE = int(os.getenv('MIGRATION_BATCH_SIZE', '5000'))
+MIGRATION_BATCH_PAUSE = float(os.getenv('MIGRATION_BATCH_PAUSE', '0.05'))
+
+
+class BatchProgress:
+    """Rows done out of ``total``, logged at most every ``log_every`` seconds"""
+
+    def __init__(self, label, total, log_every=5.0):
+        self.label = label
+        self.total = total
+        self.done = 0
+        self.batches = 0
+        self.log_every = log_every
+        self.started = time.monotonic()
+        self._logged = self.started
+
+    def advance(self, rows):
+        self.done += rows
+        self.batches += 1
+        now = time.monotonic()
+        if now - self._logged >= self.log_every:
+            self._logged = now
+            logger.info(self.describe())
+
+    def describe(self):
+        elapsed = time.monotonic() - self.started
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        remaining = max(self.total - self.done, 0)
+        eta = f"{remaining / rate:.0f}s" if rate else '?'
+        percent = 100.0 * self.done / self.total if self.total else 100.0
+        return (f"{self.label}: {self.done}/{self.total} rows ({percent:.1f}%), "
+                f"{rate:.0f} rows/s, ETA {eta}")
+
+    def finish(self):
+        logger.info(f"{self.describe()} - done in {self.batches} batches")
+
+
+def _settings(batch_size, pause):
+    return (batch_size or MIGRATION_BATCH_SIZE,
+            MIGRATION_BATCH_PAUSE if pause is None else pause)
+
+
+def copy_in_batches(engine, source, target, columns, select=None, key='id',
+                    batch_size=None, pause=None):
+    """Copy ``source`` rows into ``target`` in key order, one commit per batch.
+
+    ``columns`` are the target columns and ``select`` the matching source
+    expressions (default: the same names). Rows with a key above the
+    highest one already in ``target`` are copied, so an interrupted copy
+    resumes on the next call. Returns the number of rows copied.
+    """
+    batch_size, pause = _settings(batch_size, pause)
+    insert_columns = ', '.join(columns)
+    select_columns = ', '.join(select or columns)
+    with engine.connect() as conn:
+        last = conn.execute(text(f"SELECT COALESCE(MAX({key}), 0) FROM {target}")).scalar()
+        total = conn.execute(text(f"SELECT COUNT(*) FROM {source} WHERE {key} > :last"), {'last': last}).scalar()
+    progress = BatchProgress(f"copy {source} -> {target}", total)
+
+    while True:
+        with engine.begin() as conn:
+            last = conn.execute(text(f"SELECT COALESCE(MAX({key}), 0) FROM {target}")).scalar()
+            upto = conn.execute(text(
+                f"SELECT MAX({key}) FROM (SELECT {key} FROM {source} WHERE {key} > :last "
+                f"ORDER BY {key} LIMIT :limit) AS batch"
+            ), {'last': last, 'limit': batch_size}).scalar()
+            if upto is None:
+                break
+            result = conn.execute(text(
+                f"INSERT INTO {target} ({insert_columns}) SELECT {select_columns} FROM {source} "
+                f"WHERE {key} > :last AND {key} <= :upto"
+            ), {'last': last, 'upto': upto})
+        progress.advance(result.rowcount)
+        if pause:
+            time.sleep(pause)
+    progress.finish()
+    return progress.done
+
+
+def backfill_in_batches(engine, table, assignments, pending, key='id',
+                        batch_size=None, pause=None):
+    """``UPDATE table SET assignments`` for rows matching ``pending``, in key order.
+
+    ``pending`` must stop matching once a row is updated; that is what makes
+    a re-run skip finished rows. Returns the number of rows updated.
+    """
+    batch_size, pause = _settings(batch_size, pause)
+    with engine.connect() as conn:
+        total = conn.execute(text(f"SELECT COUNT(*) FROM {table} WHERE {pending}")).scalar()
+    progress = BatchProgress(f"backfill {table}", total)
+
+    last = None
+    while True:
+        with engine.begin() as conn:
+            after = '' if last is None else f"{key} > :last AND "
+            upto = conn.execute(text(
+                f"SELECT MAX({key}) FROM (SELECT {key} FROM {table} WHERE {after}({pending}) "
+                f"ORDER BY {key} LIMIT :limit) AS batch"
+            ), {'last': last, 'limit': batch_size}).scalar()
+            if upto is None:
+                break
+            result = conn.execute(text(
+                f"UPDATE {table} SET {assignments} WHERE {after}{key} <= :upto AND ({pending})"
+            ), {'last': last, 'upto': upto})
+        last = upto
+        progress.advance(result.rowcount)
+        if pause:
+            time.sleep(pause)
+    progress.finish()
+    return progress.done
+
+
+def _sync_trigger_sql(dialect, source, target, columns, select, key):
+    """Triggers replaying UPDATE/DELETE on already-copied rows into ``target``.
+
+    New rows need no trigger: their keys are above the copied range and the
+    next batch picks them up. An updated row is deleted from ``target`` and
+    copied again only if it is inside the copied range.
+    """
+    insert_columns = ', '.join(columns)
+    select_columns = ', '.join(select)
+    recopy = (f"INSERT INTO {target} ({insert_columns}) SELECT {select_columns} FROM {source} "
+              f"WHERE {key} = NEW.{key} AND NEW.{key} <= (SELECT COALESCE(MAX({key}), 0) FROM {target})")
+    if dialect == 'sqlite':
+        return [
+            f"CREATE TRIGGER IF NOT EXISTS {target}_sync_update AFTER UPDATE ON {source} BEGIN "
+            f"DELETE FROM {target} WHERE {key} = OLD.{key}; {recopy}; END",
+            f"CREATE TRIGGER IF NOT EXISTS {target}_sync_delete AFTER DELETE ON {source} BEGIN "
+            f"DELETE FROM {target} WHERE {key} = OLD.{key}; END",
+        ]
+    if dialect == 'postgresql':
+        return [
+            f"CREATE OR REPLACE FUNCTION {target}_sync() RETURNS trigger AS $$ BEGIN "
+            f"DELETE FROM {target} WHERE {key} = OLD.{key}; "
+            f"IF TG_OP = 'UPDATE' THEN {recopy}; END IF; RETURN NULL; END $$ LANGUAGE plpgsql",
+            f"DROP TRIGGER IF EXISTS {target}_sync ON {source}",
+            f"CREATE TRIGGER {target}_sync AFTER UPDATE OR DELETE ON {source} "
+            f"FOR EACH ROW EXECUTE FUNCTION {target}_sync()",
+        ]
+    raise ValueError(f"Online table rebuilds are not supported on {dialect}")
+
+
+def _drop_trigger_sql(dialect, source, target):
+    if dialect == 'sqlite':
+        return [f"DROP TRIGGER IF EXISTS {target}_sync_update", f"DROP TRIGGER IF EXISTS {target}_sync_delete"]
+    return [f"DROP TRIGGER IF EXISTS {target}_sync ON {source}", f"DROP FUNCTION IF EXISTS {target}_sync()"]
+
+
+def rebuild_table(engine, table, columns=None, select=None, key='id', batch_size=None, pause=None):
+    """Replace a table with the definition in ``table`` (a ``sa.Table``), copying rows in batches.
+
+    The new table is created as ``<name>_rebuild`` and filled by
+    ``copy_in_batches`` while triggers keep already-copied rows in step with
+    writes to the live table. Only the final swap (copy the last rows, drop,
+    rename, recreate indexes) runs in one short transaction. Re-running
+    after an interruption continues the copy.
+    """
+    name = table.name
+    target = f"{name}_rebuild"
+    columns = columns or [column.name for column in table.columns]
+    select = select or columns
+    dialect = engine.dialect.name
+
+    inspector = inspect(engine)
+    referenced_by = [other for other in inspector.get_table_names() if other not in (name, target) and any(
+        fk['referred_table'] == name for fk in inspector.get_foreign_keys(other))]
+    if referenced_by and dialect != 'sqlite':
+        raise ValueError(f"{name} is referenced by {', '.join(referenced_by)}; alter it in place instead")
+
+    # Same MetaData, so foreign keys to tables defined next to ``table`` resolve
+    staging = table.metadata.tables.get(target)
+    if staging is None:
+        staging = table.to_metadata(table.metadata, name=target)
+    with engine.begin() as conn:
+        if not inspector.has_table(target):
+            conn.execute(CreateTable(staging))
+        for statement in _sync_trigger_sql(dialect, name, target, columns, select, key):
+            conn.execute(text(statement))
+
+    copied = copy_in_batches(engine, name, target, columns, select, key, batch_size, pause)
+
+    with engine.begin() as conn:
+        # Rows inserted since the last batch, then the swap
+        conn.execute(text(
+            f"INSERT INTO {target} ({', '.join(columns)}) SELECT {', '.join(select)} FROM {name} "
+            f"WHERE {key} > (SELECT COALESCE(MAX({key}), 0) FROM {target})"
+        ))
+        for statement in _drop_trigger_sql(dialect, name, target):
+            conn.execute(text(statement))
+        conn.execute(text(f"DROP TABLE {name}"))
+        conn.execute(text(f"ALTER TABLE {target} RENAME TO {name}"))
+        for index in table.indexes:
+            index.create(conn)
+        if dialect == 'postgresql':
+            conn.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{name}', '{key}'), "
+                f"COALESCE((SELECT MAX({key}) FROM {name}), 1))"
+            ))
+    logger.info(f"Rebuilt {name} ({copied} rows copied in batches)")
+    return copied
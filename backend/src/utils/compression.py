@@ -0,0 +1,171 @@
+"""Brotli/gzip compression of API responses.
+
+nginx only compresses what it serves itself (there is no ``gzip_proxied``),
+so API responses used to leave Flask and the proxy uncompressed. When the
+client accepts it, ``init_compression`` compresses responses whose content
+type is in ``COMPRESSION_TYPES``:
+
+- buffered responses of at least ``COMPRESSION_MIN_SIZE`` bytes, in one go
+  (kept as they are if compressing does not make them smaller)
+- streamed (generator) responses chunk by chunk, flushing after each chunk
+  so the client gets data as soon as the view yields it and the body is
+  never held in memory
+
+Brotli is preferred when the ``brotli`` package is installed and the client
+lists ``br``; gzip otherwise. Responses that already have a
+Content-Encoding, file responses, range responses and ``Cache-Control:
+no-transform`` are left alone.
+"""
+import gzip
+import os
+import zlib
+
+from flask import request
+
+from .logger import app_logger
+from .metrics import compressed_responses, compression_saved_bytes
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - gzip only without it
+    brotli = None
+
+logger = app_logger
+
+DEFAULT_TYPES = (
+    'application/json', 'application/msgpack', 'application/x-msgpack', 'application/x-ndjson',
+    'application/javascript', 'text/plain', 'text/csv', 'text/html', 'text/css', 'image/svg+xml'
+)
+SKIP_STATUSES = (204, 206, 304)
+
+
+class _GzipStream:
+    def __init__(self, level):
+        self._zlib = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31: gzip header and trailer
+
+    def compress(self, chunk):
+        return self._zlib.compress(chunk) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._zlib.flush()
+
+
+class _BrotliStream:
+    def __init__(self, quality):
+        self._brotli = brotli.Compressor(quality=quality)
+
+    def compress(self, chunk):
+        return self._brotli.process(chunk) + self._brotli.flush()
+
+    def finish(self):
+        return self._brotli.finish()
+
+
+class ResponseCompressor:
+    def __init__(self, min_size=1024, types=DEFAULT_TYPES, gzip_level=6, brotli_quality=4, enabled=True):
+        self.min_size = min_size
+        self.types = frozenset(types)
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.enabled = enabled
+
+    def encodings(self):
+        return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+    def compressible(self, response):
+        """Whether ``response`` may be compressed at all, whatever the client accepts"""
+        return (self.enabled
+                and 200 <= response.status_code and response.status_code not in SKIP_STATUSES
+                and request.method != 'HEAD'
+                and not response.direct_passthrough
+                and 'Content-Encoding' not in response.headers
+                and response.mimetype in self.types
+                and 'no-transform' not in response.headers.get('Cache-Control', ''))
+
+    def compress(self, data, encoding):
+        if encoding == 'br':
+            return brotli.compress(data, quality=self.brotli_quality)
+        return gzip.compress(data, compresslevel=self.gzip_level, mtime=0)
+
+    def stream(self, iterable, encoding):
+        """Compressed chunks of ``iterable``, one per chunk it yields"""
+        compressor = _BrotliStream(self.brotli_quality) if encoding == 'br' else _GzipStream(self.gzip_level)
+        received = sent = 0
+        try:
+            for chunk in iterable:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode()
+                if not chunk:
+                    continue
+                body = compressor.compress(chunk)
+                received += len(chunk)
+                sent += len(body)
+                yield body
+            body = compressor.finish()
+            sent += len(body)
+            yield body
+            compression_saved_bytes.inc(encoding, amount=max(received - sent, 0))
+        finally:
+            close = getattr(iterable, 'close', None)
+            if close is not None:
+                close()
+
+    def process(self, response):
+        if not self.compressible(response):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = request.accept_encodings.best_match(self.encodings())
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            length = response.content_length
+            if length is not None and length < self.min_size:
+                return response
+            response.response = self.stream(response.response, encoding)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < self.min_size:
+                return response
+            body = self.compress(data, encoding)
+            if len(body) >= len(data):
+                return response
+            response.set_data(body)
+            compression_saved_bytes.inc(encoding, amount=len(data) - len(body))
+
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            # Same resource, different bytes
+            response.set_etag(etag, weak=True)
+        compressed_responses.inc(encoding)
+        return response
+
+
+def build_compressor():
+    types = os.getenv('COMPRESSION_TYPES')
+    return ResponseCompressor(
+        min_size=int(os.getenv('COMPRESSION_MIN_SIZE', '1024')),
+        types=[t.strip() for t in types.split(',') if t.strip()] if types else DEFAULT_TYPES,
+        gzip_level=int(os.getenv('COMPRESSION_GZIP_LEVEL', '6')),
+        brotli_quality=int(os.getenv('COMPRESSION_BROTLI_QUALITY', '4')),
+        enabled=os.getenv('COMPRESSION_ENABLED', 'true').lower() == 'true'
+    )
+
+
+def init_compression(app):
+    """Compress responses after every other hook has seen them.
+
+    after_request hooks run in reverse order of registration, so call this
+    before the hooks that read or log response bodies are registered.
+    """
+    compressor = app.extensions['compression'] = build_compressor()
+    if brotli is None:
+        logger.debug("brotli is not installed, compressing responses with gzip only")
+
+    @app.after_request
+    def compress_response(response):
+        return compressor.process(response)
+
+    return compressor
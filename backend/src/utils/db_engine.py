@@ -0,0 +1,148 @@
+"""Engine options, SQLite tuning and connection-pool statistics.
+
+Each gunicorn worker has its own pool, used by its ``GUNICORN_THREADS``
+request threads plus a few background threads (session sweeper,
+slow-query EXPLAIN, trace export). The pool keeps one connection per
+thread; overflow connections are capped so that ``workers x (pool_size +
+max_overflow)`` stays within ``DB_MAX_CONNECTIONS`` on the server.
+``DB_POOL_*`` settings override any of the computed values.
+
+SQLite connections get WAL journaling (readers no longer block the
+writer), ``synchronous=NORMAL`` (durable across app crashes, fsync only at
+checkpoints), a memory map and page cache, and a busy timeout so a writer
+waits for the lock instead of failing with "database is locked".
+"""
+import os
+
+from sqlalchemy import event
+
+from .logger import app_logger
+from .metrics import InstrumentedQueuePool
+
+logger = app_logger
+
+BACKGROUND_CONNECTIONS = 2
+
+SQLITE_PRAGMAS = (
+    ('journal_mode', 'SQLITE_JOURNAL_MODE', 'WAL'),
+    ('synchronous', 'SQLITE_SYNCHRONOUS', 'NORMAL'),
+    ('busy_timeout', 'SQLITE_BUSY_TIMEOUT_MS', '5000'),
+    ('mmap_size', 'SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)),
+    ('cache_size', 'SQLITE_CACHE_SIZE', '-65536'),  # negative: KiB, so 64 MiB
+    ('temp_store', 'SQLITE_TEMP_STORE', 'MEMORY'),
+)
+
+
+def _int_env(name, default):
+    value = os.getenv(name)
+    return int(value) if value not in (None, '') else default
+
+
+def pool_settings(workers=None, threads=None):
+    """Pool size, overflow and the resulting connection total per deployment"""
+    workers = workers or _int_env('GUNICORN_WORKERS', 4)
+    threads = threads or _int_env('GUNICORN_THREADS', 2)
+    max_connections = _int_env('DB_MAX_CONNECTIONS', 100)
+
+    pool_size = _int_env('DB_POOL_SIZE', threads + BACKGROUND_CONNECTIONS)
+    overflow_budget = max(max_connections // workers - pool_size, 0)
+    max_overflow = _int_env('DB_MAX_OVERFLOW', min(threads, overflow_budget))
+    total = workers * (pool_size + max_overflow)
+    if total > max_connections:
+        logger.warning(
+            f"Connection pools can open {total} connections "
+            f"({workers} workers x {pool_size}+{max_overflow}), over DB_MAX_CONNECTIONS={max_connections}"
+        )
+    return {'pool_size': pool_size, 'max_overflow': max_overflow, 'max_connections_used': total}
+
+
+def engine_options(uri):
+    """SQLALCHEMY_ENGINE_OPTIONS for ``uri``"""
+    if ':memory:' in uri or uri.rstrip('/') == 'sqlite:':
+        # Flask-SQLAlchemy keeps one shared connection for in-memory SQLite
+        return {}
+
+    settings = pool_settings()
+    # Timed checkouts; the pool's logger is pinned at WARNING next to the class
+    options = {
+        'poolclass': InstrumentedQueuePool,
+        'echo_pool': False,
+        'pool_size': settings['pool_size'],
+        'max_overflow': settings['max_overflow'],
+        'pool_timeout': _int_env('DB_POOL_TIMEOUT', 10),
+    }
+    if uri.startswith('sqlite'):
+        # sqlite3's own lock wait, in seconds; the busy_timeout pragma repeats it
+        options['connect_args'] = {'timeout': _int_env('SQLITE_BUSY_TIMEOUT_MS', 5000) / 1000}
+    else:
+        # Server connections can be dropped by the server or a proxy while idle
+        options['pool_recycle'] = _int_env('DB_POOL_RECYCLE', 1800)
+        options['pool_pre_ping'] = os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'
+    return options
+
+
+def sqlite_pragmas():
+    """[(pragma, value)] to run on every new SQLite connection"""
+    return [(pragma, os.getenv(env, default)) for pragma, env, default in SQLITE_PRAGMAS
+            if os.getenv(env, default) != '']
+
+
+def apply_sqlite_pragmas(dbapi_connection, pragmas):
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma, value in pragmas:
+            cursor.execute(f"PRAGMA {pragma}={value}")
+    finally:
+        cursor.close()
+
+
+def init_engine(app, db):
+    """Tune SQLite connections of every bind as they are opened and publish pool gauges"""
+    from .metrics import pool_checked_out, pool_overflow, pool_size
+
+    with app.app_context():
+        engine = db.engine
+        engines = list(db.engines.values())
+
+    for bound in engines:
+        if bound.dialect.name == 'sqlite' and not event.contains(bound, 'connect', _on_sqlite_connect):
+            event.listen(bound, 'connect', _on_sqlite_connect)
+        for name, listener in _POOL_LISTENERS.items():
+            if not event.contains(bound, name, listener):
+                event.listen(bound, name, listener)
+
+    pool_size.callback = lambda: pool_stats(engine).get('size')
+    pool_checked_out.callback = lambda: pool_stats(engine).get('checked_out')
+    pool_overflow.callback = lambda: pool_stats(engine).get('overflow')
+    app.extensions['db_engine'] = engine
+    return engine
+
+
+def _on_sqlite_connect(dbapi_connection, connection_record):
+    apply_sqlite_pragmas(dbapi_connection, sqlite_pragmas())
+
+
+def _count_pool_event(name):
+    def listener(*args):
+        from .metrics import pool_events
+        pool_events.inc(name)
+    return listener
+
+
+_POOL_LISTENERS = {name: _count_pool_event(name) for name in ('connect', 'checkout', 'checkin')}
+
+
+def pool_stats(engine):
+    """Size, checked-in/out and overflow connections of ``engine``'s pool"""
+    pool = engine.pool
+    stats = {'class': type(pool).__name__}
+    if hasattr(pool, 'checkedout'):
+        stats.update({
+            'size': pool.size(),
+            'checked_in': pool.checkedin(),
+            'checked_out': pool.checkedout(),
+            'overflow': max(pool.overflow(), 0),
+            'max_overflow': pool._max_overflow,
+            'timeout': pool.timeout()
+        })
+    return stats
@@ -0,0 +1,250 @@
+"""Read-replica routing with read-your-writes stickiness.
+
+When ``DATABASE_REPLICA_URL`` is set it becomes the ``replica`` bind, and
+``RoutingSession`` sends SELECTs there during GET/HEAD requests. Everything
+else stays on the primary: writes and flushes, raw ``text()`` statements,
+anything after the session has written in the current transaction,
+queries run before the JWT is verified (the token blocklist check),
+GET views that write (``@use_primary``, or ``pin_primary()`` from the code
+that is about to write, so its reads see what it will change), and all
+requests from a user who committed a write in the last
+``REPLICA_STICKY_SECONDS``, so they read their own changes while the
+replica catches up.
+
+Recent writes are remembered in Redis so that every gunicorn worker honours
+them; that is the default with more than one worker (``GUNICORN_WORKERS``,
+exported by gunicorn.conf.py), and the app refuses to start with a replica
+and per-process marks (``REPLICA_STICKY_BACKEND=memory``) in that case.
+"""
+import functools
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask import g, has_request_context, request
+from flask_jwt_extended import get_jwt_identity
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+from .logger import app_logger
+
+logger = app_logger
+
+REPLICA_BIND = 'replica'
+READ_METHODS = ('GET', 'HEAD')
+
+
+class MemoryWriteMarks:
+    """Per-process ``user -> sticky until`` in a bounded LRU"""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._marks = OrderedDict()
+        self._lock = threading.Lock()
+
+    def mark(self, user_id, seconds):
+        with self._lock:
+            self._marks[user_id] = time.monotonic() + seconds
+            self._marks.move_to_end(user_id)
+            while len(self._marks) > self.max_keys:
+                self._marks.popitem(last=False)
+
+    def recent(self, user_id):
+        with self._lock:
+            until = self._marks.get(user_id)
+            if until is None:
+                return False
+            if until <= time.monotonic():
+                del self._marks[user_id]
+                return False
+            return True
+
+    def reset(self):
+        with self._lock:
+            self._marks.clear()
+
+
+class RedisWriteMarks:
+    """Marks shared by every worker, expired by Redis"""
+
+    def __init__(self, client, prefix='db-sticky:'):
+        self.client = client
+        self.prefix = prefix
+
+    def mark(self, user_id, seconds):
+        self.client.set(f"{self.prefix}{user_id}", '1', px=max(int(seconds * 1000), 1))
+
+    def recent(self, user_id):
+        return bool(self.client.exists(f"{self.prefix}{user_id}"))
+
+    def reset(self):
+        for key in self.client.scan_iter(match=self.prefix + '*'):
+            self.client.delete(key)
+
+
+class ReplicaRouter:
+    def __init__(self, marks, sticky_seconds=5.0):
+        self.marks = marks
+        self.sticky_seconds = sticky_seconds
+        self.replica_reads = 0
+        self.primary_reads = 0
+
+    def record_write(self, user_id):
+        if user_id is not None and self.sticky_seconds > 0:
+            self.marks.mark(str(user_id), self.sticky_seconds)
+
+    def recently_wrote(self, user_id):
+        if user_id is None:
+            return False
+        try:
+            return self.marks.recent(str(user_id))
+        except Exception as e:
+            # Without the marks, stay safe and read from the primary
+            logger.warning(f"Cannot check replica stickiness: {e}")
+            return True
+
+    def stats(self):
+        return {
+            'sticky_seconds': self.sticky_seconds,
+            'replica_reads': self.replica_reads,
+            'primary_reads': self.primary_reads
+        }
+
+
+def worker_count():
+    """Processes serving requests; a single one unless gunicorn says otherwise"""
+    return int(os.getenv('GUNICORN_WORKERS') or 1)
+
+
+def build_replica_router():
+    workers = worker_count()
+    backend = (os.getenv('REPLICA_STICKY_BACKEND') or ('redis' if workers > 1 else 'memory')).lower()
+    marks = None
+    if backend == 'redis':
+        try:
+            import redis
+            marks = RedisWriteMarks(redis.Redis.from_url(os.getenv('REDIS_URL', 'redis://localhost:6379/0')))
+        except Exception as e:
+            if workers > 1:
+                raise RuntimeError(f"Cannot use Redis for replica stickiness: {e}") from e
+            logger.error(f"Cannot use Redis for replica stickiness, falling back to memory: {e}")
+    elif workers > 1:
+        # Another worker would serve the next read without knowing about the write
+        raise RuntimeError(
+            f"REPLICA_STICKY_BACKEND={backend} keeps write marks per process; "
+            f"use redis with GUNICORN_WORKERS={workers}"
+        )
+    return ReplicaRouter(marks or MemoryWriteMarks(), sticky_seconds=float(os.getenv('REPLICA_STICKY_SECONDS', '5')))
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_replica_router():
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = build_replica_router()
+        return _router
+
+
+def set_replica_router(router):
+    """Install a router explicitly (tests, scripts)"""
+    global _router
+    with _router_lock:
+        _router = router
+
+
+def _request_user():
+    """JWT identity of the current request; raises RuntimeError before verification"""
+    return get_jwt_identity()
+
+
+def request_route():
+    """'replica' or 'primary' for reads in the current request; None while undecided"""
+    if not has_request_context() or request.method not in READ_METHODS:
+        return 'primary'
+    route = g.get('db_route')
+    if route is not None:
+        return route
+    try:
+        user_id = _request_user()
+    except RuntimeError:
+        # JWT not verified yet: decide once the view knows its user
+        return None
+    route = g.db_route = 'primary' if get_replica_router().recently_wrote(user_id) else 'replica'
+    return route
+
+
+def pin_primary():
+    """Read from the primary for the rest of this request, e.g. before a GET writes"""
+    if has_request_context():
+        g.db_route = 'primary'
+
+
+def use_primary(view):
+    """Keep every query of a view on the primary; for GET views that write"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        pin_primary()
+        return view(*args, **kwargs)
+    return wrapper
+
+
+class RoutingSession(Session):
+    """Flask-SQLAlchemy session that reads from the replica bind when the request allows"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and not self._flushing and not self.info.get('wrote')
+                and getattr(clause, 'is_select', False) and REPLICA_BIND in self._db.engines):
+            router = get_replica_router()
+            if request_route() == 'replica':
+                router.replica_reads += 1
+                return self._db.engines[REPLICA_BIND]
+            router.primary_reads += 1
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _mark_session_written(session, flush_context):
+    session.info['wrote'] = True
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _record_committed_write(session):
+    if not session.info.pop('wrote', False) or not has_request_context():
+        return
+    if REPLICA_BIND not in session._db.engines:
+        return
+    try:
+        user_id = _request_user()
+    except RuntimeError:
+        return
+    get_replica_router().record_write(user_id)
+    # Later reads in this request see the write too
+    pin_primary()
+
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def _forget_session_write(session):
+    session.info.pop('wrote', None)
+
+
+def replica_url():
+    return os.getenv('DATABASE_REPLICA_URL') or None
+
+
+def init_replica_routing(app):
+    """Report the read route of each GET in ``X-DB-Route`` when a replica is configured"""
+    if REPLICA_BIND not in (app.config.get('SQLALCHEMY_BINDS') or {}):
+        return
+    # Fail at startup rather than serve stale reads with per-process marks
+    get_replica_router()
+
+    @app.after_request
+    def report_db_route(response):
+        if request.method in READ_METHODS:
+            response.headers['X-DB-Route'] = g.get('db_route') or 'primary'
+        return response
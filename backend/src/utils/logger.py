@@ -1,18 +1,155 @@
+import atexit
+import contextvars
+import json
 import logging
 import os
+import queue
+import random
 import sys
+import threading
 from datetime import datetime
-from logging.handlers import RotatingFileHandler
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 from flask import request, g
 import functools
 import time
 
-def setup_logger():
-    """Configure logging for the application"""
-    # Create logs directory in backend root (go up two levels from src/utils to backend root)
+OVERFLOW_POLICIES = ('drop', 'drop_oldest', 'block')
+
+# (request_id, trace_id) of the work in progress, stamped on every record
+_correlation = contextvars.ContextVar('log_correlation', default=None)
+_base_record_factory = logging.getLogRecordFactory()
+
+def set_correlation(request_id, trace_id=None):
+    """Tag records logged from this context; returns a token for reset_correlation"""
+    return _correlation.set((request_id, trace_id))
+
+def reset_correlation(token):
+    _correlation.reset(token)
+
+def current_request_id():
+    ids = _correlation.get()
+    return ids[0] if ids else None
+
+def _correlated_record_factory(*args, **kwargs):
+    record = _base_record_factory(*args, **kwargs)
+    ids = _correlation.get()
+    record.request_id, record.trace_id = ids if ids else ('-', None)
+    return record
+
+logging.setLogRecordFactory(_correlated_record_factory)
+
+class BoundedQueueHandler(QueueHandler):
+    """Enqueue records for the listener thread without formatting them.
+
+    When the queue is full the overflow policy decides what happens:
+    ``drop`` discards the new record, ``drop_oldest`` evicts the oldest
+    queued record, and ``block`` waits up to ``block_timeout`` seconds
+    before dropping. Dropped records are counted and reported by a warning
+    record once the queue has room again.
+    """
+    
+    def __init__(self, log_queue, overflow='drop', block_timeout=0.05):
+        super().__init__(log_queue)
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow must be one of {', '.join(OVERFLOW_POLICIES)}")
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.dropped = 0
+        self._unreported = 0
+        self._drop_lock = threading.Lock()
+    
+    def prepare(self, record):
+        # The listener formats; the request thread only hands the record over.
+        # Arguments stay lazy, so callers must not mutate them after logging.
+        return record
+    
+    def _put(self, record):
+        if self.overflow == 'block':
+            self.queue.put(record, timeout=self.block_timeout)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            if self.overflow != 'drop_oldest':
+                raise
+            try:
+                self.queue.get_nowait()
+                self._count_drop()
+            except queue.Empty:
+                pass
+            self.queue.put_nowait(record)
+    
+    def _count_drop(self):
+        with self._drop_lock:
+            self.dropped += 1
+            self._unreported += 1
+    
+    def enqueue(self, record):
+        try:
+            if self._unreported:
+                with self._drop_lock:
+                    unreported, self._unreported = self._unreported, 0
+                if unreported:
+                    try:
+                        self.queue.put_nowait(logging.LogRecord(
+                            'logging', logging.WARNING, __file__, 0,
+                            '⚠️ Log queue full: dropped %d records', (unreported,), None
+                        ))
+                    except queue.Full:
+                        with self._drop_lock:
+                            self._unreported += unreported
+            self._put(record)
+        except queue.Full:
+            self._count_drop()
+
+class LoggerNameFilter(logging.Filter):
+    """Pass (or, with ``exclude``, block) records from one logger tree"""
+    
+    def __init__(self, name, exclude=False):
+        super().__init__(name)
+        self.exclude = exclude
+    
+    def filter(self, record):
+        matched = super().filter(record)
+        return not matched if self.exclude else matched
+
+_queue_handler = None
+_listener = None
+
+def stop_log_listener():
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+atexit.register(stop_log_listener)
+
+def get_logging_stats():
+    if _queue_handler is None:
+        return {'async': False}
+    return {
+        'async': True,
+        'queue_depth': _queue_handler.queue.qsize(),
+        'queue_size': _queue_handler.queue.maxsize,
+        'overflow': _queue_handler.overflow,
+        'dropped': _queue_handler.dropped
+    }
+
+def get_log_dir():
+    """Create and return the logs directory (LOG_DIR, or logs/ in the backend root)"""
+    # Go up two levels from src/utils to the backend root
     backend_root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-    log_dir = os.path.join(backend_root, 'logs')
+    log_dir = os.getenv('LOG_DIR') or os.path.join(backend_root, 'logs')
     os.makedirs(log_dir, exist_ok=True)
+    return log_dir
+
+def setup_logger():
+    """Configure logging for the application"""
+    global _queue_handler, _listener
+    log_dir = get_log_dir()
     
     # Configure root logger
     logger = logging.getLogger()
@@ -22,21 +159,26 @@ def setup_logger():
     logger.handlers.clear()
     
     # Create formatters
+    # Records built without the factory (e.g. synthetic ones) get '-'
     detailed_formatter = logging.Formatter(
-        '%(asctime)s | %(levelname)-8s | %(name)-20s | %(funcName)-15s:%(lineno)-4d | %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
+        '%(asctime)s | %(levelname)-8s | %(name)-20s | %(funcName)-15s:%(lineno)-4d | %(request_id)s | %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S',
+        defaults={'request_id': '-'}
     )
     
     simple_formatter = logging.Formatter(
-        '%(asctime)s | %(levelname)-8s | %(message)s',
-        datefmt='%H:%M:%S'
+        '%(asctime)s | %(levelname)-8s | %(request_id)s | %(message)s',
+        datefmt='%H:%M:%S',
+        defaults={'request_id': '-'}
     )
     
+    if os.getenv('LOG_FORMAT', 'text').lower() == 'json':
+        detailed_formatter = simple_formatter = JsonFormatter()
+    
     # Console handler (for development)
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(logging.INFO)
     console_handler.setFormatter(simple_formatter)
-    logger.addHandler(console_handler)
     
     # File handler for all logs
     file_handler = RotatingFileHandler(
@@ -46,7 +188,6 @@ def setup_logger():
     )
     file_handler.setLevel(logging.DEBUG)
     file_handler.setFormatter(detailed_formatter)
-    logger.addHandler(file_handler)
     
     # Error file handler
     error_handler = RotatingFileHandler(
@@ -56,7 +197,6 @@ def setup_logger():
     )
     error_handler.setLevel(logging.ERROR)
     error_handler.setFormatter(detailed_formatter)
-    logger.addHandler(error_handler)
     
     # API requests file handler
     api_handler = RotatingFileHandler(
@@ -69,59 +209,133 @@ def setup_logger():
     
     # Create API logger
     api_logger = logging.getLogger('api')
-    api_logger.addHandler(api_handler)
-    api_logger.addHandler(console_handler)
+    api_logger.handlers.clear()
     api_logger.setLevel(logging.INFO)
     api_logger.propagate = False
     
+    stop_log_listener()
+    _queue_handler = None
+    if os.getenv('LOG_ASYNC', 'true').lower() != 'true':
+        logger.addHandler(console_handler)
+        logger.addHandler(file_handler)
+        logger.addHandler(error_handler)
+        api_logger.addHandler(api_handler)
+        api_logger.addHandler(console_handler)
+        return logger
+    
+    # API records go to api.log and the console only, everything else to
+    # the console, app.log and error.log, as with the synchronous handlers
+    file_handler.addFilter(LoggerNameFilter('api', exclude=True))
+    error_handler.addFilter(LoggerNameFilter('api', exclude=True))
+    api_handler.addFilter(LoggerNameFilter('api'))
+    
+    # Request threads only enqueue; one listener thread formats, writes and rotates
+    _queue_handler = BoundedQueueHandler(
+        queue.Queue(maxsize=int(os.getenv('LOG_QUEUE_SIZE', '10000'))),
+        overflow=os.getenv('LOG_QUEUE_OVERFLOW', 'drop').lower()
+    )
+    logger.addHandler(_queue_handler)
+    api_logger.addHandler(_queue_handler)
+    _listener = QueueListener(
+        _queue_handler.queue, console_handler, file_handler, error_handler, api_handler,
+        respect_handler_level=True
+    )
+    _listener.start()
+    
     return logger
 
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with correlation ids; ``extra={'http': ...}`` fields are merged in"""
+    
+    def format(self, record):
+        entry = {
+            'ts': datetime.utcfromtimestamp(record.created).isoformat(timespec='milliseconds') + 'Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        request_id = getattr(record, 'request_id', '-')
+        if request_id != '-':
+            entry['request_id'] = request_id
+        if getattr(record, 'trace_id', None):
+            entry['trace_id'] = record.trace_id
+        http = getattr(record, 'http', None)
+        if http:
+            entry.update(http)
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+def parse_sample_rates(value):
+    """Parse ``"/api/health=0,GET /api/investments/portfolio=0.1"`` into {route: rate}"""
+    rates = {}
+    for item in (value or '').split(','):
+        if '=' not in item:
+            continue
+        route, rate = item.rsplit('=', 1)
+        rates[route.strip()] = min(max(float(rate), 0.0), 1.0)
+    return rates
+
+_sample_rates = None
+
+def request_sample_rate():
+    """Sampling rate for this request's route (``METHOD rule`` beats ``rule``)"""
+    global _sample_rates
+    if _sample_rates is None:
+        _sample_rates = parse_sample_rates(os.getenv('LOG_SAMPLE_RATES', ''))
+        _sample_rates[None] = min(max(float(os.getenv('LOG_SAMPLE_RATE', '1.0')), 0.0), 1.0)
+    rule = request.url_rule.rule if request.url_rule is not None else request.path
+    rate = _sample_rates.get(f"{request.method} {rule}")
+    if rate is None:
+        rate = _sample_rates.get(rule, _sample_rates[None])
+    return rate
+
 def log_request_info():
-    """Log incoming request details"""
+    """Log incoming request details (sampled, and only when the level is enabled)"""
+    g.start_time = time.perf_counter()
     logger = logging.getLogger('api')
+    if not logger.isEnabledFor(logging.INFO):
+        g.log_sampled = False
+        return
     
-    # Get client IP
-    client_ip = request.headers.get('X-Forwarded-For', request.remote_addr)
+    rate = request_sample_rate()
+    g.log_sampled = rate >= 1.0 or (rate > 0.0 and random.random() < rate)
+    if not g.log_sampled:
+        return
     
-    # Get user agent
-    user_agent = request.headers.get('User-Agent', 'Unknown')
+    client_ip = request.headers.get('X-Forwarded-For', request.remote_addr)
     
     # Get authorization header (masked)
     auth_header = request.headers.get('Authorization', 'None')
     if auth_header and auth_header.startswith('Bearer '):
         auth_header = f"Bearer {auth_header[7:15]}..."
     
-    # Log request details
-    logger.info(f"🔵 {request.method} {request.path} | IP: {client_ip} | Auth: {auth_header}")
-    
-    if request.is_json and request.get_json():
-        data = request.get_json()
-        # Mask sensitive data
-        safe_data = mask_sensitive_data(data)
-        logger.debug(f"📝 Request body: {safe_data}")
+    logger.info("🔵 %s %s | IP: %s | Auth: %s", request.method, request.path, client_ip, auth_header,
+                extra={'http': {'event': 'request', 'method': request.method, 'path': request.path, 'ip': client_ip}})
     
-    # Store start time for response time calculation
-    g.start_time = time.time()
+    # The body is only parsed and masked when DEBUG output is actually wanted
+    if logger.isEnabledFor(logging.DEBUG) and request.is_json:
+        data = request.get_json(silent=True)
+        if data:
+            logger.debug("📝 Request body: %s", mask_sensitive_data(data))
 
 def log_response_info(response):
-    """Log response details"""
+    """Log response details; errors are always logged, successes follow the sampling decision"""
     logger = logging.getLogger('api')
+    status = response.status_code
+    if not (status >= 400 or g.get('log_sampled', False)) or not logger.isEnabledFor(logging.INFO):
+        return response
     
-    # Calculate response time
-    response_time = int((time.time() - g.get('start_time', time.time())) * 1000)
+    response_time = int((time.perf_counter() - g.get('start_time', time.perf_counter())) * 1000)
+    status_emoji = "✅" if 200 <= status < 300 else "❌" if status >= 400 else "⚠️"
+    logger.info("%s %s %s | Status: %s | Time: %sms", status_emoji, request.method, request.path, status, response_time,
+                extra={'http': {'event': 'response', 'method': request.method, 'path': request.path,
+                                'status': status, 'duration_ms': response_time}})
     
-    # Log response
-    status_emoji = "✅" if 200 <= response.status_code < 300 else "❌" if response.status_code >= 400 else "⚠️"
-    logger.info(f"{status_emoji} {request.method} {request.path} | Status: {response.status_code} | Time: {response_time}ms")
-    
-    # Log error responses with more detail
-    if response.status_code >= 400:
-        try:
-            if response.is_json:
-                error_data = response.get_json()
-                logger.error(f"💥 Error response: {error_data}")
-        except:
-            logger.error(f"💥 Error response: {response.get_data(as_text=True)[:200]}")
+    # Error bodies are logged as (truncated) text rather than parsed again
+    if status >= 400 and logger.isEnabledFor(logging.ERROR) and not response.is_streamed:
+        logger.error("💥 Error response: %s", response.get_data()[:200].decode('utf-8', 'replace').strip(),
+                     extra={'http': {'event': 'error_response', 'path': request.path, 'status': status}})
     
     return response
 
@@ -0,0 +1,356 @@
+"""Process metrics with Prometheus text exposition.
+
+Counters, gauges and histograms live in memory in each worker. When
+``METRICS_DIR`` is set (one directory shared by all gunicorn workers),
+every worker periodically writes a JSON snapshot of its metrics to
+``<pid>.json`` there, and ``/metrics`` merges all snapshots: counters and
+histograms are summed over every file, including those of workers that
+have exited, so totals never go backwards; gauges are summed over live
+workers only. Without ``METRICS_DIR`` only the current process is shown.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+
+from flask import Response, g, request
+from sqlalchemy.pool import QueuePool
+
+from .queries import current_queries
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+INF_LABEL = 'le="+Inf"'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        return tuple(str(value) for value in labels)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'type': self.kind,
+                'help': self.documentation,
+                'labels': list(self.labelnames),
+                'samples': [[list(key), self._dump(value)] for key, value in self._values.items()]
+            }
+
+    def _dump(self, value):
+        return value
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Set directly, or computed at collection time from ``callback``"""
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def set(self, *labels, value):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def snapshot(self):
+        if self.callback is not None:
+            try:
+                value = self.callback()
+            except Exception:
+                value = None
+            if value is not None:
+                self.set(value=value)
+        return super().snapshot()
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, *labels, value):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def snapshot(self):
+        data = super().snapshot()
+        data['buckets'] = list(self.buckets)
+        return data
+
+    def _dump(self, value):
+        return [list(value[0]), value[1], value[2]]
+
+
+class MetricsRegistry:
+    def __init__(self, directory=None):
+        self.directory = directory
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._flusher = None
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=(), callback=None):
+        return self._register(Gauge(name, documentation, labelnames, callback))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def snapshot(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+    # Multi-process support
+
+    def flush(self):
+        """Atomically write this process's snapshot to ``<directory>/<pid>.json``"""
+        if not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{os.getpid()}.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as handle:
+            json.dump(self.snapshot(), handle)
+        os.replace(tmp_path, path)
+
+    def start_flusher(self, interval=5.0):
+        if not self.directory or self._flusher is not None:
+            return
+
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.flush()
+                except OSError:
+                    pass
+
+        self._flusher = threading.Thread(target=loop, name='metrics-flusher', daemon=True)
+        self._flusher.start()
+        atexit.register(self.flush)
+
+    def _process_snapshots(self):
+        """[(alive, snapshot)] for every worker, this one collected live"""
+        own_pid = os.getpid()
+        snapshots = [(True, self.snapshot())]
+        if not self.directory or not os.path.isdir(self.directory):
+            return snapshots
+        for filename in os.listdir(self.directory):
+            if not filename.endswith('.json'):
+                continue
+            try:
+                pid = int(filename[:-5])
+            except ValueError:
+                continue
+            if pid == own_pid:
+                continue
+            try:
+                with open(os.path.join(self.directory, filename)) as handle:
+                    snapshots.append((_pid_alive(pid), json.load(handle)))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+    def collect(self):
+        """Merge every process's snapshot into one {name: metric data}"""
+        merged = {}
+        for alive, snapshot in self._process_snapshots():
+            for name, data in snapshot.items():
+                if data['type'] == 'gauge' and not alive:
+                    continue
+                target = merged.setdefault(name, {**data, 'samples': {}})
+                samples = target['samples']
+                for labels, value in data['samples']:
+                    key = tuple(labels)
+                    if data['type'] == 'histogram':
+                        current = samples.get(key)
+                        if current is None or len(current[0]) != len(value[0]):
+                            samples[key] = [list(value[0]), value[1], value[2]]
+                        else:
+                            samples[key] = [[a + b for a, b in zip(current[0], value[0])],
+                                            current[1] + value[1], current[2] + value[2]]
+                    else:
+                        samples[key] = samples.get(key, 0) + value
+        return merged
+
+    def render(self):
+        """Prometheus text exposition format (0.0.4)"""
+        lines = []
+        for name, data in sorted(self.collect().items()):
+            lines.append(f"# HELP {name} {data['help']}")
+            lines.append(f"# TYPE {name} {data['type']}")
+            labelnames = data['labels']
+            for labels, value in sorted(data['samples'].items()):
+                if data['type'] == 'histogram':
+                    counts, total, count = value
+                    cumulative = 0
+                    for bound, bucket_count in zip(data['buckets'], counts):
+                        cumulative += bucket_count
+                        le = f'le="{_format_value(float(bound))}"'
+                        lines.append(f"{name}_bucket{_format_labels(labelnames, labels, le)} {cumulative}")
+                    lines.append(f"{name}_bucket{_format_labels(labelnames, labels, INF_LABEL)} {count}")
+                    lines.append(f"{name}_sum{_format_labels(labelnames, labels)} {_format_value(float(total))}")
+                    lines.append(f"{name}_count{_format_labels(labelnames, labels)} {count}")
+                else:
+                    lines.append(f"{name}{_format_labels(labelnames, labels)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+registry = MetricsRegistry(os.getenv('METRICS_DIR') or None)
+
+http_requests = registry.counter(
+    'http_requests_total', 'HTTP requests by endpoint, method and status', ('endpoint', 'method', 'status'))
+http_latency = registry.histogram(
+    'http_request_duration_seconds', 'HTTP request latency by endpoint', ('endpoint', 'method'))
+request_queries = registry.histogram(
+    'http_request_db_queries', 'SQL statements executed per request', ('endpoint',), QUERY_COUNT_BUCKETS)
+request_db_time = registry.histogram(
+    'http_request_db_seconds', 'Time spent in SQL per request', ('endpoint',))
+compressed_responses = registry.counter(
+    'http_compressed_responses_total', 'Responses compressed by the app, by encoding', ('encoding',))
+compression_saved_bytes = registry.counter(
+    'http_compression_saved_bytes_total', 'Response bytes saved by compression', ('encoding',))
+pool_checkout_wait = registry.histogram(
+    'db_pool_checkout_seconds', 'Time waiting to check a connection out of the pool',
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0))
+pool_events = registry.counter(
+    'db_pool_events_total', 'Database pool connects, checkouts and checkins', ('event',))
+
+password_running = registry.gauge(
+    'bcrypt_running', 'Password hashes currently running')
+password_queue_depth = registry.gauge(
+    'bcrypt_queue_depth', 'Password hashes waiting for a free hashing slot')
+password_rejected = registry.gauge(
+    'bcrypt_rejected', 'Password hashes rejected because every hashing slot was taken (per process)')
+log_queue_depth = registry.gauge(
+    'log_queue_depth', 'Log records waiting for the listener thread')
+pool_size = registry.gauge(
+    'db_pool_size', 'Connections kept open by the database pool')
+pool_checked_out = registry.gauge(
+    'db_pool_checked_out', 'Pooled database connections currently in use')
+pool_overflow = registry.gauge(
+    'db_pool_overflow', 'Database connections opened beyond the pool size')
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_checkout_wait.observe(value=time.perf_counter() - start)
+
+
+# SQLAlchemy names pool loggers after the pool class. Outside the ``sqlalchemy``
+# namespace this one would inherit the root DEBUG level and log every checkout.
+logging.getLogger(f"{InstrumentedQueuePool.__module__}.{InstrumentedQueuePool.__name__}").setLevel(logging.WARNING)
+
+
+def init_metrics(app):
+    """Record per-request metrics and serve them at ``/metrics``"""
+    from .passwords import get_password_hasher
+    from .logger import get_logging_stats
+
+    password_running.callback = lambda: get_password_hasher().stats()['running']
+    password_queue_depth.callback = lambda: get_password_hasher().stats()['waiting']
+    password_rejected.callback = lambda: get_password_hasher().stats()['rejected']
+    log_queue_depth.callback = lambda: get_logging_stats().get('queue_depth')
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def record_request_metrics(response):
+        start = g.get('metrics_start')
+        if start is None:
+            return response
+        endpoint = request.endpoint or 'unmatched'
+        http_requests.inc(endpoint, request.method, response.status_code)
+        http_latency.observe(endpoint, request.method, value=time.perf_counter() - start)
+        queries = current_queries()
+        request_queries.observe(endpoint, value=queries.count if queries else 0)
+        request_db_time.observe(endpoint, value=queries.total_time if queries else 0.0)
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(registry.render(), mimetype=None, content_type=PROMETHEUS_CONTENT_TYPE)
+
+    registry.start_flusher(float(os.getenv('METRICS_FLUSH_INTERVAL', '5')))
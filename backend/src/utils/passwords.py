@@ -0,0 +1,175 @@
+"""Password hashing that can never occupy every request thread.
+
+bcrypt is deliberately slow and, whichever thread runs it, the request
+waiting for the result is blocked. So each process lets at most
+``BCRYPT_CONCURRENCY`` requests hash at once: by default one fewer than
+``GUNICORN_THREADS`` (one for a single thread), so a burst of logins
+leaves a thread for other requests. Up to ``BCRYPT_QUEUE_SIZE`` more wait
+at most ``BCRYPT_QUEUE_TIMEOUT`` seconds for a slot; beyond that a request
+fails with ``PasswordHasherBusy`` (503 with Retry-After).
+
+The cost factor comes from ``BCRYPT_ROUNDS``; ``auto`` calibrates it once
+per process to the largest cost that stays under ``BCRYPT_TARGET_MS``.
+Hashes made with a different cost are reported by ``needs_rehash`` so the
+login path can upgrade them.
+"""
+import os
+import threading
+import time
+
+import bcrypt
+
+from .logger import app_logger
+from .tracing import traced
+
+MIN_ROUNDS = 10
+MAX_ROUNDS = 15
+DEFAULT_ROUNDS = 12
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when every hashing slot is taken and the wait queue is full or timed out"""
+
+
+def hash_rounds(password_hash):
+    """Cost factor of a ``$2b$12$...`` hash, or None if it cannot be parsed"""
+    try:
+        return int(password_hash.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+def calibrate_rounds(target_ms=250, min_rounds=MIN_ROUNDS, max_rounds=MAX_ROUNDS):
+    """Largest cost whose hash time stays under ``target_ms`` on this machine"""
+    start = time.perf_counter()
+    bcrypt.hashpw(b'calibration', bcrypt.gensalt(min_rounds))
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    rounds = min_rounds
+    # Every extra round doubles the work
+    while rounds < max_rounds and elapsed_ms * 2 <= target_ms:
+        rounds += 1
+        elapsed_ms *= 2
+    return rounds
+
+
+class PasswordHasher:
+    def __init__(self, rounds=DEFAULT_ROUNDS, concurrency=1, queue_size=0, queue_timeout=1.0):
+        self.rounds = rounds
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._lock = threading.Lock()
+        self._running = 0
+        self._waiting = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_hash_time = 0.0
+
+    def _acquire(self):
+        """Take a slot, waiting in the bounded queue if none is free"""
+        if self._slots.acquire(blocking=False):
+            return True
+        with self._lock:
+            if self._waiting >= self.queue_size:
+                return False
+            self._waiting += 1
+        try:
+            return self._slots.acquire(timeout=self.queue_timeout)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+    def _submit(self, func):
+        """Run ``func`` in the calling thread once a slot is free, else raise PasswordHasherBusy"""
+        if not self._acquire():
+            with self._lock:
+                self.rejected += 1
+            raise PasswordHasherBusy('Password hashing is at capacity')
+        started = time.perf_counter()
+        with self._lock:
+            self._running += 1
+        try:
+            return func()
+        finally:
+            with self._lock:
+                self._running -= 1
+                self.completed += 1
+                self.total_hash_time += time.perf_counter() - started
+            self._slots.release()
+
+    @traced('bcrypt.hash')
+    def hash(self, password):
+        salt = bcrypt.gensalt(self.rounds)
+        encoded = password.encode('utf-8')
+        return self._submit(lambda: bcrypt.hashpw(encoded, salt)).decode('utf-8')
+
+    @traced('bcrypt.verify')
+    def verify(self, password, password_hash):
+        if not password_hash:
+            return False
+        encoded, hashed = password.encode('utf-8'), password_hash.encode('utf-8')
+        return self._submit(lambda: bcrypt.checkpw(encoded, hashed))
+
+    def needs_rehash(self, password_hash):
+        return hash_rounds(password_hash) != self.rounds
+
+    def stats(self):
+        with self._lock:
+            return {
+                'rounds': self.rounds,
+                'concurrency': self.concurrency,
+                'queue_size': self.queue_size,
+                'running': self._running,
+                'waiting': self._waiting,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'avg_hash_ms': round(self.total_hash_time / self.completed * 1000, 2) if self.completed else 0.0
+            }
+
+
+def default_concurrency(threads=None):
+    """Hashing slots per process: all request threads but one"""
+    threads = threads or int(os.getenv('GUNICORN_THREADS', '2'))
+    return max(threads - 1, 1)
+
+
+def build_password_hasher():
+    """Create the hasher from BCRYPT_* environment settings"""
+    rounds = os.getenv('BCRYPT_ROUNDS', str(DEFAULT_ROUNDS)).strip().lower()
+    if rounds == 'auto':
+        rounds = calibrate_rounds(float(os.getenv('BCRYPT_TARGET_MS', '250')))
+        app_logger.info(f"Calibrated bcrypt cost factor to {rounds}")
+    else:
+        rounds = min(max(int(rounds), 4), 31)
+    limit = default_concurrency()
+    concurrency = int(os.getenv('BCRYPT_CONCURRENCY') or limit)
+    if concurrency > limit:
+        app_logger.warning(f"BCRYPT_CONCURRENCY={concurrency} would let hashing take every request thread, using {limit}")
+        concurrency = limit
+    concurrency = max(concurrency, 1)
+    return PasswordHasher(
+        rounds=rounds,
+        concurrency=concurrency,
+        queue_size=max(int(os.getenv('BCRYPT_QUEUE_SIZE') or concurrency), 0),
+        queue_timeout=float(os.getenv('BCRYPT_QUEUE_TIMEOUT', '1.0'))
+    )
+
+
+_hasher = None
+_hasher_lock = threading.Lock()
+
+
+def get_password_hasher():
+    global _hasher
+    with _hasher_lock:
+        if _hasher is None:
+            _hasher = build_password_hasher()
+        return _hasher
+
+
+def set_password_hasher(hasher):
+    """Install a hasher explicitly (tests, scripts)"""
+    global _hasher
+    with _hasher_lock:
+        _hasher = hasher
@@ -0,0 +1,233 @@
+"""In-process sampling profiler for gunicorn workers.
+
+A daemon thread wakes every ``interval`` seconds, reads
+``sys._current_frames()`` and counts each thread's stack. Nothing is
+installed on the traced threads (no ``sys.setprofile``), so cost is one
+stack walk per thread per sample and frame labels are cached per code
+object; at the default 100 Hz that is well under 1% of one core, cheap
+enough to leave running on a single worker.
+
+With a ``route`` pattern only threads currently serving a matching request
+are sampled; ``init_profiler`` marks those threads from request hooks.
+Results are written as collapsed stacks (``flamegraph.pl``, speedscope's
+import) and as a speedscope JSON profile.
+"""
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from flask import request
+
+from .logger import app_logger, get_log_dir
+
+logger = app_logger
+
+PROFILER_MAX_SECONDS = float(os.getenv('PROFILER_MAX_SECONDS', '300'))
+
+
+class SamplingProfiler:
+    """Counts thread stacks sampled every ``interval`` seconds for ``duration`` seconds"""
+
+    def __init__(self, interval=0.01, duration=30.0, route=None, max_depth=128):
+        self.interval = interval
+        self.duration = duration
+        self.route = re.compile(route) if route else None
+        self.max_depth = max_depth
+        self.stacks = Counter()
+        self.samples = 0
+        self.started_at = None
+        self.finished_at = None
+        self.files = []
+        self._labels = {}
+        self._request_threads = set()
+        self._stop = threading.Event()
+        self._thread = None
+        self._on_finish = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    # Route filter, fed by the request hooks
+
+    def request_started(self, path):
+        if self.route is not None and self.route.search(path):
+            self._request_threads.add(threading.get_ident())
+
+    def request_finished(self):
+        self._request_threads.discard(threading.get_ident())
+
+    # Sampling
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+        return label
+
+    def sample(self):
+        own = threading.get_ident()
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own or (self.route is not None and thread_id not in self._request_threads):
+                continue
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            stack.reverse()
+            self.stacks[tuple(stack)] += 1
+        self.samples += 1
+
+    def _run(self):
+        deadline = time.monotonic() + self.duration
+        try:
+            while time.monotonic() < deadline and not self._stop.wait(self.interval):
+                self.sample()
+        finally:
+            self.finished_at = datetime.utcnow()
+            if self._on_finish is not None:
+                self._on_finish(self)
+
+    def start(self, on_finish=None):
+        self._on_finish = on_finish
+        self.started_at = datetime.utcnow()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    # Output
+
+    def collapsed(self):
+        """``frame;frame;leaf count`` lines, root first"""
+        return ''.join(
+            f"{';'.join(stack)} {count}\n" for stack, count in self.stacks.most_common()
+        )
+
+    def speedscope(self, name='profile'):
+        """Speedscope file format with one sampled profile"""
+        frames = []
+        index = {}
+        samples = []
+        weights = []
+        for stack, count in self.stacks.most_common():
+            ids = []
+            for label in stack:
+                if label not in index:
+                    index[label] = len(frames)
+                    frames.append({'name': label})
+                ids.append(index[label])
+            samples.append(ids)
+            weights.append(count * self.interval)
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'shared': {'frames': frames},
+            'profiles': [{
+                'type': 'sampled',
+                'name': name,
+                'unit': 'seconds',
+                'startValue': 0,
+                'endValue': sum(weights),
+                'samples': samples,
+                'weights': weights
+            }],
+            'exporter': 'personal-finance-tracker',
+            'name': name
+        }
+
+    def status(self):
+        return {
+            'running': self.running,
+            'pid': os.getpid(),
+            'interval': self.interval,
+            'duration': self.duration,
+            'route': self.route.pattern if self.route else None,
+            'samples': self.samples,
+            'stacks': len(self.stacks),
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'files': list(self.files)
+        }
+
+
+def profile_dir():
+    directory = os.getenv('PROFILER_DIR') or os.path.join(get_log_dir(), 'profiles')
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def write_profile(profiler, directory=None):
+    """Write ``<name>.collapsed`` and ``<name>.speedscope.json``; returns the file names"""
+    directory = directory or profile_dir()
+    name = f"profile-{profiler.started_at:%Y%m%d-%H%M%S}-{os.getpid()}"
+    collapsed = f"{name}.collapsed"
+    speedscope = f"{name}.speedscope.json"
+    with open(os.path.join(directory, collapsed), 'w') as handle:
+        handle.write(profiler.collapsed())
+    with open(os.path.join(directory, speedscope), 'w') as handle:
+        json.dump(profiler.speedscope(name), handle)
+    logger.info(f"Profile written: {collapsed} ({profiler.samples} samples)")
+    return [collapsed, speedscope]
+
+
+_profiler = None
+_profiler_lock = threading.Lock()
+
+
+def get_profiler():
+    return _profiler
+
+
+def start_profiler(interval=0.01, duration=30.0, route=None):
+    """Start a profile in this worker; ValueError when one is running or arguments are bad"""
+    global _profiler
+    if not 0.001 <= interval <= 1:
+        raise ValueError('rate_hz must be between 1 and 1000')
+    if not 0 < duration <= PROFILER_MAX_SECONDS:
+        raise ValueError(f'seconds must be between 0 and {PROFILER_MAX_SECONDS:g}')
+    try:
+        profiler = SamplingProfiler(interval, duration, route)
+    except re.error as e:
+        raise ValueError(f'Invalid route pattern: {e}')
+    directory = profile_dir()
+
+    def save(finished):
+        try:
+            finished.files = write_profile(finished, directory)
+        except OSError as e:
+            logger.error(f"Could not write profile: {e}")
+
+    with _profiler_lock:
+        if _profiler is not None and _profiler.running:
+            raise ValueError('A profile is already running in this worker')
+        _profiler = profiler.start(on_finish=save)
+    return profiler
+
+
+def profiler_enabled():
+    return os.getenv('PROFILER_ENABLED', 'false').lower() == 'true'
+
+
+def init_profiler(app):
+    """Mark request threads for route-filtered profiles"""
+
+    @app.before_request
+    def mark_profiled_request():
+        profiler = _profiler
+        if profiler is not None and profiler.running:
+            profiler.request_started(request.path)
+
+    @app.teardown_request
+    def unmark_profiled_request(exc=None):
+        profiler = _profiler
+        if profiler is not None:
+            profiler.request_finished()
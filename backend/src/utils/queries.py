@@ -0,0 +1,166 @@
+"""Per-request SQL statement counting, timing and N+1 detection.
+
+Engine-wide cursor listeners record every statement into the current
+request's ``QueryTracker``, grouped by statement shape (whitespace and
+``IN`` lists collapsed). After the view returns, the count and total time
+go into ``X-Query-Count`` and ``Server-Timing`` headers, and any SELECT
+shape repeated ``N_PLUS_ONE_THRESHOLD`` times or more in one request is
+logged as a likely N+1.
+
+``track_queries()`` collects the same data for code run outside a request
+(services, scripts, tests), and ``add_statement_listener`` hands every
+timed statement to other consumers such as the slow-query log.
+"""
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .logger import app_logger
+
+logger = app_logger
+
+N_PLUS_ONE_THRESHOLD = int(os.getenv('N_PLUS_ONE_THRESHOLD', '5'))
+
+_WHITESPACE = re.compile(r'\s+')
+_IN_LIST = re.compile(r'\bIN\s*\((?:\s*\?\s*,?)+\)|\bIN\s*\(\s*__\[POSTCOMPILE_\w+\]\s*\)', re.IGNORECASE)
+_NUMBER = re.compile(r'(?<![\w.])\d+(?:\.\d+)?\b')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+
+
+def statement_shape(statement):
+    """Statement with literals and IN lists collapsed, so repeats compare equal"""
+    shape = _WHITESPACE.sub(' ', statement).strip()
+    shape = _STRING.sub('?', shape)
+    shape = _NUMBER.sub('?', shape)
+    return _IN_LIST.sub('IN (?)', shape)
+
+
+class QueryTracker:
+    """Statement count, time and per-shape repeats for one unit of work"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.shapes = {}
+
+    def record(self, statement, elapsed):
+        self.count += 1
+        self.total_time += elapsed
+        shape = statement_shape(statement)
+        entry = self.shapes.get(shape)
+        if entry is None:
+            self.shapes[shape] = [1, elapsed]
+        else:
+            entry[0] += 1
+            entry[1] += elapsed
+
+    def repeated(self, threshold=None):
+        """[(shape, count, seconds)] of SELECT shapes run at least ``threshold`` times"""
+        threshold = N_PLUS_ONE_THRESHOLD if threshold is None else threshold
+        return sorted(
+            ((shape, count, seconds) for shape, (count, seconds) in self.shapes.items()
+             if count >= threshold and shape[:6].upper() == 'SELECT'),
+            key=lambda item: -item[1]
+        )
+
+
+_local = threading.local()
+_statement_listeners = []
+
+
+def add_statement_listener(listener):
+    """Call ``listener(conn, statement, parameters, elapsed)`` after every statement"""
+    if listener not in _statement_listeners:
+        _statement_listeners.append(listener)
+
+
+def remove_statement_listener(listener):
+    if listener in _statement_listeners:
+        _statement_listeners.remove(listener)
+
+
+def _active_trackers():
+    trackers = list(getattr(_local, 'trackers', ()))
+    if has_request_context():
+        tracker = g.get('query_tracker')
+        if tracker is not None:
+            trackers.append(tracker)
+    return trackers
+
+
+def current_queries():
+    """The tracker of the current request, or None outside a tracked request"""
+    return g.get('query_tracker') if has_request_context() else None
+
+
+@contextmanager
+def track_queries():
+    """Collect the statements run by this thread inside the block"""
+    tracker = QueryTracker()
+    stack = _local.__dict__.setdefault('trackers', [])
+    stack.append(tracker)
+    try:
+        yield tracker
+    finally:
+        stack.remove(tracker)
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _stop_query_timer(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('query_start')
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    for tracker in _active_trackers():
+        tracker.record(statement, elapsed)
+    for listener in list(_statement_listeners):
+        listener(conn, statement, parameters, elapsed)
+
+
+def init_query_tracking(app):
+    """Track SQL per request and report it in response headers.
+
+    The headers expose query counts and timings, so unless
+    ``QUERY_TIMING_HEADERS`` says otherwise they are only sent by debug and
+    testing apps.
+    """
+    setting = os.getenv('QUERY_TIMING_HEADERS', '').strip().lower()
+    headers_setting = setting == 'true' if setting else None
+
+    @app.before_request
+    def start_query_tracking():
+        g.query_tracker = QueryTracker()
+        g.query_tracking_start = time.perf_counter()
+
+    @app.after_request
+    def report_queries(response):
+        tracker = current_queries()
+        if tracker is None:
+            return response
+
+        for shape, count, seconds in tracker.repeated():
+            logger.warning(
+                "Possible N+1 in %s %s: %d x %.1fms %s",
+                request.method, request.path, count, seconds * 1000, shape[:300]
+            )
+
+        headers_enabled = headers_setting if headers_setting is not None else app.debug or app.testing
+        if headers_enabled:
+            app_ms = (time.perf_counter() - g.query_tracking_start) * 1000
+            response.headers['X-Query-Count'] = str(tracker.count)
+            response.headers['Server-Timing'] = (
+                f'db;dur={tracker.total_time * 1000:.2f};desc="{tracker.count} queries", '
+                f'app;dur={app_ms:.2f}'
+            )
+        return response
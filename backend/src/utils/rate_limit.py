@@ -0,0 +1,253 @@
+"""Token-bucket rate limiting for the auth endpoints.
+
+Each rule is a bucket of ``capacity`` tokens refilled continuously over
+``period`` seconds; a request spends one token per bucket it is keyed
+into (client IP, email, user id). Buckets live either in process memory
+or in Redis, where a Lua script makes refill-and-take atomic across
+gunicorn workers.
+
+The check runs before the view body, so a throttled request is answered
+with a 429 without reading the database or running bcrypt.
+"""
+import functools
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask import request, jsonify
+from flask_jwt_extended import get_jwt_identity
+
+from .logger import app_logger
+
+logger = app_logger
+
+
+class RateLimit:
+    """``capacity`` requests per ``period`` seconds, refilled smoothly"""
+
+    __slots__ = ('capacity', 'period')
+
+    def __init__(self, capacity, period):
+        self.capacity = float(capacity)
+        self.period = float(period)
+
+    @property
+    def rate(self):
+        return self.capacity / self.period
+
+    @classmethod
+    def parse(cls, value):
+        """Parse ``"5/60"`` (5 requests per 60 seconds)"""
+        capacity, period = value.split('/')
+        return cls(int(capacity), float(period))
+
+    def __repr__(self):
+        return f"RateLimit({self.capacity:g}/{self.period:g}s)"
+
+
+def take_token(tokens, updated, now, limit):
+    """Refill a bucket up to ``now`` and try to take one token.
+
+    Returns (allowed, tokens_left, retry_after_seconds).
+    """
+    if tokens is None:
+        tokens = limit.capacity
+    else:
+        tokens = min(limit.capacity, tokens + max(now - updated, 0.0) * limit.rate)
+    if tokens >= 1:
+        return True, tokens - 1, 0.0
+    return False, tokens, (1 - tokens) / limit.rate
+
+
+class MemoryBackend:
+    """Per-process buckets in a bounded LRU so unique IPs cannot grow it forever"""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key, limit):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (None, now))
+            allowed, tokens, retry_after = take_token(tokens, updated, now, limit)
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, retry_after
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+# KEYS[1] bucket; ARGV: capacity, rate per second, now (seconds), ttl (ms)
+TOKEN_BUCKET_SCRIPT = """
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local tokens = tonumber(bucket[1])
+if tokens == nil then
+    tokens = capacity
+else
+    tokens = math.min(capacity, tokens + math.max(now - tonumber(bucket[2]), 0) * rate)
+end
+local allowed = 0
+local retry_after = 0
+if tokens >= 1 then
+    allowed = 1
+    tokens = tokens - 1
+else
+    retry_after = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], ARGV[4])
+return {allowed, tostring(retry_after)}
+"""
+
+
+class RedisBackend:
+    """Buckets shared by every worker, updated atomically by a Lua script"""
+
+    def __init__(self, client, prefix='ratelimit:'):
+        self.client = client
+        self.prefix = prefix
+        self._script = client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    def hit(self, key, limit):
+        # Expire idle buckets once they would have refilled completely
+        ttl_ms = int(limit.period * 1000) + 1000
+        allowed, retry_after = self._script(
+            keys=[self.prefix + key],
+            args=[limit.capacity, limit.rate, time.time(), ttl_ms]
+        )
+        return bool(int(allowed)), float(retry_after)
+
+    def reset(self):
+        for key in self.client.scan_iter(match=self.prefix + '*'):
+            self.client.delete(key)
+
+
+DEFAULT_RULES = {
+    'login': {'ip': '20/60', 'email': '5/300'},
+    'register': {'ip': '5/3600'},
+    'change_password': {'ip': '10/300', 'user': '5/900'}
+}
+
+
+class RateLimiter:
+    def __init__(self, backend, rules=None, enabled=True):
+        self.backend = backend
+        self.enabled = enabled
+        self.rules = {
+            endpoint: {scope: RateLimit.parse(value) if isinstance(value, str) else value
+                       for scope, value in scopes.items()}
+            for endpoint, scopes in (rules or DEFAULT_RULES).items()
+        }
+        self.rejected = 0
+
+    def check(self, endpoint, identities):
+        """Spend one token per configured scope; returns seconds to wait, or 0 when allowed"""
+        if not self.enabled:
+            return 0.0
+        retry_after = 0.0
+        for scope, limit in self.rules.get(endpoint, {}).items():
+            identity = identities.get(scope)
+            if not identity:
+                continue
+            try:
+                allowed, wait = self.backend.hit(f"{endpoint}:{scope}:{identity}", limit)
+            except Exception as e:
+                # Throttling must not take the auth endpoints down with the backend
+                logger.warning(f"Rate limit backend error, allowing request: {e}")
+                return 0.0
+            if not allowed:
+                retry_after = max(retry_after, wait)
+        if retry_after:
+            self.rejected += 1
+        return retry_after
+
+
+def _email_key(email):
+    """Emails are bucketed by digest so addresses never end up in Redis"""
+    return hashlib.sha256(email.strip().lower().encode('utf-8')).hexdigest()[:32]
+
+
+def client_ip():
+    """Client address; behind the nginx proxy that is X-Real-IP"""
+    if os.getenv('RATE_LIMIT_TRUST_PROXY', 'false').lower() == 'true':
+        forwarded = request.headers.get('X-Real-IP') or request.headers.get('X-Forwarded-For', '').split(',')[0]
+        if forwarded.strip():
+            return forwarded.strip()
+    return request.remote_addr or 'unknown'
+
+
+def build_rate_limiter():
+    """Create the limiter from RATE_LIMIT_* environment settings"""
+    rules = {endpoint: dict(scopes) for endpoint, scopes in DEFAULT_RULES.items()}
+    for endpoint, scopes in rules.items():
+        for scope in scopes:
+            override = os.getenv(f"RATE_LIMIT_{endpoint.upper()}_{scope.upper()}")
+            if override:
+                scopes[scope] = override
+
+    backend = MemoryBackend()
+    if os.getenv('RATE_LIMIT_BACKEND', 'memory').lower() == 'redis':
+        try:
+            import redis
+            client = redis.Redis.from_url(os.getenv('REDIS_URL', 'redis://localhost:6379/0'))
+            backend = RedisBackend(client)
+        except Exception as e:
+            logger.error(f"Cannot use Redis for rate limiting, falling back to memory: {e}")
+
+    return RateLimiter(backend, rules, enabled=os.getenv('RATE_LIMIT_ENABLED', 'true').lower() == 'true')
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = build_rate_limiter()
+        return _limiter
+
+
+def set_rate_limiter(limiter):
+    """Install a limiter explicitly (tests, scripts)"""
+    global _limiter
+    with _limiter_lock:
+        _limiter = limiter
+
+
+def rate_limit(endpoint):
+    """Throttle a view by client IP, the ``email`` in its JSON body and the JWT user"""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            limiter = get_rate_limiter()
+            identities = {'ip': client_ip()}
+            scopes = limiter.rules.get(endpoint, {})
+            if 'email' in scopes:
+                data = request.get_json(silent=True) or {}
+                if isinstance(data, dict) and isinstance(data.get('email'), str) and data['email'].strip():
+                    identities['email'] = _email_key(data['email'])
+            if 'user' in scopes:
+                identities['user'] = str(get_jwt_identity() or '')
+
+            retry_after = limiter.check(endpoint, identities)
+            if retry_after:
+                logger.warning(f"Rate limited {endpoint} for {identities['ip']}")
+                response = jsonify({'error': 'Too many requests, please try again later'})
+                response.headers['Retry-After'] = str(max(int(retry_after + 0.999), 1))
+                return response, 429
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,257 @@
+"""Declarative response fields, ``?fields=`` projection and orjson encoding.
+
+A ``Spec`` lists the output keys of one model once. Rows are either model
+instances or tuples of entities from a joined query (``entities`` gives
+their order, missing outer-join sides are ``None``). For each requested
+field set the spec compiles a list of getters once, so serializing a list
+is a loop of attribute reads; ``load_only`` trims the query's SELECT to the
+columns those fields read::
+
+    fields = requested_fields(ACCOUNT)          # ?fields=id,name,balance
+    accounts = ACCOUNT.load_only(query, fields).all()
+    return jsonify({'accounts': ACCOUNT.dump_many(accounts, fields)})
+
+``FastJSONProvider`` encodes responses with orjson when it is installed,
+producing the same JSON values as Flask's provider (dates as HTTP dates,
+Decimals as strings) and falling back to it for anything orjson rejects.
+
+List endpoints build their items with ``list_items`` and answer with
+``respond``: ``?layout=columns`` turns the list into one array per field
+(``{"id": [1, 2], "amount": [9.5, 3.0]}``) instead of one object per row,
+and ``Accept: application/msgpack`` gets MessagePack instead of JSON. Both
+drop the keys repeated on every row; JSON objects remain the default.
+"""
+from datetime import date, datetime, time
+from decimal import Decimal
+from uuid import UUID
+
+from flask import Response, jsonify, request
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import inspect
+from sqlalchemy.orm import Load
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speed-up
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - JSON only without it
+    msgpack = None
+
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPES = ('application/msgpack', 'application/x-msgpack')
+LAYOUTS = ('rows', 'columns')
+
+
+def isoformat(value):
+    return value.isoformat()
+
+
+class Field:
+    """Output key ``name`` read from ``attr`` of ``entity`` (the spec's model by default)"""
+
+    __slots__ = ('name', 'attr', 'entity', 'format', 'default')
+
+    def __init__(self, name, attr=None, entity=None, format=None, default=None):
+        self.name = name
+        self.attr = attr or name
+        self.entity = entity
+        self.format = format
+        self.default = default
+
+    def columns(self, model):
+        return [(self.entity or model, self.attr)]
+
+    def getter(self, entities, model):
+        index = entities.index(self.entity or model)
+        attr, format, default = self.attr, self.format, self.default
+
+        # Loaded columns sit in the instance dict; skipping the instrumented
+        # descriptor is most of the per-row cost
+        if format is None:
+            def get(row):
+                obj = row[index]
+                if obj is None:
+                    return default
+                loaded = obj.__dict__
+                return loaded[attr] if attr in loaded else getattr(obj, attr)
+        else:
+            def get(row):
+                obj = row[index]
+                if obj is None:
+                    return default
+                loaded = obj.__dict__
+                value = loaded[attr] if attr in loaded else getattr(obj, attr)
+                return None if value is None else format(value)
+        return get
+
+
+def iso(name, **kwargs):
+    """A datetime/date field written as ISO 8601"""
+    return Field(name, format=isoformat, **kwargs)
+
+
+class Nested:
+    """An object built from ``fields`` of another spec's entity in the same row"""
+
+    __slots__ = ('name', 'spec', 'fields', 'missing')
+
+    def __init__(self, name, spec, fields=None, missing=None):
+        self.name = name
+        self.spec = spec
+        self.fields = tuple(fields or spec.default)
+        self.missing = missing
+
+    def columns(self, model):
+        return [column for name in self.fields for column in self.spec.fields[name].columns(self.spec.model)]
+
+    def getter(self, entities, model):
+        index = entities.index(self.spec.model)
+        getters = [(name, self.spec.fields[name].getter((self.spec.model,), self.spec.model))
+                   for name in self.fields]
+        missing = self.missing
+
+        def get(row):
+            obj = row[index]
+            if obj is None:
+                return dict(missing) if missing is not None else None
+            single = (obj,)
+            return {name: get_value(single) for name, get_value in getters}
+        return get
+
+
+class Spec:
+    """The response fields of ``model``; ``default`` is the field set when none is requested"""
+
+    def __init__(self, model, fields, entities=None, default=None):
+        self.model = model
+        self.entities = tuple(entities or (model,))
+        self.fields = {}
+        for field in fields:
+            self.fields[field if isinstance(field, str) else field.name] = \
+                Field(field) if isinstance(field, str) else field
+        self.default = tuple(default or self.fields)
+        self._plans = {}
+
+    def select(self, fields=None):
+        """Validated field names, in spec order; ValueError names unknown ones"""
+        if fields is None:
+            return self.default
+        unknown = sorted(set(fields) - set(self.fields))
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        return tuple(name for name in self.fields if name in fields)
+
+    def _plan(self, fields):
+        names = self.select(fields)
+        plan = self._plans.get(names)
+        if plan is None:
+            plan = self._plans[names] = [
+                (name, self.fields[name].getter(self.entities, self.model)) for name in names
+            ]
+        return plan
+
+    def dump(self, row, fields=None):
+        if len(self.entities) == 1:
+            row = (row,)
+        return {name: get(row) for name, get in self._plan(fields)}
+
+    def dump_many(self, rows, fields=None):
+        plan = self._plan(fields)
+        if len(self.entities) == 1:
+            return [{name: get(single) for name, get in plan} for single in ((row,) for row in rows)]
+        return [{name: get(row) for name, get in plan} for row in rows]
+
+    def dump_columns(self, rows, fields=None):
+        """``{field: [value per row]}``, the columnar form of ``dump_many``"""
+        plan = self._plan(fields)
+        if len(self.entities) == 1:
+            rows = [(row,) for row in rows]
+        return {name: [get(row) for row in rows] for name, get in plan}
+
+    def load_only(self, query, fields=None):
+        """``query`` loading only the columns the fields read (primary keys always)"""
+        if fields is None:
+            return query
+        wanted = {entity: set() for entity in self.entities}
+        for name in self.select(fields):
+            for entity, attr in self.fields[name].columns(self.model):
+                wanted[entity].add(attr)
+        options = []
+        for entity, attrs in wanted.items():
+            attrs = attrs or {column.key for column in inspect(entity).primary_key}
+            options.append(Load(entity).load_only(*[getattr(entity, attr) for attr in sorted(attrs)]))
+        return query.options(*options)
+
+
+def requested_fields(spec, param='fields'):
+    """Field names from ``?fields=a,b`` validated against ``spec``; None when absent"""
+    value = request.args.get(param)
+    if value is None:
+        return None
+    fields = [name.strip() for name in value.split(',') if name.strip()]
+    if not fields:
+        raise ValueError(f"{param} must name at least one field")
+    spec.select(fields)
+    return fields
+
+
+def requested_layout(param='layout'):
+    """'rows' (default) or 'columns' from ``?layout=``"""
+    layout = request.args.get(param, 'rows')
+    if layout not in LAYOUTS:
+        raise ValueError(f"{param} must be one of: {', '.join(LAYOUTS)}")
+    return layout
+
+
+def list_items(spec, rows, fields=None):
+    """``rows`` dumped as the requested layout"""
+    if requested_layout() == 'columns':
+        return spec.dump_columns(rows, fields)
+    return spec.dump_many(rows, fields)
+
+
+def response_mimetype():
+    """The negotiated body type; JSON unless the client prefers MessagePack"""
+    offered = [JSON_MIMETYPE] + (list(MSGPACK_MIMETYPES) if msgpack is not None else [])
+    return request.accept_mimetypes.best_match(offered, default=JSON_MIMETYPE)
+
+
+def _msgpack_default(value):
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, (Decimal, UUID)):
+        return str(value)
+    raise TypeError(f"Cannot encode {type(value).__name__} as MessagePack")
+
+
+def respond(payload, status=200):
+    """``payload`` as JSON or MessagePack, whichever the client accepts"""
+    mimetype = response_mimetype()
+    if mimetype in MSGPACK_MIMETYPES:
+        response = Response(msgpack.packb(payload, default=_msgpack_default), status=status, mimetype=mimetype)
+    else:
+        response = jsonify(payload)
+        response.status_code = status
+    response.vary.add('Accept')
+    return response
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider with orjson doing the encoding"""
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or set(kwargs) - {'indent', 'separators', 'sort_keys'}:
+            return super().dumps(obj, **kwargs)
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(obj, default=self.default, option=option).decode()
+        except TypeError:
+            # Integers over 64 bits and other types orjson refuses
+            return super().dumps(obj, **kwargs)
@@ -0,0 +1,274 @@
+"""Slow-query log with plan capture, and a summarizer for it.
+
+Every statement slower than ``SLOW_QUERY_MS`` is handed, with its route
+and masked parameters, to a background thread. That thread runs
+``EXPLAIN`` for SELECTs on a separate pooled connection (at most once per
+statement shape every ``SLOW_QUERY_EXPLAIN_TTL`` seconds) and appends one
+JSON line per statement to ``logs/slow_queries.log``, rotated by size.
+The request thread never waits for either; when the hand-off queue is
+full the entry is dropped and counted.
+
+Summarize the log with::
+
+    python -m src.utils.slow_queries [--top 10] [--route /api/budgets] [LOG]
+"""
+import argparse
+import datetime as dt
+import glob
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from collections import OrderedDict
+from logging.handlers import RotatingFileHandler
+
+from flask import has_request_context, request
+
+from .logger import app_logger, get_log_dir
+from .queries import add_statement_listener, remove_statement_listener, statement_shape
+
+logger = app_logger
+
+SENSITIVE_PARAM_KEYS = ('password', 'token', 'secret', 'hash', 'email', 'key')
+EXPLAIN_PREFIXES = {'sqlite': 'EXPLAIN QUERY PLAN ', 'postgresql': 'EXPLAIN ', 'mysql': 'EXPLAIN '}
+
+
+def mask_value(value):
+    """Keep numbers, dates and NULLs; strings and bytes are reduced to their length"""
+    if value is None or isinstance(value, (bool, int, float, dt.date, dt.datetime)):
+        return value if not isinstance(value, (dt.date, dt.datetime)) else value.isoformat()
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return f"<bytes len={len(value)}>"
+    if isinstance(value, str):
+        return f"<str len={len(value)}>"
+    return f"<{type(value).__name__}>"
+
+
+def mask_parameters(parameters, limit=50):
+    """Masked copy of DBAPI parameters (sequence, mapping or executemany list)"""
+    if isinstance(parameters, dict):
+        return {
+            key: '***MASKED***' if any(word in str(key).lower() for word in SENSITIVE_PARAM_KEYS)
+            else mask_value(value)
+            for key, value in list(parameters.items())[:limit]
+        }
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (list, tuple, dict)):
+            return {'rows': len(parameters), 'first': mask_parameters(parameters[0], limit)}
+        return [mask_value(value) for value in parameters[:limit]]
+    return mask_value(parameters)
+
+
+def _current_route():
+    if not has_request_context():
+        return None
+    return f"{request.method} {request.url_rule.rule if request.url_rule else request.path}"
+
+
+class SlowQueryRecorder:
+    def __init__(self, threshold_ms, log_path, explain=True, explain_ttl=600, queue_size=100,
+                 max_bytes=10 * 1024 * 1024, backup_count=5):
+        self.threshold = threshold_ms / 1000.0
+        self.explain = explain
+        self.explain_ttl = explain_ttl
+        self.log_path = log_path
+        self.dropped = 0
+        self.recorded = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._plans = OrderedDict()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+        # A private logger so slow queries never reach app.log or the console
+        self._log = logging.Logger('slow_query')
+        handler = RotatingFileHandler(log_path, maxBytes=max_bytes, backupCount=backup_count)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        self._log.addHandler(handler)
+
+    def observe(self, conn, statement, parameters, elapsed):
+        """Statement listener: queue slow statements for the background thread"""
+        if elapsed < self.threshold or threading.current_thread() is self._thread:
+            # Skip the recorder's own EXPLAIN statements
+            return
+        entry = {
+            'ts': dt.datetime.utcnow().isoformat(timespec='milliseconds') + 'Z',
+            'duration_ms': round(elapsed * 1000, 2),
+            'route': _current_route(),
+            'statement': statement,
+            'params': mask_parameters(parameters)
+        }
+        try:
+            self._queue.put_nowait((conn.engine, parameters, entry))
+        except queue.Full:
+            self.dropped += 1
+            return
+        self._ensure_thread()
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='slow-query-log', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            engine, parameters, entry = self._queue.get()
+            try:
+                if self.explain:
+                    entry['plan'] = self._plan(engine, entry['statement'], parameters)
+                self._log.info(json.dumps(entry, default=str))
+                self.recorded += 1
+            except Exception as e:
+                logger.warning(f"Could not record slow query: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _plan(self, engine, statement, parameters):
+        """EXPLAIN output for a SELECT, cached per statement shape"""
+        prefix = EXPLAIN_PREFIXES.get(engine.dialect.name)
+        if prefix is None or statement.lstrip()[:6].upper() not in ('SELECT', 'WITH'):
+            return None
+        shape = statement_shape(statement)
+        cached = self._plans.get(shape)
+        if cached is not None and time.monotonic() - cached[1] < self.explain_ttl:
+            return cached[0]
+
+        if isinstance(parameters, list):
+            parameters = parameters[0] if parameters else ()
+        try:
+            with engine.connect() as side:
+                rows = side.exec_driver_sql(prefix + statement, parameters).fetchall()
+            plan = [' | '.join(str(col) for col in row) for row in rows]
+        except Exception as e:
+            plan = [f"EXPLAIN failed: {e}"]
+        self._plans[shape] = (plan, time.monotonic())
+        while len(self._plans) > 256:
+            self._plans.popitem(last=False)
+        return plan
+
+    def drain(self):
+        """Block until every queued slow query has been written"""
+        self._queue.join()
+
+    def close(self):
+        for handler in self._log.handlers:
+            handler.close()
+
+
+_recorder = None
+
+
+def get_slow_query_recorder():
+    return _recorder
+
+
+def init_slow_query_log():
+    """Start recording statements slower than SLOW_QUERY_MS (unset or 0 disables)"""
+    global _recorder
+    threshold_ms = float(os.getenv('SLOW_QUERY_MS', '200') or 0)
+    if _recorder is not None:
+        remove_statement_listener(_recorder.observe)
+        _recorder.close()
+        _recorder = None
+    if threshold_ms <= 0:
+        return None
+    _recorder = SlowQueryRecorder(
+        threshold_ms,
+        os.getenv('SLOW_QUERY_LOG') or os.path.join(get_log_dir(), 'slow_queries.log'),
+        explain=os.getenv('SLOW_QUERY_EXPLAIN', 'true').lower() == 'true',
+        explain_ttl=float(os.getenv('SLOW_QUERY_EXPLAIN_TTL', '600'))
+    )
+    add_statement_listener(_recorder.observe)
+    return _recorder
+
+
+# Summarizer
+
+def read_entries(path):
+    """Entries from ``path`` and its rotated backups, oldest file first"""
+    suffixes = sorted((int(name.rsplit('.', 1)[1]) for name in glob.glob(f"{path}.*")
+                       if name.rsplit('.', 1)[1].isdigit()), reverse=True)
+    for filename in [f"{path}.{suffix}" for suffix in suffixes] + [path]:
+        if not os.path.exists(filename):
+            continue
+        with open(filename) as handle:
+            for line in handle:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def summarize(entries, route=None, top=10):
+    """Group entries by statement shape, slowest total time first"""
+    groups = {}
+    for entry in entries:
+        if route and route not in (entry.get('route') or ''):
+            continue
+        shape = statement_shape(entry['statement'])
+        group = groups.setdefault(shape, {'durations': [], 'routes': {}, 'plan': None, 'last_seen': None})
+        group['durations'].append(entry['duration_ms'])
+        entry_route = entry.get('route') or '(background)'
+        group['routes'][entry_route] = group['routes'].get(entry_route, 0) + 1
+        group['plan'] = entry.get('plan') or group['plan']
+        group['last_seen'] = entry.get('ts')
+
+    summary = []
+    for shape, group in groups.items():
+        durations = group['durations']
+        summary.append({
+            'statement': shape,
+            'count': len(durations),
+            'total_ms': round(sum(durations), 2),
+            'p50_ms': _percentile(durations, 0.5),
+            'p95_ms': _percentile(durations, 0.95),
+            'max_ms': max(durations),
+            'routes': sorted(group['routes'].items(), key=lambda item: -item[1]),
+            'plan': group['plan'],
+            'last_seen': group['last_seen']
+        })
+    summary.sort(key=lambda item: -item['total_ms'])
+    return summary[:top]
+
+
+def format_summary(summary):
+    lines = []
+    for rank, item in enumerate(summary, 1):
+        lines.append(
+            f"#{rank}  {item['count']} x  total {item['total_ms']:.1f}ms  p50 {item['p50_ms']:.1f}ms  "
+            f"p95 {item['p95_ms']:.1f}ms  max {item['max_ms']:.1f}ms  last {item['last_seen']}"
+        )
+        lines.append(f"    {item['statement'][:500]}")
+        lines.append("    routes: " + ', '.join(f"{name} ({count})" for name, count in item['routes'][:5]))
+        for plan_line in item['plan'] or []:
+            lines.append(f"    plan: {plan_line}")
+        lines.append('')
+    return '\n'.join(lines) if lines else 'No slow queries recorded.'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Summarize the slow-query log')
+    parser.add_argument('log', nargs='?', help='log file (default: logs/slow_queries.log)')
+    parser.add_argument('--top', type=int, default=10, help='statement shapes to show')
+    parser.add_argument('--route', help='only entries whose route contains this text')
+    parser.add_argument('--json', action='store_true', help='print the summary as JSON')
+    args = parser.parse_args(argv)
+
+    path = args.log or os.getenv('SLOW_QUERY_LOG') or os.path.join(get_log_dir(), 'slow_queries.log')
+    summary = summarize(read_entries(path), route=args.route, top=args.top)
+    print(json.dumps(summary, indent=2) if args.json else format_summary(summary))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,404 @@
+"""Lightweight request tracing with an OTLP/JSON exporter.
+
+Every request gets a correlation id (``X-Request-ID`` from the proxy, or a
+new one) that is stamped on each log line and echoed in the response.
+With ``TRACING_ENABLED`` a sampled request also becomes a trace: a server
+span for the request with child spans for the view, JWT decoding, SQL
+statements, bcrypt, service calls, JSON encoding and request logging.
+A W3C ``traceparent`` header continues the caller's trace.
+
+Finished spans are batched by a background thread and written as OTLP/JSON
+``ExportTraceServiceRequest`` objects, either one per line to a local file
+(``TRACING_EXPORTER=file``, readable by the OpenTelemetry collector's
+``otlpjsonfile`` receiver) or POSTed to a collector's ``/v1/traces``
+(``TRACING_EXPORTER=otlp``). Outside a sampled request ``start_span`` and
+``traced`` cost one context-variable lookup.
+"""
+import atexit
+import contextvars
+import functools
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+import urllib.request
+import uuid
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+
+from flask import request
+
+from .logger import app_logger, get_log_dir, set_correlation, reset_correlation
+from .serialization import FastJSONProvider
+
+logger = app_logger
+
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+
+STATUS_ERROR = 2
+
+_REQUEST_ID = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+_TRACEPARENT = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+
+class Span:
+    __slots__ = ('name', 'kind', 'trace_id', 'span_id', 'parent_id', 'start_ns', 'end_ns',
+                 'attributes', 'status', 'status_message')
+
+    def __init__(self, name, trace_id, parent_id=None, kind=SPAN_KIND_INTERNAL, attributes=None, start_ns=None):
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.start_ns = start_ns or time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes or {})
+        self.status = 0
+        self.status_message = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def set_error(self, error):
+        self.status = STATUS_ERROR
+        self.status_message = f"{type(error).__name__}: {error}"[:300]
+
+    def to_otlp(self):
+        span = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': self.kind,
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns),
+            'attributes': [{'key': key, 'value': _otlp_value(value)} for key, value in self.attributes.items()],
+            'status': {'code': self.status}
+        }
+        if self.parent_id:
+            span['parentSpanId'] = self.parent_id
+        if self.status_message:
+            span['status']['message'] = self.status_message
+        return span
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+# Exporters
+
+class OtlpFileExporter:
+    """Append one ExportTraceServiceRequest per line to a size-rotated file"""
+
+    def __init__(self, path, max_bytes=50 * 1024 * 1024, backup_count=3):
+        self.path = path
+        self._log = logging.Logger('tracing')
+        handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        self._log.addHandler(handler)
+
+    def export(self, payload):
+        self._log.info(json.dumps(payload, separators=(',', ':')))
+
+    def close(self):
+        for handler in self._log.handlers:
+            handler.close()
+
+
+class OtlpHttpExporter:
+    """POST OTLP/JSON to a collector's ``/v1/traces``"""
+
+    def __init__(self, endpoint, timeout=2.0):
+        self.url = endpoint.rstrip('/') + '/v1/traces'
+        self.timeout = timeout
+
+    def export(self, payload):
+        data = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        req = urllib.request.Request(self.url, data=data, headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(req, timeout=self.timeout) as response:
+            response.read()
+
+    def close(self):
+        pass
+
+
+class BatchSpanProcessor:
+    """Queue finished spans and export them in batches from a daemon thread"""
+
+    def __init__(self, exporter, service_name='personal-finance-api', max_queue=4096,
+                 batch_size=512, interval=1.0):
+        self.exporter = exporter
+        self.batch_size = batch_size
+        self.interval = interval
+        self.resource = {'attributes': [
+            {'key': 'service.name', 'value': {'stringValue': service_name}},
+            {'key': 'process.pid', 'value': {'intValue': str(os.getpid())}}
+        ]}
+        self.dropped = 0
+        self.exported = 0
+        self.failed = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='span-exporter', daemon=True)
+        self._thread.start()
+
+    def on_end(self, span):
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _take_batch(self):
+        batch = []
+        try:
+            batch.append(self._queue.get(timeout=self.interval))
+            while len(batch) < self.batch_size:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _export(self, batch):
+        payload = {'resourceSpans': [{
+            'resource': self.resource,
+            'scopeSpans': [{
+                'scope': {'name': 'personal-finance-tracker'},
+                'spans': [span.to_otlp() for span in batch]
+            }]
+        }]}
+        try:
+            self.exporter.export(payload)
+            self.exported += len(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            logger.warning(f"Span export failed: {e}")
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._take_batch()
+            if batch:
+                self._export(batch)
+
+    def flush(self):
+        """Block until every queued span has been exported"""
+        self._queue.join()
+
+    def shutdown(self):
+        self.flush()
+        self._stop.set()
+        self._thread.join()
+        self.exporter.close()
+
+    def stats(self):
+        return {'queued': self._queue.qsize(), 'exported': self.exported,
+                'dropped': self.dropped, 'failed': self.failed}
+
+
+_processor = None
+
+
+def get_span_processor():
+    return _processor
+
+
+def set_span_processor(processor):
+    """Install the processor finished spans go to; None disables tracing"""
+    global _processor
+    _processor = processor
+
+
+def build_span_processor():
+    """Processor from TRACING_* environment settings, or None when tracing is off"""
+    if os.getenv('TRACING_ENABLED', 'false').lower() != 'true':
+        return None
+    kind = os.getenv('TRACING_EXPORTER', 'file').lower()
+    if kind == 'otlp':
+        exporter = OtlpHttpExporter(os.getenv('OTLP_ENDPOINT', 'http://localhost:4318'))
+    else:
+        exporter = OtlpFileExporter(os.getenv('TRACING_FILE') or os.path.join(get_log_dir(), 'traces.jsonl'))
+    return BatchSpanProcessor(exporter, service_name=os.getenv('OTEL_SERVICE_NAME', 'personal-finance-api'))
+
+
+# Span API
+
+def current_span():
+    return _current_span.get()
+
+
+def _finish(span):
+    span.end_ns = time.time_ns()
+    processor = _processor
+    if processor is not None:
+        processor.on_end(span)
+
+
+@contextmanager
+def start_span(name, attributes=None, kind=SPAN_KIND_INTERNAL):
+    """Child span of the current span; a no-op (yields None) outside a trace"""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    span = Span(name, parent.trace_id, parent.span_id, kind, attributes)
+    token = _current_span.set(span)
+    try:
+        yield span
+    except Exception as e:
+        span.set_error(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        _finish(span)
+
+
+def record_span(name, duration, attributes=None):
+    """Add an already finished child span that lasted ``duration`` seconds"""
+    parent = _current_span.get()
+    if parent is None:
+        return
+    end_ns = time.time_ns()
+    span = Span(name, parent.trace_id, parent.span_id, attributes=attributes,
+                start_ns=end_ns - int(duration * 1e9))
+    span.end_ns = end_ns
+    processor = _processor
+    if processor is not None:
+        processor.on_end(span)
+
+
+def traced(name=None):
+    """Decorator: run the function in a child span named ``name`` (default module.function)"""
+    def decorator(func):
+        span_name = name or f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_span.get() is None:
+                return func(*args, **kwargs)
+            with start_span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# Flask integration
+
+def _request_ids():
+    """(request_id, trace_id, parent_span_id, sampled) from the incoming headers"""
+    request_id = request.headers.get('X-Request-ID', '')
+    if not _REQUEST_ID.match(request_id):
+        request_id = uuid.uuid4().hex
+    match = _TRACEPARENT.match(request.headers.get('traceparent', ''))
+    if match:
+        return request_id, match.group(1), match.group(2), int(match.group(3), 16) & 1 == 1
+    sampled = random.random() < float(os.getenv('TRACING_SAMPLE_RATE', '1.0'))
+    return request_id, uuid.uuid4().hex, None, sampled
+
+
+class TracingJSONProvider(FastJSONProvider):
+    """orjson-backed JSON provider with a span around encoding"""
+
+    def dumps(self, obj, **kwargs):
+        if _current_span.get() is None:
+            return super().dumps(obj, **kwargs)
+        with start_span('json.encode') as span:
+            body = super().dumps(obj, **kwargs)
+            span.set_attribute('json.bytes', len(body))
+            return body
+
+
+def _traced_view(endpoint, view):
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        with start_span(f"view {endpoint}"):
+            return view(*args, **kwargs)
+    return wrapper
+
+
+def _sql_span(conn, statement, parameters, elapsed):
+    """Statement listener: a ``db.query`` child of the active span"""
+    if _current_span.get() is not None:
+        from .queries import statement_shape
+        record_span('db.query', elapsed, {
+            'db.system': conn.engine.dialect.name,
+            'db.statement': statement_shape(statement)[:1000]
+        })
+
+
+def init_tracing(app):
+    """Correlation ids for every request, spans for sampled ones.
+
+    Call after the blueprints are registered (views are wrapped) and before
+    other request hooks, so their log lines and queries are inside the trace.
+    """
+    from .queries import add_statement_listener
+
+    set_span_processor(build_span_processor())
+    if _processor is not None:
+        atexit.register(_processor.shutdown)
+    app.json = TracingJSONProvider(app)
+    for endpoint, view in list(app.view_functions.items()):
+        app.view_functions[endpoint] = _traced_view(endpoint, view)
+
+    add_statement_listener(_sql_span)
+
+    # Request state lives in the WSGI environ: teardown can run after the
+    # app context (and so ``g``) of a preserved test request has gone
+    @app.before_request
+    def start_request_trace():
+        request_id, trace_id, parent_id, sampled = _request_ids()
+        state = request.environ['tracing'] = {
+            'request_id': request_id,
+            'correlation': set_correlation(request_id, trace_id if sampled else None)
+        }
+        if sampled and _processor is not None:
+            span = Span(f"{request.method} {request.url_rule.rule if request.url_rule else request.path}",
+                        trace_id, parent_id, SPAN_KIND_SERVER, {
+                            'http.method': request.method,
+                            'http.target': request.path,
+                            'http.request_id': request_id
+                        })
+            state['span'] = span
+            state['span_token'] = _current_span.set(span)
+
+    @app.after_request
+    def add_request_id(response):
+        state = request.environ.get('tracing')
+        if state is None:
+            return response
+        response.headers['X-Request-ID'] = state['request_id']
+        span = state.get('span')
+        if span is not None:
+            span.set_attribute('http.status_code', response.status_code)
+            if response.status_code >= 500:
+                span.status = STATUS_ERROR
+        return response
+
+    @app.teardown_request
+    def end_request_trace(exc=None):
+        state = request.environ.pop('tracing', None)
+        if state is None:
+            return
+        span = state.get('span')
+        if span is not None:
+            if exc is not None:
+                span.set_error(exc)
+            _current_span.reset(state['span_token'])
+            _finish(span)
+        reset_correlation(state['correlation'])
@@ -0,0 +1,63 @@
+"""Shared fixtures: a bootstrapped database, and failing a test when an endpoint's SQL grows with its data"""
+import os
+
+import pytest
+from src.utils.queries import track_queries
+
+
+def pytest_configure(config):
+    """Keep the run off the developer's app.db and logs/.
+
+    Test modules import ``src.main.app`` while being collected, before any
+    fixture runs, so the database and log directory are chosen here: a
+    fresh directory under pytest's basetemp for every run.
+    """
+    root = pytest.TempPathFactory.from_config(config, _ispytest=True).mktemp('app')
+    os.environ['DATABASE_URL'] = f"sqlite:///{root / 'app.db'}"
+    os.environ['LOG_DIR'] = str(root / 'logs')
+
+
+@pytest.fixture(scope='session', autouse=True)
+def database():
+    """Importing the app no longer creates tables, so do it once per run"""
+    from src.main import app
+    from src.bootstrap import bootstrap_database
+
+    with app.app_context():
+        bootstrap_database()
+
+
+@pytest.fixture
+def assert_constant_queries():
+    """Check that ``send()`` runs the same number of statements at every data size.
+
+    ``add_row(index)`` adds one more row of the data under test; rows are
+    topped up to each of ``sizes`` before ``send()`` is called again. One
+    unmeasured call comes first so per-process caches (token blocklist,
+    claims) are warm for every measured one.
+    """
+    def check(send, add_row, sizes=(1, 5)):
+        counts = []
+        trackers = []
+        rows = 0
+        send()
+        for size in sizes:
+            while rows < size:
+                add_row(rows)
+                rows += 1
+            with track_queries() as tracker:
+                response = send()
+            assert response.status_code < 400, response.get_data(as_text=True)
+            counts.append(tracker.count)
+            trackers.append(tracker)
+
+        if len(set(counts)) > 1:
+            repeated = '\n'.join(
+                f"  {count} x {shape[:200]}" for shape, count, _ in trackers[-1].repeated(threshold=2)
+            )
+            pytest.fail(
+                f"Query count grows with data size: {dict(zip(sizes, counts))}\n{repeated}",
+                pytrace=False
+            )
+        return counts[0]
+    return check
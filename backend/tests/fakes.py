@@ -0,0 +1,54 @@
+"""Test doubles for external services"""
+import threading
+import time
+
+from src.utils.rate_limit import TOKEN_BUCKET_SCRIPT, RateLimit, take_token
+
+
+class FakeRedis:
+    """In-memory stand-in for the few Redis features RedisBackend uses.
+
+    ``register_script`` only understands TOKEN_BUCKET_SCRIPT and runs the
+    same algorithm in Python against hashes that honour PEXPIRE.
+    """
+
+    def __init__(self):
+        self._hashes = {}
+        self._expires = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def _alive(self, key, now):
+        expires = self._expires.get(key)
+        if expires is not None and expires <= now:
+            self._hashes.pop(key, None)
+            self._expires.pop(key, None)
+        return key in self._hashes
+
+    def register_script(self, script):
+        if script != TOKEN_BUCKET_SCRIPT:
+            raise NotImplementedError('FakeRedis only runs the token bucket script')
+
+        def run(keys, args):
+            key = keys[0]
+            capacity, rate, now, ttl_ms = float(args[0]), float(args[1]), float(args[2]), int(args[3])
+            with self._lock:
+                self.calls += 1
+                bucket = self._hashes.get(key) if self._alive(key, time.time()) else None
+                tokens, updated = (float(bucket['tokens']), float(bucket['updated'])) if bucket else (None, now)
+                allowed, tokens, retry_after = take_token(tokens, updated, now, RateLimit(capacity, capacity / rate))
+                self._hashes[key] = {'tokens': str(tokens), 'updated': str(now)}
+                self._expires[key] = time.time() + ttl_ms / 1000
+            return [int(allowed), str(retry_after)]
+        return run
+
+    def scan_iter(self, match='*'):
+        prefix = match.rstrip('*')
+        with self._lock:
+            return [key for key in list(self._hashes) if key.startswith(prefix)]
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._hashes.pop(key, None)
+                self._expires.pop(key, None)
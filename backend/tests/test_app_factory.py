@@ -0,0 +1,67 @@
+import os
+import subprocess
+import sys
+
+from src.main import create_app, db
+from src.models.account import AccountType
+from src.models.transaction import Category
+from src.models.investment import InvestmentType
+from src.utils.queries import track_queries
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_app():
+    return create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+        'SESSION_SWEEP_INTERVAL': 0
+    })
+
+
+def test_create_app_runs_no_sql():
+    with track_queries() as tracker:
+        app = make_app()
+    assert tracker.count == 0
+    assert 'session_sweeper' not in app.extensions
+    assert {'auth', 'account', 'budget', 'admin'} <= set(app.blueprints)
+
+
+def test_importing_main_builds_nothing():
+    # Route modules (and numpy behind the portfolio service) load when the app is first used
+    code = (
+        "import sys, src.main; "
+        "print(sorted(name for name in sys.modules if name.startswith('src.routes') or name == 'numpy')); "
+        "src.main.app; "
+        "print('src.routes.budget' in sys.modules)"
+    )
+    result = subprocess.run([sys.executable, '-c', code], cwd=BACKEND_DIR,
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.split('\n')[:2] == ['[]', 'True']
+
+
+def test_bootstrap_command_creates_schema_and_seed_data():
+    app = make_app()
+    result = app.test_cli_runner().invoke(args=['bootstrap'])
+    assert result.exit_code == 0, result.output
+    assert 'schema and default data' in result.output
+
+    with app.app_context():
+        assert AccountType.query.count() > 0
+        assert Category.query.count() > 0
+        assert InvestmentType.query.count() > 0
+
+        # Running it again is a no-op
+        counts = (AccountType.query.count(), Category.query.count())
+        assert app.test_cli_runner().invoke(args=['bootstrap']).exit_code == 0
+        assert (AccountType.query.count(), Category.query.count()) == counts
+
+
+def test_bootstrap_command_skip_seed():
+    app = make_app()
+    result = app.test_cli_runner().invoke(args=['bootstrap', '--skip-seed'])
+    assert result.exit_code == 0, result.output
+    assert 'schema only' in result.output
+    with app.app_context():
+        assert AccountType.query.count() == 0
+        db.session.remove()
@@ -0,0 +1,451 @@
+import pytest
+import json
+import threading
+import time
+import uuid
+import bcrypt
+from datetime import datetime, timedelta
+from src.main import app, db
+from src.models.user import User, UserSession
+from src.services.sessions import (
+    blocklist, hash_jti, is_token_revoked, revoke_user_sessions, purge_expired_sessions
+)
+from src.utils.passwords import (
+    PasswordHasher, PasswordHasherBusy, build_password_hasher, get_password_hasher, set_password_hasher,
+    hash_rounds
+)
+from src.utils.rate_limit import (
+    RateLimit, RateLimiter, MemoryBackend, RedisBackend, get_rate_limiter, set_rate_limiter
+)
+from sqlalchemy import event
+from tests.fakes import FakeRedis
+from src.utils import auth_cache
+from src.utils.auth_cache import claims_cache, get_cached_user
+from flask_jwt_extended import JWTManager, decode_token, create_access_token
+
+PASSWORD = 'Secret123'
+
+@pytest.fixture
+def client():
+    """Create test client"""
+    app.config['TESTING'] = True
+    app.config['JWT_SECRET_KEY'] = 'test-secret'
+
+    original = get_rate_limiter()
+    set_rate_limiter(RateLimiter(MemoryBackend()))
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+            yield client
+    set_rate_limiter(original)
+
+@pytest.fixture
+def hasher():
+    """Install a cheap hasher for the test and restore the original afterwards"""
+    original = get_password_hasher()
+    hasher = PasswordHasher(rounds=4, concurrency=1)
+    set_password_hasher(hasher)
+    yield hasher
+    set_password_hasher(original)
+
+@pytest.fixture
+def test_user(client, hasher):
+    """Create test user with a hash made at cost 5"""
+    user = User(
+        first_name='Test',
+        last_name='User',
+        email=f'auth-{uuid.uuid4().hex[:8]}@example.com',
+        password_hash=bcrypt.hashpw(PASSWORD.encode('utf-8'), bcrypt.gensalt(5)).decode('utf-8')
+    )
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+def saturate(hasher, release):
+    """Occupy every hashing slot until ``release`` is set"""
+    blockers = [threading.Thread(target=hasher._submit, args=(release.wait,))
+                for _ in range(hasher.concurrency)]
+    for thread in blockers:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while hasher.stats()['running'] < len(blockers) and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return blockers
+
+def login(client, user, password=PASSWORD):
+    return client.post('/api/auth/login', json={'email': user.email, 'password': password})
+
+
+class TestPasswordHasher:
+    """Test the bounded password hashing executor"""
+
+    def test_hash_and_verify(self, hasher):
+        """Test hashes use the configured cost and verify on the pool"""
+        password_hash = hasher.hash(PASSWORD)
+        assert hash_rounds(password_hash) == 4
+        assert hasher.verify(PASSWORD, password_hash)
+        assert not hasher.verify('Wrong123', password_hash)
+        assert not hasher.needs_rehash(password_hash)
+        assert hasher.stats()['completed'] == 3
+
+    def test_full_queue_rejects(self, hasher):
+        """Test a hash with every slot taken and no queue fails at once instead of waiting"""
+        release = threading.Event()
+        blockers = saturate(hasher, release)
+        try:
+            started = time.monotonic()
+            with pytest.raises(PasswordHasherBusy):
+                hasher.hash(PASSWORD)
+            assert time.monotonic() - started < 0.1
+            assert hasher.stats()['rejected'] == 1
+        finally:
+            release.set()
+            for thread in blockers:
+                thread.join()
+        assert hasher.stats()['running'] == 0
+
+    def test_queued_hash_waits_for_slot(self, hasher):
+        """Test a hash queued behind a busy slot runs once it frees, and the queue stays bounded"""
+        hasher.queue_size, hasher.queue_timeout = 1, 5.0
+        release = threading.Event()
+        blockers = saturate(hasher, release)
+        results = []
+        waiter = threading.Thread(target=lambda: results.append(hasher.hash(PASSWORD)))
+        try:
+            waiter.start()
+            deadline = time.monotonic() + 5
+            while hasher.stats()['waiting'] < 1 and time.monotonic() < deadline:
+                time.sleep(0.005)
+            assert hasher.stats()['waiting'] == 1
+            with pytest.raises(PasswordHasherBusy):
+                hasher.hash(PASSWORD)
+        finally:
+            release.set()
+            waiter.join()
+            for thread in blockers:
+                thread.join()
+        assert hash_rounds(results[0]) == 4
+        stats = hasher.stats()
+        assert stats['waiting'] == 0 and stats['rejected'] == 1
+
+    def test_queue_wait_times_out(self, hasher):
+        """Test a queued hash gives up after the queue timeout"""
+        hasher.queue_size, hasher.queue_timeout = 1, 0.05
+        release = threading.Event()
+        blockers = saturate(hasher, release)
+        try:
+            started = time.monotonic()
+            with pytest.raises(PasswordHasherBusy):
+                hasher.hash(PASSWORD)
+            assert 0.05 <= time.monotonic() - started < 1.0
+            assert hasher.stats()['waiting'] == 0
+        finally:
+            release.set()
+            for thread in blockers:
+                thread.join()
+
+    def test_concurrency_leaves_a_request_thread(self, monkeypatch):
+        """Test hashing slots default to, and are capped at, GUNICORN_THREADS - 1"""
+        monkeypatch.setenv('BCRYPT_ROUNDS', '4')
+        monkeypatch.setenv('GUNICORN_THREADS', '4')
+        monkeypatch.delenv('BCRYPT_CONCURRENCY', raising=False)
+        monkeypatch.delenv('BCRYPT_QUEUE_SIZE', raising=False)
+        assert build_password_hasher().concurrency == 3
+        assert build_password_hasher().queue_size == 3
+
+        monkeypatch.setenv('BCRYPT_CONCURRENCY', '8')
+        assert build_password_hasher().concurrency == 3
+        monkeypatch.setenv('GUNICORN_THREADS', '1')
+        assert build_password_hasher().concurrency == 1
+
+
+class TestLogin:
+    """Test login with the pooled hasher"""
+
+    def test_login_rehashes_old_cost(self, client, test_user):
+        """Test a successful login upgrades a hash made with another cost factor"""
+        assert hash_rounds(test_user.password_hash) == 5
+
+        response = login(client, test_user)
+        assert response.status_code == 200
+
+        db.session.refresh(test_user)
+        assert hash_rounds(test_user.password_hash) == 4
+        assert login(client, test_user).status_code == 200
+
+    def test_failed_login_keeps_hash(self, client, test_user):
+        """Test a wrong password never rewrites the stored hash"""
+        original = test_user.password_hash
+        assert login(client, test_user, 'Wrong123').status_code == 401
+        db.session.refresh(test_user)
+        assert test_user.password_hash == original
+
+    def test_login_busy(self, client, test_user, hasher):
+        """Test a saturated hasher answers 503 with Retry-After"""
+        release = threading.Event()
+        blockers = saturate(hasher, release)
+        try:
+            response = login(client, test_user)
+            assert response.status_code == 503
+            assert response.headers['Retry-After'] == '1'
+            assert 'busy' in json.loads(response.data)['error']
+        finally:
+            release.set()
+            for thread in blockers:
+                thread.join()
+
+    def test_get_served_during_login_burst(self, client, test_user, hasher):
+        """Test a GET completes while a burst of logins holds and overflows the hashing slots"""
+        token = create_access_token(identity=str(test_user.id))
+        release = threading.Event()
+        blockers = saturate(hasher, release)
+        statuses = []
+
+        def burst():
+            with app.test_client() as burst_client:
+                statuses.append(login(burst_client, test_user).status_code)
+
+        logins = [threading.Thread(target=burst) for _ in range(8)]
+        try:
+            for thread in logins:
+                thread.start()
+            started = time.monotonic()
+            response = client.get('/api/auth/me', headers={'Authorization': f'Bearer {token}'})
+            assert response.status_code == 200
+            assert time.monotonic() - started < 1.0
+            for thread in logins:
+                thread.join(timeout=5)
+            # Nobody waited for a slot: the burst was turned away (or throttled) while the hash was held
+            assert len(statuses) == 8 and set(statuses) <= {429, 503}
+        finally:
+            release.set()
+            for thread in blockers:
+                thread.join()
+
+
+class TestRateLimit:
+    """Test token-bucket throttling of auth endpoints"""
+
+    def test_memory_bucket_refills(self, monkeypatch):
+        """Test a bucket allows its capacity, then refills over time"""
+        clock = [1000.0]
+        monkeypatch.setattr('src.utils.rate_limit.time.monotonic', lambda: clock[0])
+        backend, limit = MemoryBackend(), RateLimit(2, 10)
+
+        assert backend.hit('k', limit)[0]
+        assert backend.hit('k', limit)[0]
+        allowed, retry_after = backend.hit('k', limit)
+        assert not allowed
+        assert retry_after == pytest.approx(5.0)
+
+        clock[0] += 5
+        assert backend.hit('k', limit)[0]
+        assert not backend.hit('k', limit)[0]
+
+    def test_redis_backend_shared_between_workers(self):
+        """Test two workers on one Redis share a bucket"""
+        server = FakeRedis()
+        workers = [RedisBackend(server), RedisBackend(server)]
+        limit = RateLimit(3, 60)
+
+        results = [workers[i % 2].hit('login:ip:1.2.3.4', limit)[0] for i in range(4)]
+        assert results == [True, True, True, False]
+        assert server.calls == 4
+
+    def test_login_throttled_by_email(self, client, test_user):
+        """Test repeated logins for one email get 429 without DB or bcrypt work"""
+        set_rate_limiter(RateLimiter(MemoryBackend(), {'login': {'ip': '100/60', 'email': '2/60'}}))
+        assert login(client, test_user, 'Wrong123').status_code == 401
+        assert login(client, test_user, 'Wrong123').status_code == 401
+
+        statements = []
+        def count(*args):
+            statements.append(args)
+        hashed = get_password_hasher().stats()['completed']
+        event.listen(db.engine, 'before_cursor_execute', count)
+        try:
+            response = login(client, test_user)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', count)
+
+        assert response.status_code == 429
+        assert int(response.headers['Retry-After']) >= 1
+        assert statements == []
+        assert get_password_hasher().stats()['completed'] == hashed
+
+    def test_register_throttled_by_ip(self, client, hasher):
+        """Test registrations from one address are limited"""
+        set_rate_limiter(RateLimiter(MemoryBackend(), {'register': {'ip': '1/3600'}}))
+        payload = {'first_name': 'New', 'last_name': 'User', 'password': PASSWORD}
+
+        first = client.post('/api/auth/register', json={**payload, 'email': f'r-{uuid.uuid4().hex[:8]}@example.com'})
+        second = client.post('/api/auth/register', json={**payload, 'email': f'r-{uuid.uuid4().hex[:8]}@example.com'})
+        assert first.status_code == 201
+        assert second.status_code == 429
+
+
+class TestSessions:
+    """Test session storage, revocation and expiry"""
+
+    def login_tokens(self, client, user):
+        data = json.loads(login(client, user).data)
+        return data['access_token'], data['refresh_token']
+
+    def test_session_keyed_by_jti_digest(self, client, test_user):
+        """Test sessions store SHA-256 digests of the token JTIs"""
+        access_token, refresh_token = self.login_tokens(client, test_user)
+        session = UserSession.query.filter_by(user_id=test_user.id).one()
+
+        assert session.token_hash == hash_jti(decode_token(access_token)['jti'])
+        assert session.refresh_token_hash == hash_jti(decode_token(refresh_token)['jti'])
+        assert session.expires_at > datetime.utcnow() + timedelta(days=1)
+
+    def test_logout_revokes_tokens(self, client, test_user):
+        """Test tokens of a logged-out session are rejected"""
+        access_token, refresh_token = self.login_tokens(client, test_user)
+        headers = {'Authorization': f'Bearer {access_token}'}
+        assert client.get('/api/auth/me', headers=headers).status_code == 200
+
+        assert client.post('/api/auth/logout', headers=headers).status_code == 200
+        assert client.get('/api/auth/me', headers=headers).status_code == 401
+        response = client.post('/api/auth/refresh', headers={'Authorization': f'Bearer {refresh_token}'})
+        assert response.status_code == 401
+
+    def test_refresh_rotates_session_token(self, client, test_user):
+        """Test a refreshed access token stays tied to its session"""
+        _, refresh_token = self.login_tokens(client, test_user)
+        response = client.post('/api/auth/refresh', headers={'Authorization': f'Bearer {refresh_token}'})
+        assert response.status_code == 200
+
+        new_access = json.loads(response.data)['access_token']
+        session = UserSession.query.filter_by(user_id=test_user.id).one()
+        assert session.token_hash == hash_jti(decode_token(new_access)['jti'])
+
+    def test_superseded_access_token_revoked(self, client, test_user):
+        """Test an access token replaced by a refresh is still revoked by logout"""
+        first_access, refresh_token = self.login_tokens(client, test_user)
+        response = client.post('/api/auth/refresh', headers={'Authorization': f'Bearer {refresh_token}'})
+        new_access = json.loads(response.data)['access_token']
+
+        logout = client.post('/api/auth/logout', headers={'Authorization': f'Bearer {new_access}'})
+        assert logout.status_code == 200
+        # A fresh blocklist, as in a worker that never saw either token
+        blocklist.clear()
+        assert client.get('/api/auth/me', headers={'Authorization': f'Bearer {first_access}'}).status_code == 401
+        assert client.get('/api/auth/me', headers={'Authorization': f'Bearer {new_access}'}).status_code == 401
+
+    def test_blocklist_served_from_cache(self, client, test_user):
+        """Test repeated blocklist checks for a token do not query the database"""
+        access_token, _ = self.login_tokens(client, test_user)
+        claims = decode_token(access_token)
+        assert not is_token_revoked(claims)
+
+        statements = []
+        def count(*args):
+            statements.append(args)
+        event.listen(db.engine, 'before_cursor_execute', count)
+        try:
+            assert not is_token_revoked(claims)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', count)
+        assert statements == []
+
+        revoke_user_sessions(test_user.id)
+        db.session.commit()
+        assert is_token_revoked(claims)
+
+    def test_purge_expired_sessions(self, client, test_user):
+        """Test expired sessions are deleted in batches and live ones kept"""
+        now = datetime.utcnow()
+        db.session.add_all([
+            UserSession(user_id=test_user.id, token_hash=uuid.uuid4().hex, expires_at=now - timedelta(days=1))
+            for _ in range(25)
+        ])
+        db.session.add(UserSession(user_id=test_user.id, token_hash=uuid.uuid4().hex,
+                                   expires_at=now + timedelta(days=1)))
+        db.session.commit()
+
+        assert purge_expired_sessions(batch_size=10) >= 25
+        assert UserSession.query.filter_by(user_id=test_user.id).count() == 1
+
+
+class TestAuthCache:
+    """Test cached JWT claims and user snapshots"""
+
+    def test_me_served_without_queries(self, client, test_user):
+        """Test a repeat authenticated request skips decoding and the database"""
+        token = json.loads(login(client, test_user).data)['access_token']
+        headers = {'Authorization': f'Bearer {token}'}
+        assert client.get('/api/auth/me', headers=headers).status_code == 200
+
+        statements = []
+        def count(*args):
+            statements.append(args)
+        hits = claims_cache.hits
+        event.listen(db.engine, 'before_cursor_execute', count)
+        try:
+            response = client.get('/api/auth/me', headers=headers)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', count)
+
+        assert response.status_code == 200
+        assert json.loads(response.data)['user']['email'] == test_user.email
+        assert claims_cache.hits > hits
+        assert statements == []
+
+    def test_cached_claims_still_expire(self, client, test_user):
+        """Test a cached token is refused once it expires"""
+        token = create_access_token(identity=str(test_user.id), expires_delta=timedelta(seconds=1))
+        headers = {'Authorization': f'Bearer {token}'}
+        assert client.get('/api/auth/me', headers=headers).status_code == 200
+
+        time.sleep(1.5)
+        response = client.get('/api/auth/me', headers=headers)
+        assert response.status_code == 401
+        assert json.loads(response.data)['message'] == 'Token has expired'
+
+    def test_cached_claims_expire_after_ttl(self, client, test_user, monkeypatch):
+        """Test cached claims are verified again once CLAIMS_CACHE_TTL has passed"""
+        decodes = []
+        decode = JWTManager._decode_jwt_from_config
+
+        def counting_decode(self, *args, **kwargs):
+            decodes.append(args[0])
+            return decode(self, *args, **kwargs)
+
+        monkeypatch.setattr(JWTManager, '_decode_jwt_from_config', counting_decode)
+        headers = {'Authorization': f'Bearer {create_access_token(identity=str(test_user.id))}'}
+        assert client.get('/api/auth/me', headers=headers).status_code == 200
+        assert client.get('/api/auth/me', headers=headers).status_code == 200
+        assert len(decodes) == 1
+
+        monkeypatch.setattr(auth_cache, 'CLAIMS_CACHE_TTL', 0)
+        assert client.get('/api/auth/me', headers=headers).status_code == 200
+        assert len(decodes) == 2
+
+    def test_user_versions_bounded(self):
+        """Test versions are kept for a bounded set of users and never reused after eviction"""
+        versions = auth_cache._UserVersions(max_size=2)
+        versions.bump('1')
+        stale = versions.get('1')
+        versions.bump('2')
+        versions.bump('3')
+        assert len(versions) == 2
+        # '1' was evicted; its version must still differ from what cached entries carry
+        assert versions.get('1') > stale
+        assert versions.get('never-changed') == versions.get('1')
+        floor = versions.get('1')
+        versions.bump('1')
+        assert versions.get('1') != floor
+
+    def test_user_update_invalidates_snapshot(self, client, test_user):
+        """Test committing a profile change drops the cached snapshot"""
+        assert get_cached_user(test_user.id).to_dict()['first_name'] == 'Test'
+
+        test_user.first_name = 'Renamed'
+        db.session.commit()
+        assert get_cached_user(test_user.id).to_dict()['first_name'] == 'Renamed'
+
+        test_user.is_active = False
+        db.session.commit()
+        assert not get_cached_user(test_user.id).is_active
@@ -0,0 +1,95 @@
+import gzip
+import zlib
+
+import brotli
+import pytest
+from flask import Response, jsonify
+
+from src.main import create_app
+
+ROWS = [{'id': i, 'description': f'Transaction number {i}', 'amount': -12.5} for i in range(200)]
+
+
+@pytest.fixture
+def app():
+    """App with a few extra views of known size and type"""
+    app = create_app({'TESTING': True, 'SESSION_SWEEP_INTERVAL': 0})
+    app.extensions['compression'].min_size = 1024
+    progress = []
+
+    @app.route('/test/large')
+    def large():
+        return jsonify({'transactions': ROWS})
+
+    @app.route('/test/small')
+    def small():
+        return jsonify({'ok': True})
+
+    @app.route('/test/binary')
+    def binary():
+        return Response(b'\x89PNG' * 1000, mimetype='image/png')
+
+    @app.route('/test/stream')
+    def stream():
+        def generate():
+            for i in range(3):
+                progress.append(i)
+                yield f'{{"chunk": {i}, "padding": "{"x" * 500}"}}\n'
+        return Response(generate(), mimetype='application/x-ndjson')
+
+    app.progress = progress
+    return app
+
+
+class TestResponseCompression:
+    """Test responses are compressed by size, type and Accept-Encoding"""
+
+    def test_gzip_large_json(self, app):
+        with app.test_client() as client:
+            plain = client.get('/test/large')
+            response = client.get('/test/large', headers={'Accept-Encoding': 'gzip'})
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in response.headers['Vary']
+        assert gzip.decompress(response.data) == plain.data
+        assert int(response.headers['Content-Length']) < len(plain.data) / 4
+
+    def test_brotli_preferred(self, app):
+        with app.test_client() as client:
+            plain = client.get('/test/large')
+            response = client.get('/test/large', headers={'Accept-Encoding': 'gzip, deflate, br'})
+        assert response.headers['Content-Encoding'] == 'br'
+        assert brotli.decompress(response.data) == plain.data
+
+    @pytest.mark.parametrize('path, headers', [
+        ('/test/large', {}),
+        ('/test/large', {'Accept-Encoding': 'gzip;q=0, identity'}),
+        ('/test/small', {'Accept-Encoding': 'gzip'}),
+        ('/test/binary', {'Accept-Encoding': 'gzip'}),
+    ])
+    def test_left_uncompressed(self, app, path, headers):
+        with app.test_client() as client:
+            response = client.get(path, headers=headers)
+        assert 'Content-Encoding' not in response.headers
+
+    def test_disabled(self, app):
+        app.extensions['compression'].enabled = False
+        with app.test_client() as client:
+            response = client.get('/test/large', headers={'Accept-Encoding': 'gzip'})
+        assert 'Content-Encoding' not in response.headers
+
+    def test_streamed_chunk_by_chunk(self, app):
+        with app.test_client() as client:
+            response = client.get('/test/stream', headers={'Accept-Encoding': 'gzip'}, buffered=False)
+            assert response.headers['Content-Encoding'] == 'gzip'
+            assert 'Content-Length' not in response.headers
+
+            decoder = zlib.decompressobj(31)
+            chunks = iter(response.response)
+            first = decoder.decompress(next(chunks))
+            # The first chunk decodes on its own, before the view yields the second
+            assert first.startswith(b'{"chunk": 0')
+            assert app.progress == [0]
+
+            rest = b''.join(decoder.decompress(chunk) for chunk in chunks) + decoder.flush()
+            assert (first + rest).count(b'\n') == 3
+            response.close()
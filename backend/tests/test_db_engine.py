@@ -0,0 +1,110 @@
+import logging
+
+import pytest
+from sqlalchemy import text
+
+from src.main import create_app, db
+from src.utils.db_engine import engine_options, pool_settings, pool_stats
+from src.utils.metrics import InstrumentedQueuePool, pool_checkout_wait, pool_events
+
+
+@pytest.fixture
+def gunicorn_env(monkeypatch):
+    for name in ('DB_POOL_SIZE', 'DB_MAX_OVERFLOW', 'DB_MAX_CONNECTIONS'):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv('GUNICORN_WORKERS', '4')
+    monkeypatch.setenv('GUNICORN_THREADS', '4')
+    return monkeypatch
+
+
+class TestEngineOptions:
+    """Test pool sizing from the gunicorn settings"""
+
+    def test_pool_sized_to_threads(self, gunicorn_env):
+        options = engine_options('postgresql://app@db/finance')
+        assert options['poolclass'] is InstrumentedQueuePool
+        assert options['pool_size'] == 6  # 4 threads + background threads
+        assert options['max_overflow'] == 4
+        assert options['pool_pre_ping'] is True
+        assert options['pool_recycle'] == 1800
+
+    def test_overflow_capped_by_server_connections(self, gunicorn_env):
+        gunicorn_env.setenv('GUNICORN_WORKERS', '8')
+        gunicorn_env.setenv('DB_MAX_CONNECTIONS', '64')
+        settings = pool_settings()
+        assert settings['pool_size'] == 6
+        assert settings['max_overflow'] == 2
+        assert settings['max_connections_used'] == 64
+
+    def test_explicit_settings_win(self, gunicorn_env):
+        gunicorn_env.setenv('DB_POOL_SIZE', '3')
+        gunicorn_env.setenv('DB_MAX_OVERFLOW', '0')
+        options = engine_options('postgresql://app@db/finance')
+        assert (options['pool_size'], options['max_overflow']) == (3, 0)
+
+    def test_sqlite_file_gets_busy_timeout(self, gunicorn_env):
+        options = engine_options('sqlite:////tmp/app.db')
+        assert options['connect_args'] == {'timeout': 5.0}
+        assert 'pool_pre_ping' not in options
+
+    def test_in_memory_sqlite_keeps_defaults(self):
+        assert engine_options('sqlite:///:memory:') == {}
+        assert engine_options('sqlite://') == {}
+
+
+class TestSqliteTuning:
+    """Test pragmas on new SQLite connections and pool statistics"""
+
+    def test_pragmas_applied(self, tmp_path):
+        app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'tuned.db'}",
+            'SESSION_SWEEP_INTERVAL': 0
+        })
+        with app.app_context():
+            with db.engine.connect() as conn:
+                assert conn.execute(text('PRAGMA journal_mode')).scalar() == 'wal'
+                assert conn.execute(text('PRAGMA synchronous')).scalar() == 1  # NORMAL
+                assert conn.execute(text('PRAGMA busy_timeout')).scalar() == 5000
+                assert conn.execute(text('PRAGMA cache_size')).scalar() == -65536
+
+                stats = pool_stats(db.engine)
+                assert stats['class'] == 'InstrumentedQueuePool'
+                assert stats['checked_out'] == 1
+            assert pool_stats(db.engine)['checked_out'] == 0
+            db.engine.dispose()
+
+    def test_pool_stats_in_health_and_metrics(self):
+        from src.main import app
+        with app.test_client() as client:
+            health = client.get('/api/health').get_json()
+            assert 'checked_out' in health['db_pool']
+            metrics = client.get('/metrics').get_data(as_text=True)
+            assert '# TYPE db_pool_checked_out gauge' in metrics
+
+    def test_pool_checkouts_timed_not_logged(self, tmp_path):
+        """Test checkouts reach the metrics and not the DEBUG log"""
+        app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'pool.db'}",
+            'SESSION_SWEEP_INTERVAL': 0
+        })
+        records = []
+        handler = logging.Handler(logging.DEBUG)
+        handler.emit = records.append
+        logging.getLogger().addHandler(handler)
+        before = dict((tuple(key), value) for key, value in pool_events.snapshot()['samples'])
+        waits = sum(count for _, (_, _, count) in pool_checkout_wait.snapshot()['samples'])
+        try:
+            with app.app_context():
+                for _ in range(3):
+                    with db.engine.connect() as conn:
+                        conn.execute(text('SELECT 1'))
+                db.engine.dispose()
+        finally:
+            logging.getLogger().removeHandler(handler)
+
+        after = dict((tuple(key), value) for key, value in pool_events.snapshot()['samples'])
+        assert after[('checkout',)] - before.get(('checkout',), 0) == 3
+        assert sum(count for _, (_, _, count) in pool_checkout_wait.snapshot()['samples']) - waits >= 3
+        assert not [record for record in records if 'pool' in record.name.lower()]
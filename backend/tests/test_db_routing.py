@@ -0,0 +1,161 @@
+import time
+
+import pytest
+from flask import jsonify
+from flask_jwt_extended import create_access_token, get_jwt_identity, jwt_required
+from sqlalchemy import text
+
+from src.main import create_app, db
+from src.models.account import Account, AccountType, init_account_types
+from src.models.user import User
+from src.utils.db_routing import (
+    MemoryWriteMarks, RedisWriteMarks, ReplicaRouter, build_replica_router, get_replica_router,
+    pin_primary, set_replica_router, use_primary
+)
+
+
+@pytest.fixture
+def replica_app(tmp_path):
+    """App whose replica bind is a second local database with its own rows"""
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'primary.db'}",
+        'SQLALCHEMY_BINDS': {'replica': f"sqlite:///{tmp_path / 'replica.db'}"},
+        'SESSION_SWEEP_INTERVAL': 0
+    })
+    previous = get_replica_router()
+    set_replica_router(ReplicaRouter(MemoryWriteMarks(), sticky_seconds=60))
+    with app.app_context():
+        db.create_all(bind_key=None)
+        db.metadata.create_all(db.engines['replica'])
+        init_account_types()
+        users = [User(first_name='Replica', last_name=str(i), email=f'replica{i}@example.com') for i in range(2)]
+        db.session.add_all(users)
+        db.session.commit()
+
+        # The replica holds the same users plus a row the primary lacks
+        with db.engines['replica'].begin() as conn:
+            for user in users:
+                conn.execute(text(
+                    "INSERT INTO users (id, email, first_name, last_name) VALUES (:id, :email, 'Replica', '-')"
+                ), {'id': user.id, 'email': user.email})
+                conn.execute(text(
+                    "INSERT INTO accounts (user_id, name, balance, currency, is_active) "
+                    "VALUES (:user_id, 'Only on replica', 0, 'USD', 1)"
+                ), {'user_id': user.id})
+        tokens = [create_access_token(identity=str(user.id)) for user in users]
+        checking = AccountType.query.filter_by(name='Checking').first().id
+    yield app, [{'Authorization': f'Bearer {token}'} for token in tokens], checking
+    set_replica_router(previous)
+    with app.app_context():
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+    # init_app registered an empty metadata for the bind on the shared db;
+    # other apps have no such engine, so their create_all() would fail on it
+    db.metadatas.pop('replica', None)
+
+
+def account_names(response):
+    return {account['name'] for account in response.get_json()['accounts']}
+
+
+class TestReplicaRouting:
+    """Test GET reads go to the replica unless the user just wrote"""
+
+    def test_get_reads_from_replica(self, replica_app):
+        app, headers, _ = replica_app
+        with app.test_client() as client:
+            response = client.get('/api/accounts', headers=headers[0])
+        assert response.status_code == 200
+        assert response.headers['X-DB-Route'] == 'replica'
+        assert account_names(response) == {'Only on replica'}
+
+    def test_reads_stick_to_primary_after_write(self, replica_app):
+        app, headers, checking = replica_app
+        with app.test_client() as client:
+            created = client.post('/api/accounts', headers=headers[0],
+                                  json={'name': 'New checking', 'account_type_id': checking})
+            assert created.status_code == 201
+            assert 'X-DB-Route' not in created.headers
+
+            response = client.get('/api/accounts', headers=headers[0])
+            assert response.headers['X-DB-Route'] == 'primary'
+            assert account_names(response) == {'New checking'}
+
+            # Other users keep reading from the replica
+            other = client.get('/api/accounts', headers=headers[1])
+            assert other.headers['X-DB-Route'] == 'replica'
+
+    def test_stickiness_expires(self, replica_app):
+        app, headers, checking = replica_app
+        get_replica_router().sticky_seconds = 0.05
+        with app.test_client() as client:
+            client.post('/api/accounts', headers=headers[0],
+                        json={'name': 'New checking', 'account_type_id': checking})
+            time.sleep(0.1)
+            response = client.get('/api/accounts', headers=headers[0])
+        assert response.headers['X-DB-Route'] == 'replica'
+
+    def test_health_reports_replica(self, replica_app):
+        app, headers, _ = replica_app
+        with app.test_client() as client:
+            health = client.get('/api/health').get_json()
+        assert health['checks']['database'] == 'ok'
+        assert health['db_replica']['sticky_seconds'] == 60
+
+    def test_memory_write_marks_expire(self):
+        marks = MemoryWriteMarks(max_keys=2)
+        marks.mark('1', 60)
+        marks.mark('2', 0)
+        marks.mark('3', 60)
+        assert marks.recent('3')
+        assert not marks.recent('2')
+        assert not marks.recent('1')  # evicted by max_keys
+
+    def test_writing_get_reads_from_primary(self, replica_app):
+        app, headers, _ = replica_app
+
+        def names():
+            return sorted(a.name for a in Account.query.filter_by(user_id=int(get_jwt_identity())))
+
+        @app.route('/test/pinned')
+        @jwt_required()
+        @use_primary
+        def pinned():
+            return jsonify(names())
+
+        @app.route('/test/pinned-midway')
+        @jwt_required()
+        def pinned_midway():
+            before = names()
+            pin_primary()
+            return jsonify([before, names()])
+
+        with app.test_client() as client:
+            response = client.get('/test/pinned', headers=headers[0])
+            assert response.headers['X-DB-Route'] == 'primary'
+            assert response.get_json() == []
+
+            response = client.get('/test/pinned-midway', headers=headers[0])
+            assert response.get_json() == [['Only on replica'], []]
+
+
+class TestWriteMarksBackend:
+    """Test per-process marks are never used by several workers"""
+
+    def test_memory_with_one_worker(self, monkeypatch):
+        monkeypatch.delenv('GUNICORN_WORKERS', raising=False)
+        monkeypatch.delenv('REPLICA_STICKY_BACKEND', raising=False)
+        assert isinstance(build_replica_router().marks, MemoryWriteMarks)
+
+    def test_redis_by_default_with_workers(self, monkeypatch):
+        monkeypatch.setenv('GUNICORN_WORKERS', '4')
+        monkeypatch.delenv('REPLICA_STICKY_BACKEND', raising=False)
+        assert isinstance(build_replica_router().marks, RedisWriteMarks)
+
+    def test_memory_refused_with_workers(self, monkeypatch):
+        monkeypatch.setenv('GUNICORN_WORKERS', '4')
+        monkeypatch.setenv('REPLICA_STICKY_BACKEND', 'memory')
+        with pytest.raises(RuntimeError, match='redis'):
+            build_replica_router()
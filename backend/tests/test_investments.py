@@ -0,0 +1,522 @@
+import pytest
+import json
+import uuid
+import numpy as np
+from datetime import date, datetime, timedelta
+from src.main import app, db
+from src.models.user import User
+from src.models.investment import (
+    Investment, InvestmentType, InvestmentTransaction, PriceHistory, Dividend, TaxLot, LotState, RealizedGain
+)
+from src.services.lots import LotMatcher, LotMatchingError
+from src.services.performance import xirr
+from src.services.portfolio import portfolio_version
+from src.services.price_history import upsert_prices
+from src.services.rebalance import solve_rebalance
+from flask_jwt_extended import create_access_token
+
+@pytest.fixture
+def client():
+    """Create test client"""
+    app.config['TESTING'] = True
+    app.config['JWT_SECRET_KEY'] = 'test-secret'
+
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+            for name in ['Stock', 'ETF', 'Bond']:
+                if not InvestmentType.query.filter_by(name=name).first():
+                    db.session.add(InvestmentType(name=name))
+            db.session.commit()
+            yield client
+
+@pytest.fixture
+def test_user(client):
+    """Create a fresh user so portfolios never leak between tests"""
+    user = User(
+        first_name='Investor',
+        last_name='User',
+        email=f'investor-{uuid.uuid4().hex[:12]}@example.com',
+        password_hash='hashed_password'
+    )
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+@pytest.fixture
+def auth_headers(test_user):
+    """Create authorization headers with JWT token"""
+    token = create_access_token(identity=str(test_user.id))
+    return {'Authorization': f'Bearer {token}'}
+
+def type_id(name):
+    return InvestmentType.query.filter_by(name=name).first().id
+
+def add_investment(user, name, symbol, type_name, trades, price=None):
+    """Create an investment with (type, quantity, price, days_ago) trades"""
+    investment = Investment(user_id=user.id, name=name, symbol=symbol, investment_type_id=type_id(type_name))
+    db.session.add(investment)
+    db.session.flush()
+    now = datetime.utcnow()
+    for trade_type, quantity, trade_price, days_ago in trades:
+        db.session.add(InvestmentTransaction(
+            investment_id=investment.id, type=trade_type, quantity=quantity,
+            price=trade_price, transaction_date=now - timedelta(days=days_ago)
+        ))
+    if price is not None:
+        db.session.add(PriceHistory(investment_id=investment.id, price=price - 5, recorded_at=now - timedelta(days=1)))
+        db.session.add(PriceHistory(investment_id=investment.id, price=price, recorded_at=now))
+    db.session.commit()
+    return investment
+
+class TestPortfolioValuation:
+    """Test holdings valuation endpoints"""
+
+    def test_portfolio_empty(self, client, auth_headers):
+        """Test portfolio for a user without investments"""
+        response = client.get('/api/investments/portfolio', headers=auth_headers)
+        assert response.status_code == 200
+
+        data = json.loads(response.data)
+        assert data['holdings'] == []
+        assert data['allocation'] == []
+        assert data['summary']['market_value'] == 0
+
+    def test_portfolio_values_holdings(self, client, auth_headers, test_user):
+        """Test market value, unrealized and realized P&L from trades and latest prices"""
+        add_investment(test_user, 'Acme Corp', 'ACME', 'Stock',
+                       [('buy', 10, 100.0, 30), ('buy', 10, 120.0, 20), ('sell', 5, 150.0, 10)],
+                       price=130.0)
+        add_investment(test_user, 'Bond Fund', 'BND', 'Bond', [('buy', 20, 50.0, 5)], price=55.0)
+
+        response = client.get('/api/investments/portfolio', headers=auth_headers)
+        assert response.status_code == 200
+
+        data = json.loads(response.data)
+        holdings = {h['symbol']: h for h in data['holdings']}
+        acme = holdings['ACME']
+        assert acme['quantity'] == 15
+        assert acme['average_cost'] == pytest.approx(110.0)
+        assert acme['market_price'] == 130.0
+        assert acme['market_value'] == pytest.approx(1950.0)
+        assert acme['unrealized_pl'] == pytest.approx(300.0)
+        assert acme['realized_pl'] == pytest.approx(200.0)
+
+        assert data['summary']['market_value'] == pytest.approx(3050.0)
+        assert data['summary']['realized_pl'] == pytest.approx(200.0)
+
+        allocation = {a['investment_type']: a for a in data['allocation']}
+        assert allocation['Stock']['market_value'] == pytest.approx(1950.0)
+        assert allocation['Bond']['percentage'] == pytest.approx(36.07, abs=0.01)
+
+    def test_interleaved_trades_use_running_cost(self, client, auth_headers, test_user):
+        """Test a buy after a full sell starts a fresh average cost"""
+        add_investment(test_user, 'Acme Corp', 'ACME', 'Stock',
+                       [('buy', 10, 100.0, 30), ('sell', 10, 150.0, 20), ('buy', 10, 200.0, 10)],
+                       price=210.0)
+
+        response = client.get('/api/investments/portfolio', headers=auth_headers)
+        assert response.status_code == 200
+
+        acme = json.loads(response.data)['holdings'][0]
+        assert acme['quantity'] == 10
+        assert acme['average_cost'] == pytest.approx(200.0)
+        assert acme['cost_basis'] == pytest.approx(2000.0)
+        assert acme['realized_pl'] == pytest.approx(500.0)
+        assert acme['unrealized_pl'] == pytest.approx(100.0)
+
+    def test_get_investments_lists_holdings(self, client, auth_headers, test_user):
+        """Test that the investments list is no longer a stub"""
+        add_investment(test_user, 'Index ETF', 'VTI', 'ETF', [('buy', 3, 200.0, 1)])
+
+        response = client.get('/api/investments', headers=auth_headers)
+        assert response.status_code == 200
+
+        data = json.loads(response.data)
+        assert len(data['investments']) == 1
+        assert data['investments'][0]['market_value'] == pytest.approx(600.0)
+
+    def test_portfolio_no_auth(self, client):
+        """Test portfolio endpoint without authentication"""
+        response = client.get('/api/investments/portfolio')
+        assert response.status_code == 401
+
+class TestInvestmentTransactions:
+    """Test recording trades"""
+
+    def test_create_investment_with_opening_position(self, client, auth_headers):
+        """Test that an opening quantity is recorded as a buy"""
+        response = client.post('/api/investments', headers=auth_headers, json={
+            'name': 'Acme Corp', 'symbol': 'acme', 'investment_type_id': type_id('Stock'),
+            'quantity': 4, 'purchase_price': 25.0
+        })
+        assert response.status_code == 201
+
+        data = json.loads(response.data)
+        assert data['investment']['symbol'] == 'ACME'
+        assert InvestmentTransaction.query.filter_by(investment_id=data['investment']['id']).count() == 1
+
+    def test_buy_and_sell(self, client, auth_headers, test_user):
+        """Test recording trades keeps the stored position in sync"""
+        investment = add_investment(test_user, 'Acme Corp', 'ACME', 'Stock', [])
+        url = f'/api/investments/{investment.id}/transactions'
+
+        response = client.post(url, headers=auth_headers, json={'type': 'buy', 'quantity': 10, 'price': 20})
+        assert response.status_code == 201
+        response = client.post(url, headers=auth_headers, json={'type': 'sell', 'quantity': 4, 'price': 30})
+        assert response.status_code == 201
+
+        assert db.session.get(Investment, investment.id).quantity == 6
+
+        response = client.get(url, headers=auth_headers)
+        assert len(json.loads(response.data)['transactions']) == 2
+
+    def test_cannot_oversell(self, client, auth_headers, test_user):
+        """Test selling more than held is rejected"""
+        investment = add_investment(test_user, 'Acme Corp', 'ACME', 'Stock', [])
+        response = client.post(f'/api/investments/{investment.id}/transactions', headers=auth_headers,
+                               json={'type': 'sell', 'quantity': 1, 'price': 10})
+        assert response.status_code == 400
+
+    def test_unmatched_sell_not_stored(self, client, auth_headers, test_user):
+        """Test a sell the trade log cannot cover is rolled back with its lots"""
+        investment = add_investment(test_user, 'Acme Corp', 'ACME', 'Stock', [])
+        investment.quantity = 10
+        db.session.commit()
+
+        response = client.post(f'/api/investments/{investment.id}/transactions', headers=auth_headers,
+                               json={'type': 'sell', 'quantity': 5, 'price': 10})
+        assert response.status_code == 400
+
+        db.session.expire_all()
+        assert InvestmentTransaction.query.filter_by(investment_id=investment.id).count() == 0
+        assert db.session.get(Investment, investment.id).quantity == 10
+        assert LotState.query.filter_by(investment_id=investment.id).count() == 0
+
+    def test_invalid_trade_type(self, client, auth_headers, test_user):
+        """Test unknown trade types are rejected"""
+        investment = add_investment(test_user, 'Acme Corp', 'ACME', 'Stock', [])
+        response = client.post(f'/api/investments/{investment.id}/transactions', headers=auth_headers,
+                               json={'type': 'gift', 'quantity': 1, 'price': 10})
+        assert response.status_code == 400
+
+class TestLotMatcher:
+    """Test deque-based lot matching"""
+
+    def buys(self, matcher):
+        matcher.buy(1, datetime(2023, 1, 1), 10, 100.0)
+        matcher.buy(2, datetime(2023, 6, 1), 10, 120.0)
+        return matcher
+
+    def test_fifo_consumes_oldest_lot(self):
+        matcher = self.buys(LotMatcher('fifo'))
+        matches = matcher.sell(15, 150.0)
+        assert [(lot.transaction_id, qty) for lot, qty in matches] == [(1, 10), (2, 5)]
+        assert matcher.quantity == 5
+        assert matcher.lots[0].cost_per_unit == 120.0
+
+    def test_lifo_consumes_newest_lot(self):
+        matcher = self.buys(LotMatcher('lifo'))
+        matches = matcher.sell(15, 150.0)
+        assert [(lot.transaction_id, qty) for lot, qty in matches] == [(2, 10), (1, 5)]
+        assert matcher.lots[0].transaction_id == 1
+
+    def test_average_pools_lots(self):
+        matcher = self.buys(LotMatcher('average'))
+        assert len(matcher.lots) == 1
+        (lot, qty), = matcher.sell(5, 150.0)
+        assert lot.cost_per_unit == pytest.approx(110.0)
+        assert matcher.quantity == 15
+
+    def test_oversell_raises(self):
+        matcher = self.buys(LotMatcher('fifo'))
+        with pytest.raises(LotMatchingError):
+            matcher.sell(25, 150.0)
+
+class TestTaxLots:
+    """Test persisted lots and realized gains"""
+
+    def test_lots_and_realized_gains(self, client, auth_headers, test_user):
+        """Test FIFO and LIFO reports from the same trade history"""
+        investment = add_investment(test_user, 'Acme Corp', 'ACME', 'Stock',
+                                    [('buy', 10, 100.0, 500), ('buy', 10, 120.0, 100), ('sell', 15, 150.0, 10)])
+
+        response = client.get(f'/api/investments/{investment.id}/lots?method=fifo', headers=auth_headers)
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['quantity'] == 5
+        assert data['lots'][0]['cost_per_unit'] == 120.0
+
+        response = client.get('/api/investments/realized-gains?method=fifo', headers=auth_headers)
+        totals = json.loads(response.data)['totals']
+        assert totals['gain'] == pytest.approx(500 + 150)
+        assert totals['long_term_gain'] == pytest.approx(500)
+
+        response = client.get('/api/investments/realized-gains?method=lifo', headers=auth_headers)
+        assert json.loads(response.data)['totals']['gain'] == pytest.approx(300 + 250)
+
+    def test_new_trade_processes_only_delta(self, client, auth_headers, test_user):
+        """Test that recording a trade advances the checkpoint instead of replaying"""
+        investment = add_investment(test_user, 'Acme Corp', 'ACME', 'Stock', [])
+        url = f'/api/investments/{investment.id}/transactions'
+        client.post(url, headers=auth_headers, json={'type': 'buy', 'quantity': 10, 'price': 10})
+        client.post(url, headers=auth_headers, json={'type': 'sell', 'quantity': 4, 'price': 15})
+
+        state = LotState.query.filter_by(investment_id=investment.id, method='fifo').first()
+        assert state.processed_count == 2
+        assert RealizedGain.query.filter_by(investment_id=investment.id, method='fifo').count() == 1
+
+        client.post(url, headers=auth_headers, json={'type': 'sell', 'quantity': 6, 'price': 20})
+        db.session.refresh(state)
+        assert state.processed_count == 3
+        assert TaxLot.query.filter_by(investment_id=investment.id, method='fifo').count() == 0
+
+    def test_backdated_trade_triggers_replay(self, client, auth_headers, test_user):
+        """Test that a trade inserted before the checkpoint rebuilds the lots"""
+        investment = add_investment(test_user, 'Acme Corp', 'ACME', 'Stock', [('buy', 10, 100.0, 10)])
+        client.get(f'/api/investments/{investment.id}/lots', headers=auth_headers)
+
+        db.session.add(InvestmentTransaction(investment_id=investment.id, type='buy', quantity=5, price=50.0,
+                                             transaction_date=datetime.utcnow() - timedelta(days=30)))
+        db.session.commit()
+
+        response = client.get(f'/api/investments/{investment.id}/lots?method=fifo', headers=auth_headers)
+        lots = json.loads(response.data)['lots']
+        assert [lot['cost_per_unit'] for lot in lots] == [50.0, 100.0]
+
+    def test_reports_are_read_only(self, client, auth_headers, test_user):
+        """Test lots and gains of trades never synced are replayed without writing"""
+        investment = add_investment(test_user, 'Acme Corp', 'ACME', 'Stock',
+                                    [('buy', 10, 100.0, 20), ('sell', 4, 150.0, 10)])
+
+        response = client.get(f'/api/investments/{investment.id}/lots', headers=auth_headers)
+        assert json.loads(response.data)['quantity'] == 6
+        response = client.get('/api/investments/realized-gains', headers=auth_headers)
+        assert json.loads(response.data)['totals']['gain'] == pytest.approx(200.0)
+
+        assert LotState.query.filter_by(investment_id=investment.id).count() == 0
+        assert TaxLot.query.filter_by(investment_id=investment.id).count() == 0
+        assert RealizedGain.query.filter_by(investment_id=investment.id).count() == 0
+
+    def test_invalid_method(self, client, auth_headers):
+        """Test unknown cost basis methods are rejected"""
+        response = client.get('/api/investments/realized-gains?method=hifo', headers=auth_headers)
+        assert response.status_code == 400
+
+class TestXirr:
+    """Test the vectorized XIRR solver"""
+
+    def test_solves_rows_independently(self):
+        rows = [0, 0, 1, 1, 1, 2]
+        amounts = [-100.0, 121.0, -100.0, -100.0, 250.0, -50.0]
+        years = [0.0, 2.0, 0.0, 1.0, 2.0, 0.0]
+        rates = xirr(rows, amounts, years, 3)
+        assert rates[0] == pytest.approx(0.10, abs=1e-8)
+        # -100 - 100/(1+r) + 250/(1+r)^2 = 0
+        r = rates[1]
+        assert -100 - 100 / (1 + r) + 250 / (1 + r) ** 2 == pytest.approx(0, abs=1e-6)
+        assert np.isnan(rates[2])
+
+    def test_negative_return(self):
+        rates = xirr([0, 0], [-100.0, 50.0], [0.0, 1.0], 1)
+        assert rates[0] == pytest.approx(-0.5, abs=1e-8)
+
+class TestPerformance:
+    """Test the performance endpoint"""
+
+    def test_single_holding_returns(self, client, auth_headers, test_user):
+        """Test XIRR and TWR for a buy-and-hold position"""
+        add_investment(test_user, 'Acme Corp', 'ACME', 'Stock', [('buy', 10, 100.0, 365)], price=110.0)
+
+        response = client.get('/api/investments/performance', headers=auth_headers)
+        assert response.status_code == 200
+
+        data = json.loads(response.data)
+        assert data['portfolio']['xirr'] == pytest.approx(0.10, abs=1e-3)
+        assert data['portfolio']['twr'] == pytest.approx(0.10, abs=1e-9)
+        assert data['holdings'][0]['xirr'] == pytest.approx(data['portfolio']['xirr'])
+
+    def test_twr_ignores_contribution_timing(self, client, auth_headers, test_user):
+        """Test that a large late contribution does not distort TWR"""
+        investment = add_investment(test_user, 'Acme Corp', 'ACME', 'Stock',
+                                    [('buy', 1, 100.0, 20), ('buy', 100, 200.0, 10)])
+        now = datetime.utcnow()
+        db.session.add(PriceHistory(investment_id=investment.id, price=200.0, recorded_at=now - timedelta(days=10)))
+        db.session.add(PriceHistory(investment_id=investment.id, price=200.0, recorded_at=now))
+        db.session.commit()
+
+        data = json.loads(client.get('/api/investments/performance', headers=auth_headers).data)
+        assert data['portfolio']['twr'] == pytest.approx(1.0)
+
+    def test_results_cached_per_version(self, client, auth_headers, test_user):
+        """Test that a new trade invalidates the cached result"""
+        investment = add_investment(test_user, 'Acme Corp', 'ACME', 'Stock', [('buy', 10, 100.0, 365)], price=110.0)
+        investment.quantity = 10
+        db.session.commit()
+        first = json.loads(client.get('/api/investments/performance', headers=auth_headers).data)
+
+        client.post(f'/api/investments/{investment.id}/transactions', headers=auth_headers,
+                    json={'type': 'sell', 'quantity': 10, 'price': 110.0})
+        second = json.loads(client.get('/api/investments/performance', headers=auth_headers).data)
+        assert second['portfolio']['market_value'] == 0
+        assert first['portfolio']['market_value'] == pytest.approx(1100.0)
+
+    def test_version_sees_in_place_price_updates(self, client, test_user):
+        """Test rewriting an existing price point changes the fingerprint every worker computes"""
+        investment = add_investment(test_user, 'Acme Corp', 'ACME', 'Stock', [('buy', 10, 100.0, 30)], price=110.0)
+        before = portfolio_version(test_user.id)
+
+        latest = PriceHistory.query.filter_by(investment_id=investment.id).order_by(
+            PriceHistory.recorded_at.desc()).first()
+        assert upsert_prices({(investment.id, latest.recorded_at): 120.0}) == {'inserted': 0, 'updated': 1}
+        db.session.commit()
+        assert portfolio_version(test_user.id) != before
+
+    def test_queries_constant_in_holdings(self, client, auth_headers, test_user, assert_constant_queries):
+        """Test price histories are loaded together, not once per holding"""
+        def add_holding(index):
+            add_investment(test_user, f'Holding {index}', f'H{index}', 'Stock', [('buy', 1, 10.0, 30)], price=12.0)
+
+        assert_constant_queries(lambda: client.get('/api/investments/performance', headers=auth_headers),
+                                add_holding)
+
+class TestDividendIncome:
+    """Test dividend income aggregation and projection"""
+
+    def add_dividends(self, investment, amount, months_ago):
+        today = date.today()
+        for m in months_ago:
+            index = today.year * 12 + today.month - 1 - m
+            db.session.add(Dividend(investment_id=investment.id, amount=amount,
+                                    payment_date=datetime(index // 12, index % 12 + 1, 15)))
+        db.session.commit()
+
+    def test_income_history_and_projection(self, client, auth_headers, test_user):
+        """Test quarterly and monthly payers are aggregated and projected"""
+        quarterly = add_investment(test_user, 'Acme Corp', 'ACME', 'Stock', [('buy', 10, 100.0, 400)])
+        monthly = add_investment(test_user, 'Bond Fund', 'BND', 'Bond', [('buy', 10, 50.0, 400)])
+        quarterly.quantity = 10
+        monthly.quantity = 10
+        self.add_dividends(quarterly, 25.0, [1, 4, 7, 10])
+        self.add_dividends(monthly, 5.0, range(1, 13))
+
+        response = client.get('/api/investments/income', headers=auth_headers)
+        assert response.status_code == 200
+
+        data = json.loads(response.data)
+        assert data['total'] == pytest.approx(4 * 25 + 11 * 5)
+        by_type = {t['investment_type']: t['amount'] for t in data['by_type']}
+        assert by_type['Stock'] == pytest.approx(100.0)
+
+        projection = data['projection']
+        cadences = {h['investment_id']: h['cadence'] for h in projection['by_holding']}
+        assert cadences[quarterly.id] == 'quarterly'
+        assert cadences[monthly.id] == 'monthly'
+        assert projection['total'] == pytest.approx(4 * 25 + 12 * 5)
+        assert len(projection['by_month']) == 12
+
+    def test_lapsed_payer_not_projected(self, client, auth_headers, test_user):
+        """Test a payer silent for over twice its cadence drops out of the projection"""
+        current = add_investment(test_user, 'Acme Corp', 'ACME', 'Stock', [('buy', 10, 100.0, 800)])
+        stopped = add_investment(test_user, 'Bond Fund', 'BND', 'Bond', [('buy', 10, 50.0, 800)])
+        current.quantity = 10
+        stopped.quantity = 10
+        self.add_dividends(current, 25.0, [1, 4, 7, 10])
+        # Paid monthly for a year, then nothing for the last six months
+        self.add_dividends(stopped, 5.0, range(6, 18))
+
+        projection = json.loads(client.get('/api/investments/income', headers=auth_headers).data)['projection']
+        assert [h['investment_id'] for h in projection['by_holding']] == [current.id]
+        assert projection['total'] == pytest.approx(4 * 25)
+
+    def test_income_cache_invalidated_by_dividend(self, client, auth_headers, test_user):
+        """Test recording a dividend is reflected immediately"""
+        investment = add_investment(test_user, 'Acme Corp', 'ACME', 'Stock', [('buy', 10, 100.0, 30)])
+        assert json.loads(client.get('/api/investments/income', headers=auth_headers).data)['total'] == 0
+
+        response = client.post(f'/api/investments/{investment.id}/dividends', headers=auth_headers,
+                               json={'amount': 12.5})
+        assert response.status_code == 201
+        assert json.loads(client.get('/api/investments/income', headers=auth_headers).data)['total'] == 12.5
+
+    def test_invalid_dividend(self, client, auth_headers, test_user):
+        """Test dividends require a positive amount"""
+        investment = add_investment(test_user, 'Acme Corp', 'ACME', 'Stock', [])
+        response = client.post(f'/api/investments/{investment.id}/dividends', headers=auth_headers,
+                               json={'amount': -1})
+        assert response.status_code == 400
+
+
+class TestRebalance:
+    """Test target-allocation rebalancing"""
+
+    def test_solver_modes(self):
+        """Test full, no_sell and cash_only trades on group arrays"""
+        current = np.array([700.0, 300.0, 0.0])
+        weights = np.array([0.5, 0.3, 0.2])
+
+        full = solve_rebalance(current, weights, 0.0, 'full')
+        assert full == pytest.approx([-200.0, 0.0, 200.0])
+
+        no_sell = solve_rebalance(current, weights, 0.0, 'no_sell')
+        assert (no_sell >= 0).all()
+        assert no_sell == pytest.approx([0.0, 120.0, 280.0])
+
+        cash_only = solve_rebalance(current, weights, 100.0, 'cash_only')
+        assert cash_only.sum() == pytest.approx(100.0)
+        assert cash_only == pytest.approx([0.0, 0.0, 100.0])
+
+        cash_only = solve_rebalance(current, weights, 500.0, 'cash_only')
+        assert cash_only.sum() == pytest.approx(500.0)
+        assert (current + cash_only) / 1500 == pytest.approx([0.5, 0.3, 0.2])
+
+    def test_rebalance_by_type(self, client, auth_headers, test_user):
+        """Test trades are returned per holding to reach type targets"""
+        stock = add_investment(test_user, 'Acme Corp', 'ACME', 'Stock', [('buy', 7, 100.0, 30)])
+        bond = add_investment(test_user, 'Bond Fund', 'BND', 'Bond', [('buy', 6, 50.0, 30)])
+
+        response = client.post('/api/investments/rebalance', headers=auth_headers, json={
+            'targets': {'Stock': 50, 'Bond': 50}
+        })
+        assert response.status_code == 200
+
+        data = json.loads(response.data)
+        trades = {t['investment_id']: t for t in data['trades']}
+        assert trades[stock.id]['action'] == 'sell'
+        assert trades[stock.id]['quantity'] == pytest.approx(2.0)
+        assert trades[bond.id]['action'] == 'buy'
+        assert trades[bond.id]['value'] == pytest.approx(200.0)
+        assert all(g['resulting_percent'] == 50 for g in data['groups'])
+
+    def test_cash_only_never_sells(self, client, auth_headers, test_user):
+        """Test contributed cash is only used to buy"""
+        add_investment(test_user, 'Acme Corp', 'ACME', 'Stock', [('buy', 7, 100.0, 30)])
+        add_investment(test_user, 'Bond Fund', 'BND', 'Bond', [('buy', 6, 50.0, 30)])
+
+        response = client.post('/api/investments/rebalance', headers=auth_headers, json={
+            'targets': {'ACME': 50, 'BND': 50}, 'group_by': 'symbol', 'mode': 'cash_only', 'cash': 100
+        })
+        data = json.loads(response.data)
+        assert response.status_code == 200
+        assert all(t['action'] == 'buy' for t in data['trades'])
+        assert data['cash_used'] == pytest.approx(100.0)
+
+    def test_invalid_targets(self, client, auth_headers, test_user):
+        """Test targets must add up to 100"""
+        response = client.post('/api/investments/rebalance', headers=auth_headers, json={
+            'targets': {'Stock': 60, 'Bond': 30}
+        })
+        assert response.status_code == 400
+        assert 'add up to 100' in json.loads(response.data)['error']
+
+    @pytest.mark.parametrize('body, error', [
+        ('{"targets": {"Stock": NaN, "Bond": 100}}', 'target percentages must be finite numbers'),
+        ('{"targets": {"Stock": "inf", "Bond": 100}}', 'target percentages must be finite numbers'),
+        ('{"targets": {"Stock": 100}, "cash": Infinity}', 'cash must be a non-negative number'),
+    ])
+    def test_non_finite_values(self, client, auth_headers, test_user, body, error):
+        """Test NaN and infinite weights or cash are rejected"""
+        response = client.post('/api/investments/rebalance', headers=auth_headers,
+                               data=body, content_type='application/json')
+        assert response.status_code == 400
+        assert json.loads(response.data)['error'] == error
@@ -0,0 +1,159 @@
+import pytest
+import json
+import logging
+import queue
+import threading
+from logging.handlers import QueueListener, RotatingFileHandler
+from src.utils.logger import (
+    BoundedQueueHandler, LoggerNameFilter, JsonFormatter, get_logging_stats, parse_sample_rates
+)
+
+class ListHandler(logging.Handler):
+    """Collects formatted messages"""
+    
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+        self.threads = set()
+    
+    def emit(self, record):
+        self.threads.add(threading.current_thread().name)
+        self.messages.append(self.format(record))
+
+def make_logger(name, handler):
+    logger = logging.getLogger(name)
+    logger.handlers.clear()
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    logger.addHandler(handler)
+    return logger
+
+
+class TestQueueLogging:
+    """Test the bounded queue logging pipeline"""
+    
+    def test_listener_formats_off_thread(self):
+        """Test records are formatted and written by the listener thread"""
+        log_queue = queue.Queue(maxsize=100)
+        sink = ListHandler()
+        listener = QueueListener(log_queue, sink, respect_handler_level=True)
+        listener.start()
+        try:
+            logger = make_logger('test.queue.listener', BoundedQueueHandler(log_queue))
+            logger.info('hello %s', 'world')
+        finally:
+            listener.stop()
+        
+        assert sink.messages == ['hello world']
+        assert 'MainThread' not in sink.threads
+    
+    def test_drop_new_records_when_full(self):
+        """Test the drop policy discards new records and reports the count"""
+        log_queue = queue.Queue(maxsize=2)
+        handler = BoundedQueueHandler(log_queue, overflow='drop')
+        logger = make_logger('test.queue.drop', handler)
+        for i in range(5):
+            logger.info('record %d', i)
+        
+        assert handler.dropped == 3
+        assert [log_queue.get_nowait().getMessage() for _ in range(2)] == ['record 0', 'record 1']
+        
+        logger.info('after')
+        messages = [log_queue.get_nowait().getMessage() for _ in range(2)]
+        assert messages == ['⚠️ Log queue full: dropped 3 records', 'after']
+    
+    def test_drop_oldest_keeps_latest(self):
+        """Test the drop_oldest policy evicts queued records instead"""
+        log_queue = queue.Queue(maxsize=2)
+        handler = BoundedQueueHandler(log_queue, overflow='drop_oldest')
+        logger = make_logger('test.queue.oldest', handler)
+        for i in range(5):
+            logger.info('record %d', i)
+        
+        assert handler.dropped == 3
+        assert [log_queue.get_nowait().getMessage() for _ in range(2)] == ['record 3', 'record 4']
+    
+    def test_block_times_out(self):
+        """Test the block policy waits briefly, then drops"""
+        log_queue = queue.Queue(maxsize=1)
+        handler = BoundedQueueHandler(log_queue, overflow='block', block_timeout=0.01)
+        logger = make_logger('test.queue.block', handler)
+        logger.info('first')
+        logger.info('second')
+        assert handler.dropped == 1
+    
+    def test_invalid_policy(self):
+        """Test unknown overflow policies are rejected"""
+        with pytest.raises(ValueError):
+            BoundedQueueHandler(queue.Queue(), overflow='spill')
+    
+    def test_logger_name_filter(self):
+        """Test API records are routed separately from application records"""
+        api_only, not_api = LoggerNameFilter('api'), LoggerNameFilter('api', exclude=True)
+        api_record = logging.LogRecord('api', logging.INFO, __file__, 0, 'x', None, None)
+        app_record = logging.LogRecord('app', logging.INFO, __file__, 0, 'x', None, None)
+        
+        assert api_only.filter(api_record) and not api_only.filter(app_record)
+        assert not_api.filter(app_record) and not not_api.filter(api_record)
+    
+    def test_application_uses_queue(self):
+        """Test the app's loggers enqueue instead of writing files directly"""
+        import src.main  # noqa: F401 - configures logging
+        for name in (None, 'api'):
+            handlers = logging.getLogger(name).handlers
+            assert any(isinstance(h, BoundedQueueHandler) for h in handlers)
+            assert not any(isinstance(h, RotatingFileHandler) for h in handlers)
+        assert get_logging_stats()['async'] is True
+
+
+class TestRequestLogging:
+    """Test level-gated, sampled request logging"""
+    
+    @pytest.fixture
+    def api_sink(self, monkeypatch):
+        from src.main import app
+        import src.utils.logger as logger_module
+        app.config['TESTING'] = True
+        sink = ListHandler()
+        api = logging.getLogger('api')
+        api.addHandler(sink)
+        monkeypatch.setattr(logger_module, '_sample_rates', None)
+        yield app.test_client(), sink, monkeypatch
+        api.removeHandler(sink)
+    
+    def test_parse_sample_rates(self):
+        """Test per-route rates are parsed and clamped"""
+        assert parse_sample_rates('/api/health=0, GET /api/x=0.25,bad,/y=3') == {
+            '/api/health': 0.0, 'GET /api/x': 0.25, '/y': 1.0
+        }
+    
+    def test_json_get_without_body(self, api_sink):
+        """Test a GET with a JSON content type and no body is not rejected"""
+        client, sink, _ = api_sink
+        response = client.get('/api/health', headers={'Content-Type': 'application/json'})
+        assert response.status_code == 200
+    
+    def test_sampled_out_route_is_silent(self, api_sink):
+        """Test a route sampled at 0 logs nothing on success but still logs errors"""
+        client, sink, monkeypatch = api_sink
+        monkeypatch.setenv('LOG_SAMPLE_RATES', '/api/health=0,/api/auth/me=0')
+        
+        assert client.get('/api/health').status_code == 200
+        assert sink.messages == []
+        
+        assert client.get('/api/auth/me').status_code == 401
+        assert any('Status: 401' in message for message in sink.messages)
+    
+    def test_body_not_parsed_unless_debug(self, api_sink):
+        """Test request bodies are only read when DEBUG is enabled for the api logger"""
+        client, sink, monkeypatch = api_sink
+        client.post('/api/auth/login', json={'email': 'nobody@example.com', 'password': 'secret'})
+        assert not any('Request body' in message for message in sink.messages)
+    
+    def test_json_formatter(self):
+        """Test structured output merges request fields"""
+        record = logging.LogRecord('api', logging.INFO, __file__, 0, '%s done', ('GET',), None)
+        record.http = {'status': 200, 'duration_ms': 3}
+        entry = json.loads(JsonFormatter().format(record))
+        assert entry['message'] == 'GET done'
+        assert entry['status'] == 200 and entry['logger'] == 'api'
@@ -0,0 +1,99 @@
+import pytest
+import json
+import os
+from src.main import app
+from src.utils.metrics import MetricsRegistry, PROMETHEUS_CONTENT_TYPE
+
+DEAD_PID = 4194303  # above the default pid_max, so never a live process
+
+@pytest.fixture
+def client():
+    """Create test client"""
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+
+def make_registry(directory=None):
+    registry = MetricsRegistry(directory)
+    requests = registry.counter('requests_total', 'Requests', ('status',))
+    latency = registry.histogram('latency_seconds', 'Latency', buckets=(0.1, 1.0))
+    depth = registry.gauge('queue_depth', 'Queue depth')
+    return registry, requests, latency, depth
+
+
+class TestMetricsRegistry:
+    """Test metric types and exposition"""
+    
+    def test_render_prometheus_text(self):
+        """Test counters and cumulative histogram buckets are rendered"""
+        registry, requests, latency, depth = make_registry()
+        requests.inc('200')
+        requests.inc('200')
+        requests.inc('500')
+        for value in (0.05, 0.5, 5):
+            latency.observe(value=value)
+        depth.set(value=3)
+        
+        text = registry.render()
+        assert '# TYPE requests_total counter' in text
+        assert 'requests_total{status="200"} 2' in text
+        assert 'requests_total{status="500"} 1' in text
+        assert 'latency_seconds_bucket{le="0.1"} 1' in text
+        assert 'latency_seconds_bucket{le="1"} 2' in text
+        assert 'latency_seconds_bucket{le="+Inf"} 3' in text
+        assert 'latency_seconds_count 3' in text
+        assert 'queue_depth 3' in text
+    
+    def test_gauge_callback(self):
+        """Test callback gauges are computed at collection time"""
+        registry = MetricsRegistry()
+        registry.gauge('answer', 'Answer', callback=lambda: 42)
+        assert 'answer 42' in registry.render()
+    
+    def test_merge_worker_snapshots(self, tmp_path):
+        """Test counters sum over all workers while gauges skip dead ones"""
+        other, other_requests, other_latency, other_depth = make_registry()
+        other_requests.inc('200', amount=5)
+        other_latency.observe(value=0.5)
+        other_depth.set(value=7)
+        snapshot = other.snapshot()
+        for pid in (os.getppid(), DEAD_PID):
+            (tmp_path / f'{pid}.json').write_text(json.dumps(snapshot))
+        
+        registry, requests, latency, depth = make_registry(str(tmp_path))
+        requests.inc('200')
+        depth.set(value=1)
+        
+        text = registry.render()
+        assert 'requests_total{status="200"} 11' in text
+        assert 'latency_seconds_count 2' in text
+        assert 'queue_depth 8' in text
+    
+    def test_flush_writes_snapshot(self, tmp_path):
+        """Test a worker's snapshot is written atomically under its pid"""
+        registry, requests, _, _ = make_registry(str(tmp_path))
+        requests.inc('200')
+        registry.flush()
+        
+        data = json.loads((tmp_path / f'{os.getpid()}.json').read_text())
+        assert data['requests_total']['samples'] == [[['200'], 1]]
+        assert not list(tmp_path.glob('*.tmp'))
+
+
+class TestMetricsEndpoint:
+    """Test the /metrics endpoint"""
+    
+    def test_request_metrics_exposed(self, client):
+        """Test request counts, latency and SQL counts are recorded per endpoint"""
+        assert client.get('/api/health').status_code == 200
+        
+        response = client.get('/metrics')
+        assert response.status_code == 200
+        assert response.headers['Content-Type'] == PROMETHEUS_CONTENT_TYPE
+        
+        text = response.get_data(as_text=True)
+        assert 'http_requests_total{endpoint="health_check",method="GET",status="200"}' in text
+        assert 'http_request_duration_seconds_count{endpoint="health_check",method="GET"}' in text
+        assert 'http_request_db_queries_sum{endpoint="health_check"}' in text
+        assert '# TYPE bcrypt_running gauge' in text
+        assert 'bcrypt_queue_depth 0' in text
@@ -0,0 +1,193 @@
+import os
+import sqlite3
+
+import pytest
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from sqlalchemy import Column, Float, Index, Integer, MetaData, String, Table, create_engine, inspect, text
+
+from src.main import create_app, db
+from src.bootstrap import upgrade_database
+from src.utils.batch_migrations import backfill_in_batches, copy_in_batches, rebuild_table
+
+LEGACY_BUDGET_CATEGORIES = """
+CREATE TABLE budget_categories (
+    id INTEGER PRIMARY KEY,
+    budget_id INTEGER NOT NULL,
+    category_id INTEGER NOT NULL,
+    allocated_amount DECIMAL(10, 2) NOT NULL,
+    alert_threshold_50 BOOLEAN DEFAULT TRUE,
+    alert_threshold_75 BOOLEAN DEFAULT TRUE,
+    alert_threshold_90 BOOLEAN DEFAULT TRUE,
+    alert_threshold_100 BOOLEAN DEFAULT TRUE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(budget_id, category_id)
+)
+"""
+
+
+def make_app(path):
+    return create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{path}",
+        'SESSION_SWEEP_INTERVAL': 0
+    })
+
+
+def current_revision(engine):
+    with engine.connect() as conn:
+        return MigrationContext.configure(conn).get_current_revision()
+
+
+def test_upgrade_creates_schema_matching_models(tmp_path):
+    app = make_app(tmp_path / 'fresh.db')
+    with app.app_context():
+        upgrade_database()
+        assert current_revision(db.engine) == '0003'
+        with db.engine.connect() as conn:
+            diff = compare_metadata(MigrationContext.configure(conn), db.metadata)
+        assert diff == []
+        db.engine.dispose()
+
+
+def test_upgrade_adopts_database_created_without_migrations(tmp_path):
+    app = make_app(tmp_path / 'legacy.db')
+    with app.app_context():
+        db.create_all()
+        db.session.execute(text("INSERT INTO users (email, first_name, last_name) VALUES ('a@b.c', 'A', 'B')"))
+        db.session.commit()
+
+        upgrade_database()
+        assert current_revision(db.engine) == '0003'
+        assert db.session.execute(text('SELECT COUNT(*) FROM users')).scalar() == 1
+        db.session.remove()
+        db.engine.dispose()
+
+
+def test_upgrade_removes_legacy_budget_category_constraint(tmp_path):
+    path = tmp_path / 'legacy.db'
+    app = make_app(path)
+    with app.app_context():
+        db.metadata.create_all(db.engine, tables=[
+            table for table in db.metadata.sorted_tables if table.name != 'budget_categories'
+        ])
+        db.engine.dispose()
+
+    conn = sqlite3.connect(path)
+    conn.execute(LEGACY_BUDGET_CATEGORIES)
+    conn.executemany(
+        'INSERT INTO budget_categories (budget_id, category_id, allocated_amount) VALUES (?, ?, ?)',
+        [(1, category, 10.0 * category) for category in range(1, 8)]
+    )
+    conn.commit()
+    conn.close()
+
+    with app.app_context():
+        upgrade_database()
+        inspector = inspect(db.engine)
+        assert inspector.get_unique_constraints('budget_categories') == []
+        assert 'remarks' in {column['name'] for column in inspector.get_columns('budget_categories')}
+        assert not inspector.has_table('budget_categories_rebuild')
+
+        db.session.execute(text(
+            "INSERT INTO budget_categories (budget_id, category_id, allocated_amount) VALUES (1, 1, 5)"
+        ))
+        rows = db.session.execute(text(
+            'SELECT COUNT(*), SUM(allocated_amount) FROM budget_categories'
+        )).one()
+        assert tuple(rows) == (8, 285.0)
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture(params=['sqlite', 'postgresql'])
+def engine(request, tmp_path):
+    """An engine with ``source`` (25 rows) and an empty ``target``; PostgreSQL needs TEST_POSTGRES_URL"""
+    if request.param == 'postgresql':
+        url = os.getenv('TEST_POSTGRES_URL')
+        if not url:
+            pytest.skip('TEST_POSTGRES_URL is not set')
+        engine = create_engine(url)
+        with engine.begin() as conn:
+            for table in ('source_rebuild', 'source', 'target'):
+                conn.execute(text(f'DROP TABLE IF EXISTS {table} CASCADE'))
+            conn.execute(text('DROP FUNCTION IF EXISTS source_rebuild_sync() CASCADE'))
+    else:
+        engine = create_engine(f"sqlite:///{tmp_path / 'batches.db'}")
+    with engine.begin() as conn:
+        conn.execute(text('CREATE TABLE source (id INTEGER PRIMARY KEY, amount FLOAT, note TEXT)'))
+        conn.execute(text('CREATE TABLE target (id INTEGER PRIMARY KEY, amount FLOAT, note TEXT)'))
+        conn.execute(
+            text('INSERT INTO source (id, amount, note) VALUES (:id, :amount, NULL)'),
+            [{'id': i, 'amount': float(i)} for i in range(1, 26)]
+        )
+    yield engine
+    if request.param == 'postgresql':
+        with engine.begin() as conn:
+            for table in ('source_rebuild', 'source', 'target'):
+                conn.execute(text(f'DROP TABLE IF EXISTS {table} CASCADE'))
+    engine.dispose()
+
+
+def user_triggers(conn):
+    if conn.dialect.name == 'postgresql':
+        return conn.execute(text(
+            "SELECT tgname FROM pg_trigger WHERE NOT tgisinternal AND tgrelid = 'source'::regclass"
+        )).all()
+    return conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'trigger'")).all()
+
+
+def test_copy_in_batches_resumes_after_interruption(engine):
+    # An interrupted run leaves the first rows committed
+    with engine.begin() as conn:
+        conn.execute(text('INSERT INTO target SELECT * FROM source WHERE id <= 10'))
+
+    copied = copy_in_batches(engine, 'source', 'target', ['id', 'amount'], batch_size=4, pause=0)
+
+    assert copied == 15
+    with engine.connect() as conn:
+        assert conn.execute(text('SELECT COUNT(*), SUM(amount) FROM target')).one() == (25, 325.0)
+
+
+def test_backfill_in_batches_only_touches_pending_rows(engine):
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE source SET note = 'kept' WHERE id = 3"))
+
+    updated = backfill_in_batches(engine, 'source', "note = 'filled'", pending='note IS NULL',
+                                  batch_size=7, pause=0)
+
+    assert updated == 24
+    with engine.connect() as conn:
+        notes = dict(conn.execute(text('SELECT note, COUNT(*) FROM source GROUP BY note')).all())
+    assert notes == {'filled': 24, 'kept': 1}
+    assert backfill_in_batches(engine, 'source', "note = 'filled'", pending='note IS NULL', pause=0) == 0
+
+
+def test_rebuild_table_keeps_writes_made_during_the_copy(engine, monkeypatch):
+    import src.utils.batch_migrations as batch_migrations
+    definition = Table('source', MetaData(), Column('id', Integer, primary_key=True),
+                       Column('amount', Float), Column('note', String(20)),
+                       Index('ix_source_amount', 'amount'))
+    copy = batch_migrations.copy_in_batches
+
+    def copy_with_writes(engine, source, target, *args, **kwargs):
+        # Some rows are already copied when the app writes to the live table
+        with engine.begin() as conn:
+            conn.execute(text(f'INSERT INTO {target} SELECT * FROM {source} WHERE id <= 10'))
+            conn.execute(text("UPDATE source SET amount = 300, note = 'edited' WHERE id IN (3, 20)"))
+            conn.execute(text('DELETE FROM source WHERE id IN (5, 21)'))
+            conn.execute(text("INSERT INTO source (id, amount, note) VALUES (26, 26, 'new')"))
+        return copy(engine, source, target, *args, **kwargs)
+
+    monkeypatch.setattr(batch_migrations, 'copy_in_batches', copy_with_writes)
+    rebuild_table(engine, definition, batch_size=4, pause=0)
+
+    with engine.connect() as conn:
+        rows = conn.execute(text('SELECT * FROM source ORDER BY id')).all()
+        triggers = user_triggers(conn)
+    by_id = {row[0]: row for row in rows}
+    assert len(rows) == 24
+    assert by_id[3][1:] == (300.0, 'edited') and by_id[20][1:] == (300.0, 'edited')
+    assert 5 not in by_id and 21 not in by_id and by_id[26][2] == 'new'
+    assert triggers == []
+    assert [index['name'] for index in inspect(engine).get_indexes('source')] == ['ix_source_amount']
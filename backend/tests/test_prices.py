@@ -0,0 +1,275 @@
+import pytest
+import io
+import json
+import uuid
+import numpy as np
+from datetime import datetime, timedelta
+from src.main import app, db
+from src.models.user import User
+from src.models.investment import Investment, PriceHistory
+from src.services.price_history import PriceSeries
+from src.services.quotes import (
+    QuoteClient, QuoteProviderError, HttpQuoteProvider, FileQuoteProvider, StubQuoteServer, set_quote_client
+)
+from flask_jwt_extended import create_access_token
+
+@pytest.fixture
+def client():
+    """Create test client"""
+    app.config['TESTING'] = True
+    app.config['JWT_SECRET_KEY'] = 'test-secret'
+
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+            yield client
+
+@pytest.fixture
+def test_user(client):
+    """Create a fresh user"""
+    user = User(
+        first_name='Price',
+        last_name='User',
+        email=f'prices-{uuid.uuid4().hex[:12]}@example.com',
+        password_hash='hashed_password'
+    )
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+@pytest.fixture
+def auth_headers(test_user):
+    """Create authorization headers with JWT token"""
+    token = create_access_token(identity=str(test_user.id))
+    return {'Authorization': f'Bearer {token}'}
+
+@pytest.fixture
+def investment(test_user):
+    """Create an investment with 100 days of prices"""
+    investment = Investment(user_id=test_user.id, name='Acme Corp', symbol='ACME', quantity=10)
+    db.session.add(investment)
+    db.session.flush()
+    start = datetime(2024, 1, 1)
+    db.session.add_all([
+        PriceHistory(investment_id=investment.id, price=100.0 + day, recorded_at=start + timedelta(days=day))
+        for day in range(100)
+    ])
+    db.session.commit()
+    return investment
+
+class TestPriceSeries:
+    """Test array-backed range and downsampling"""
+
+    def series(self):
+        timestamps = np.arange(0, 1000, 10, dtype=np.int64)
+        return PriceSeries(timestamps, timestamps.astype(float))
+
+    def test_range_is_inclusive(self):
+        sliced = self.series().range(100, 200)
+        assert sliced.timestamps.tolist() == list(range(100, 210, 10))
+
+    def test_downsample_buckets(self):
+        timestamps, opens, highs, lows, closes = self.series().downsample(10)
+        assert len(timestamps) == 10
+        assert opens[0] == 0 and closes[0] == 90
+        assert highs.max() == 990 and lows.min() == 0
+
+    def test_downsample_noop_when_small(self):
+        series = self.series()
+        timestamps, *_ = series.downsample(500)
+        assert len(timestamps) == len(series)
+
+class TestPriceEndpoints:
+    """Test price history endpoints"""
+
+    def test_range_query(self, client, auth_headers, investment):
+        """Test filtering by start and end"""
+        response = client.get(f'/api/investments/{investment.id}/prices?start=2024-01-11&end=2024-01-20',
+                              headers=auth_headers)
+        assert response.status_code == 200
+
+        prices = json.loads(response.data)['prices']
+        assert prices['count'] == 10
+        assert prices['close'][0] == 110.0
+        assert prices['timestamps'][0] == '2024-01-11T00:00:00'
+
+    def test_downsampled_query(self, client, auth_headers, investment):
+        """Test that points caps the number of returned buckets"""
+        response = client.get(f'/api/investments/{investment.id}/prices?points=10', headers=auth_headers)
+        prices = json.loads(response.data)['prices']
+        assert len(prices['close']) == 10
+        assert prices['close'][-1] == 199.0
+
+    def test_bulk_import_upserts_and_dedupes(self, client, auth_headers, investment):
+        """Test that imports update existing points and collapse duplicate rows"""
+        client.get(f'/api/investments/{investment.id}/prices', headers=auth_headers)
+
+        csv_data = (
+            'symbol,date,price\n'
+            'ACME,2024-01-01,1.5\n'
+            'ACME,2024-06-01,2.0\n'
+            'ACME,2024-06-01,2.5\n'
+            'UNKNOWN,2024-06-02,3.0\n'
+        )
+        response = client.post('/api/investments/prices/import', headers=auth_headers,
+                               data={'file': (io.BytesIO(csv_data.encode()), 'prices.csv')},
+                               content_type='multipart/form-data')
+        assert response.status_code == 200
+
+        data = json.loads(response.data)
+        assert data['inserted'] == 1
+        assert data['updated'] == 1
+        assert data['duplicates'] == 1
+        assert data['rejected_rows'] == [5]
+        assert PriceHistory.query.filter_by(investment_id=investment.id).count() == 101
+
+        # The cached series was invalidated by the import
+        response = client.get(f'/api/investments/{investment.id}/prices', headers=auth_headers)
+        prices = json.loads(response.data)['prices']
+        assert prices['close'][0] == 1.5
+        assert prices['close'][-1] == 2.5
+
+    def test_import_rejects_bad_prices(self, client, auth_headers, investment):
+        """Test NaN, infinite, zero and negative prices are reported as rejected rows"""
+        csv_data = (
+            'symbol,date,price\n'
+            'ACME,2024-06-01,nan\n'
+            'ACME,2024-06-02,inf\n'
+            'ACME,2024-06-03,0\n'
+            'ACME,2024-06-04,-3.5\n'
+            'ACME,2024-06-05,4.0\n'
+        )
+        response = client.post('/api/investments/prices/import', headers=auth_headers,
+                               data=csv_data, content_type='text/csv')
+        assert response.status_code == 200
+
+        data = json.loads(response.data)
+        assert data['rejected_rows'] == [2, 3, 4, 5]
+        assert data['inserted'] == 1
+        assert PriceHistory.query.filter_by(investment_id=investment.id).count() == 101
+
+    def test_import_queries_constant(self, client, auth_headers, test_user, assert_constant_queries):
+        """Test existing points are looked up in one query, not once per investment"""
+        symbols = []
+        imports = []
+
+        def add_investment(index):
+            investment = Investment(user_id=test_user.id, name=f'Holding {index}', symbol=f'SYM{index}')
+            db.session.add(investment)
+            db.session.flush()
+            db.session.add(PriceHistory(investment_id=investment.id, price=1.0, recorded_at=datetime(2024, 1, 1)))
+            db.session.commit()
+            symbols.append(investment.symbol)
+
+        def send():
+            # Every import updates the seeded point and inserts a new one for each holding
+            imports.append(len(imports))
+            new_date = (datetime(2024, 2, 1) + timedelta(days=len(imports))).date().isoformat()
+            rows = ''.join(f'{symbol},2024-01-01,2.0\n{symbol},{new_date},3.0\n' for symbol in symbols)
+            return client.post('/api/investments/prices/import', headers=auth_headers,
+                               data='symbol,date,price\n' + rows, content_type='text/csv')
+
+        assert_constant_queries(send, add_investment)
+
+    def test_import_requires_columns(self, client, auth_headers, investment):
+        """Test that files without the required columns are rejected"""
+        response = client.post('/api/investments/prices/import', headers=auth_headers,
+                               data='foo,bar\n1,2\n', content_type='text/csv')
+        assert response.status_code == 400
+
+    def test_other_users_investment(self, client, investment):
+        """Test that prices are scoped to the owner"""
+        other = User(first_name='Other', last_name='User', email=f'other-{uuid.uuid4().hex[:12]}@example.com')
+        db.session.add(other)
+        db.session.commit()
+        headers = {'Authorization': f'Bearer {create_access_token(identity=str(other.id))}'}
+        response = client.get(f'/api/investments/{investment.id}/prices', headers=headers)
+        assert response.status_code == 404
+
+class TestQuoteClient:
+    """Test batching, pooling and caching of quotes"""
+
+    @pytest.fixture
+    def stub(self):
+        server = StubQuoteServer({f'SYM{i}': float(i) for i in range(1200)}).start()
+        yield server
+        server.stop()
+
+    def test_batches_and_reuses_connections(self, stub):
+        """Test 1200 symbols take three requests over one pooled connection"""
+        client = QuoteClient(HttpQuoteProvider(stub.url, batch_size=500), ttl=60)
+        quotes = client.get_quotes([f'sym{i}' for i in range(1200)])
+        client.close()
+
+        assert len(quotes) == 1200
+        assert quotes['SYM42'] == 42.0
+        assert stub.requests == 3
+        assert stub.connections == 1
+
+    def test_ttl_cache(self, stub):
+        """Test fresh quotes are served without another request"""
+        client = QuoteClient(HttpQuoteProvider(stub.url), ttl=60)
+        client.get_quotes(['SYM1', 'SYM2'])
+        client.get_quotes(['SYM2', 'SYM1'])
+        assert stub.requests == 1
+
+        client.ttl = 0
+        client.get_quotes(['SYM1'])
+        assert stub.requests == 2
+        client.close()
+
+    def test_malformed_response(self, stub, monkeypatch):
+        """Test unparseable bodies become provider errors and bad prices are dropped"""
+        provider = HttpQuoteProvider(stub.url)
+        for body in (b'<html>oops</html>', b'[1, 2]', b'{"quotes": {"A": "n/a"}}', b'{"quotes": [1]}'):
+            monkeypatch.setattr(provider.pool, 'request', lambda method, path, body=body: (200, body))
+            with pytest.raises(QuoteProviderError):
+                provider.fetch(['A'])
+
+        body = b'{"quotes": {"A": NaN, "B": -Infinity, "C": 2.5}}'
+        monkeypatch.setattr(provider.pool, 'request', lambda method, path: (200, body))
+        assert provider.fetch(['A', 'B', 'C']) == {'C': 2.5}
+
+    def test_file_provider(self, tmp_path):
+        """Test the file-based provider for local runs"""
+        path = tmp_path / 'quotes.json'
+        path.write_text(json.dumps({'acme': 12.5}))
+        client = QuoteClient(FileQuoteProvider(str(path)))
+        assert client.get_quotes(['ACME', 'NOPE']) == {'ACME': 12.5}
+
+class TestPriceRefresh:
+    """Test refreshing stored prices"""
+
+    def test_refresh_writes_prices(self, client, auth_headers, investment):
+        """Test refresh updates current_price and appends history in bulk"""
+        stub = StubQuoteServer({'ACME': 321.0}).start()
+        set_quote_client(QuoteClient(HttpQuoteProvider(stub.url)))
+        try:
+            response = client.post('/api/investments/prices/refresh', headers=auth_headers)
+        finally:
+            set_quote_client(None)
+            stub.stop()
+        assert response.status_code == 200
+
+        data = json.loads(response.data)
+        assert data['updated_investments'] == 1
+        assert db.session.get(Investment, investment.id).current_price == 321.0
+        assert PriceHistory.query.filter_by(investment_id=investment.id, price=321.0).count() == 1
+
+    def test_refresh_malformed_quotes(self, client, auth_headers, investment, monkeypatch):
+        """Test a garbled provider response answers 502, not 500"""
+        provider = HttpQuoteProvider('http://127.0.0.1:9')
+        monkeypatch.setattr(provider.pool, 'request', lambda method, path: (200, b'not json'))
+        set_quote_client(QuoteClient(provider))
+        try:
+            response = client.post('/api/investments/prices/refresh', headers=auth_headers)
+        finally:
+            set_quote_client(None)
+        assert response.status_code == 502
+
+    def test_refresh_without_provider(self, client, auth_headers, monkeypatch):
+        """Test a clear error when no provider is configured"""
+        monkeypatch.delenv('QUOTE_PROVIDER', raising=False)
+        set_quote_client(None)
+        response = client.post('/api/investments/prices/refresh', headers=auth_headers)
+        assert response.status_code == 503
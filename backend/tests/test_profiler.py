@@ -0,0 +1,147 @@
+import pytest
+import threading
+import time
+import uuid
+from src.main import app, db
+from src.models.user import User
+from src.utils.profiler import SamplingProfiler, get_profiler
+from flask_jwt_extended import create_access_token
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    """Create test client with the profiler enabled"""
+    app.config['TESTING'] = True
+    monkeypatch.setenv('PROFILER_ENABLED', 'true')
+    monkeypatch.setenv('PROFILER_DIR', str(tmp_path))
+
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+            yield client
+    profiler = get_profiler()
+    if profiler is not None:
+        profiler.stop()
+
+def make_headers(email):
+    user = User(first_name='Ops', last_name='User', email=email, password_hash='hashed_password')
+    db.session.add(user)
+    db.session.commit()
+    return {'Authorization': f'Bearer {create_access_token(identity=str(user.id))}'}
+
+@pytest.fixture
+def admin_headers(client, monkeypatch):
+    email = f'admin-{uuid.uuid4().hex[:12]}@example.com'
+    monkeypatch.setenv('ADMIN_EMAILS', f'someone@example.com, {email.upper()}')
+    return make_headers(email)
+
+def busy_loop(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+class TestSamplingProfiler:
+    """Test stack sampling and output formats"""
+    
+    def test_samples_busy_thread(self):
+        """Test a busy thread's function shows up in collapsed stacks"""
+        stop = threading.Event()
+        worker = threading.Thread(target=busy_loop, args=(stop,))
+        worker.start()
+        try:
+            profiler = SamplingProfiler(interval=0.002, duration=0.2).start()
+            profiler._thread.join()
+        finally:
+            stop.set()
+            worker.join()
+        
+        assert profiler.samples > 10
+        assert not profiler.running
+        lines = profiler.collapsed().splitlines()
+        busy = [line for line in lines if 'busy_loop (test_profiler.py' in line]
+        assert busy
+        stack, count = busy[0].rsplit(' ', 1)
+        assert stack.index('busy_loop') > stack.index('_bootstrap')
+        assert int(count) > 0
+    
+    def test_speedscope_format(self):
+        """Test speedscope output indexes shared frames and weights samples"""
+        profiler = SamplingProfiler(interval=0.01)
+        profiler.stacks[('main', 'handler', 'query')] = 3
+        profiler.stacks[('main', 'handler')] = 1
+        
+        data = profiler.speedscope('test')
+        names = [frame['name'] for frame in data['shared']['frames']]
+        assert names == ['main', 'handler', 'query']
+        profile = data['profiles'][0]
+        assert profile['type'] == 'sampled'
+        assert profile['samples'] == [[0, 1, 2], [0, 1]]
+        assert profile['weights'] == pytest.approx([0.03, 0.01])
+    
+    def test_route_filter(self):
+        """Test only threads marked as serving a matching request are sampled"""
+        profiler = SamplingProfiler(route=r'^/api/budgets')
+        profiler.request_started('/api/accounts')
+        profiler.sample()
+        assert not profiler.stacks
+        
+        marked = threading.Event()
+        stop = threading.Event()
+        
+        def serve():
+            profiler.request_started('/api/budgets/1')
+            marked.set()
+            busy_loop(stop)
+            profiler.request_finished()
+        
+        worker = threading.Thread(target=serve)
+        worker.start()
+        marked.wait()
+        profiler.sample()
+        stop.set()
+        worker.join()
+        assert sum(profiler.stacks.values()) == 1
+        assert any(label.startswith('serve (') for label in next(iter(profiler.stacks)))
+
+
+class TestProfilerEndpoints:
+    """Test the admin profiler API"""
+    
+    def test_disabled_is_not_found(self, client, admin_headers, monkeypatch):
+        """Test the endpoints are hidden unless PROFILER_ENABLED is set"""
+        monkeypatch.setenv('PROFILER_ENABLED', 'false')
+        assert client.get('/api/admin/profiler', headers=admin_headers).status_code == 404
+    
+    def test_requires_admin(self, client, monkeypatch):
+        """Test a non-admin user is refused"""
+        monkeypatch.setenv('ADMIN_EMAILS', 'ops@example.com')
+        headers = make_headers(f'user-{uuid.uuid4().hex[:12]}@example.com')
+        assert client.post('/api/admin/profiler', json={'seconds': 1}, headers=headers).status_code == 403
+        assert client.get('/api/admin/profiler').status_code == 401
+    
+    def test_rejects_bad_arguments(self, client, admin_headers):
+        """Test invalid rates, durations and patterns are 400s"""
+        for body in ({'rate_hz': 0}, {'rate_hz': 5000}, {'seconds': 100000}, {'route': '('}):
+            assert client.post('/api/admin/profiler', json=body, headers=admin_headers).status_code == 400
+    
+    def test_profile_written_and_downloadable(self, client, admin_headers, tmp_path):
+        """Test a timed profile writes collapsed and speedscope files"""
+        response = client.post('/api/admin/profiler', json={'seconds': 5, 'rate_hz': 200}, headers=admin_headers)
+        assert response.status_code == 202
+        assert response.get_json()['profile']['running'] is True
+        
+        again = client.post('/api/admin/profiler', json={'seconds': 1}, headers=admin_headers)
+        assert again.status_code == 400
+        
+        time.sleep(0.05)
+        stopped = client.delete('/api/admin/profiler', headers=admin_headers).get_json()['profile']
+        assert stopped['running'] is False
+        assert len(stopped['files']) == 2
+        
+        status = client.get('/api/admin/profiler', headers=admin_headers).get_json()
+        assert sorted(status['files']) == sorted(stopped['files'])
+        
+        collapsed = [name for name in stopped['files'] if name.endswith('.collapsed')][0]
+        download = client.get(f'/api/admin/profiler/files/{collapsed}', headers=admin_headers)
+        assert download.status_code == 200
+        assert download.data == (tmp_path / collapsed).read_bytes()
+        assert client.get('/api/admin/profiler/files/../app.log', headers=admin_headers).status_code == 404
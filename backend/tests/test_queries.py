@@ -0,0 +1,169 @@
+import pytest
+import uuid
+from datetime import date, datetime
+from src.main import app, db
+from src.models.user import User
+from src.models.account import Account
+from src.models.transaction import Transaction, Category
+from src.models.budget import Budget, BudgetCategory
+from src.utils.queries import QueryTracker, statement_shape, track_queries
+from flask_jwt_extended import create_access_token
+
+@pytest.fixture
+def client():
+    """Create test client"""
+    app.config['TESTING'] = True
+
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+            yield client
+
+@pytest.fixture
+def test_user(client):
+    """Create a fresh user so rows never leak between tests"""
+    user = User(
+        first_name='Query',
+        last_name='User',
+        email=f'queries-{uuid.uuid4().hex[:12]}@example.com',
+        password_hash='hashed_password'
+    )
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+@pytest.fixture
+def auth_headers(test_user):
+    """Create authorization headers with JWT token"""
+    token = create_access_token(identity=str(test_user.id))
+    return {'Authorization': f'Bearer {token}'}
+
+def add_category(index):
+    category = Category(name=f'Query category {index}', type='expense')
+    db.session.add(category)
+    db.session.commit()
+    return category
+
+
+class TestQueryTracker:
+    """Test statement shapes and repeat detection"""
+    
+    def test_statement_shape(self):
+        """Test literals, whitespace and IN lists collapse to one shape"""
+        assert statement_shape("SELECT *\n  FROM accounts WHERE id IN (?, ?, ?)") == \
+            statement_shape("SELECT * FROM accounts WHERE id IN (?)")
+        assert statement_shape("SELECT * FROM t WHERE a = 12 AND b = 'x'") == \
+            "SELECT * FROM t WHERE a = ? AND b = ?"
+        assert statement_shape("SELECT anon_1.id FROM t2") == "SELECT anon_1.id FROM t2"
+    
+    def test_repeated_selects_flagged(self):
+        """Test only SELECT shapes at or over the threshold are reported"""
+        tracker = QueryTracker()
+        for i in range(5):
+            tracker.record(f"SELECT * FROM accounts WHERE id = {i}", 0.001)
+            tracker.record("INSERT INTO accounts (name) VALUES (?)", 0.001)
+        tracker.record("SELECT count(*) FROM users", 0.001)
+        
+        repeated = tracker.repeated(threshold=5)
+        assert [(shape, count) for shape, count, _ in repeated] == [
+            ("SELECT * FROM accounts WHERE id = ?", 5)
+        ]
+        assert tracker.count == 11
+    
+    def test_track_queries_outside_request(self, client):
+        """Test the context manager counts statements run in its block"""
+        with track_queries() as tracker:
+            Category.query.count()
+            User.query.count()
+        assert tracker.count == 2
+
+
+class TestQueryHeaders:
+    """Test per-request query headers"""
+    
+    def test_headers_on_response(self, client):
+        """Test X-Query-Count and Server-Timing are set"""
+        response = client.get('/api/health')
+        assert int(response.headers['X-Query-Count']) >= 1
+        assert response.headers['Server-Timing'].startswith('db;dur=')
+        assert 'app;dur=' in response.headers['Server-Timing']
+
+    def test_headers_off_in_production(self, monkeypatch, tmp_path):
+        """Test the headers default to off outside debug and testing, and can be switched on"""
+        from src.main import create_app
+
+        def fetch(**env):
+            for name, value in env.items():
+                monkeypatch.setenv(name, value)
+            production_app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'prod.db'}"})
+            return production_app.test_client().get('/api/health')
+
+        monkeypatch.delenv('QUERY_TIMING_HEADERS', raising=False)
+        response = fetch()
+        assert 'X-Query-Count' not in response.headers
+        assert 'Server-Timing' not in response.headers
+        assert 'X-Query-Count' in fetch(QUERY_TIMING_HEADERS='true').headers
+
+
+class TestQueryScaling:
+    """Test list endpoints issue a constant number of statements"""
+    
+    def test_transactions_list(self, client, test_user, auth_headers, assert_constant_queries):
+        """Test GET /transactions does not query per transaction"""
+        def add_transaction(index):
+            account = Account(user_id=test_user.id, name=f'Account {index}')
+            db.session.add(account)
+            db.session.flush()
+            db.session.add(Transaction(
+                user_id=test_user.id, account_id=account.id,
+                category_id=add_category(index).id, amount=-10.0 * (index + 1)
+            ))
+            db.session.commit()
+        
+        assert_constant_queries(lambda: client.get('/api/transactions', headers=auth_headers), add_transaction)
+        
+        data = client.get('/api/transactions', headers=auth_headers).get_json()
+        assert len(data['transactions']) == 5
+        assert {t['account']['name'] for t in data['transactions']} == {f'Account {i}' for i in range(5)}
+    
+    def test_transactions_summary(self, client, test_user, auth_headers, assert_constant_queries):
+        """Test recent transactions in the summary come from one query"""
+        account = Account(user_id=test_user.id, name='Summary account')
+        db.session.add(account)
+        db.session.commit()
+        
+        def add_transaction(index):
+            db.session.add(Transaction(user_id=test_user.id, account_id=account.id, amount=5.0))
+            db.session.commit()
+        
+        assert_constant_queries(lambda: client.get('/api/transactions/summary', headers=auth_headers), add_transaction)
+    
+    def test_budget_categories(self, client, test_user, auth_headers, assert_constant_queries):
+        """Test budget detail and summary do not query per category"""
+        budget = Budget(
+            user_id=test_user.id, name='Monthly', type='monthly', amount=1000,
+            start_date=date(2024, 1, 1), end_date=date(2024, 1, 31)
+        )
+        db.session.add(budget)
+        db.session.commit()
+        account = Account(user_id=test_user.id, name='Budget account')
+        db.session.add(account)
+        db.session.commit()
+        
+        def add_budget_category(index):
+            category = add_category(index)
+            db.session.add(BudgetCategory(budget_id=budget.id, category_id=category.id, allocated_amount=100))
+            db.session.add(Transaction(
+                user_id=test_user.id, account_id=account.id, category_id=category.id,
+                amount=-25.0, transaction_date=datetime(2024, 1, 15)
+            ))
+            db.session.commit()
+        
+        assert_constant_queries(lambda: client.get(f'/api/budgets/{budget.id}', headers=auth_headers), add_budget_category)
+        assert_constant_queries(
+            lambda: client.get(f'/api/budgets/{budget.id}/summary', headers=auth_headers), lambda index: None
+        )
+        
+        data = client.get(f'/api/budgets/{budget.id}/summary', headers=auth_headers).get_json()
+        assert data['summary']['total_spent'] == 125
+        assert all(c['spent_amount'] == 25 for c in data['summary']['categories_summary'])
@@ -0,0 +1,183 @@
+import json
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+
+import msgpack
+import pytest
+from flask_jwt_extended import create_access_token
+
+from src.main import app, db
+from src.models.user import User
+from src.models.account import Account, AccountType
+from src.models.transaction import Transaction, Category
+from src.serializers import ACCOUNT, TRANSACTION
+from src.utils.queries import track_queries
+from src.utils.serialization import FastJSONProvider
+
+
+@pytest.fixture
+def client():
+    """Create test client"""
+    app.config['TESTING'] = True
+
+    with app.test_client() as client:
+        with app.app_context():
+            yield client
+
+
+@pytest.fixture
+def data(client):
+    """A fresh user with one account and two transactions, one uncategorized"""
+    user = User(first_name='Serial', last_name='User',
+                email=f'serializers-{uuid.uuid4().hex[:12]}@example.com')
+    db.session.add(user)
+    db.session.commit()
+    account = Account(user_id=user.id, name='Everyday', balance=125.5,
+                      account_type_id=AccountType.query.first().id)
+    db.session.add(account)
+    db.session.commit()
+    category = Category.query.first()
+    db.session.add_all([
+        Transaction(user_id=user.id, account_id=account.id, category_id=category.id,
+                    amount=-20.0, description='Groceries', transaction_date=datetime(2024, 3, 1)),
+        Transaction(user_id=user.id, account_id=account.id, amount=1000.0,
+                    description='Salary', transaction_date=datetime(2024, 3, 2))
+    ])
+    db.session.commit()
+    token = create_access_token(identity=str(user.id))
+    return {'Authorization': f'Bearer {token}'}, account, category
+
+
+def selected_columns(tracker, table):
+    """Column names of the SELECT list read from ``table``"""
+    select_list = next(shape.split(' FROM ')[0] for shape in tracker.shapes
+                       if f' {table}.' in shape.split(' FROM ')[0])
+    return {part.split('.')[1].split(' ')[0] for part in select_list[len('SELECT '):].split(', ')
+            if part.startswith(f'{table}.')}
+
+
+class TestFieldSpecs:
+    """Test the declarative specs match the responses routes used to build by hand"""
+
+    def test_transaction_list_shape(self, client, data):
+        headers, account, category = data
+        response = client.get('/api/transactions', headers=headers)
+        assert response.status_code == 200
+        by_description = {t['description']: t for t in response.get_json()['transactions']}
+
+        groceries = by_description['Groceries']
+        assert groceries['account'] == {'id': account.id, 'name': 'Everyday'}
+        assert groceries['category'] == {'id': category.id, 'name': category.name,
+                                         'type': category.type, 'icon': category.icon}
+        assert groceries['transaction_date'] == '2024-03-01T00:00:00'
+        assert by_description['Salary']['category'] is None
+
+    def test_transaction_detail_names_refs(self, client, data):
+        headers, _, _ = data
+        listed = client.get('/api/transactions', headers=headers).get_json()['transactions']
+        salary = next(t for t in listed if t['description'] == 'Salary')
+
+        detail = client.get(f"/api/transactions/{salary['id']}", headers=headers).get_json()['transaction']
+        assert detail['account_name'] == 'Everyday'
+        assert detail['category_name'] == 'Uncategorized'
+        assert 'account' not in detail
+
+    def test_missing_refs_use_defaults(self):
+        transaction = Transaction(id=1, account_id=99, amount=5.0)
+        dumped = TRANSACTION.dump((transaction, None, None))
+        assert dumped['account'] == {'id': None, 'name': 'Unknown'}
+        assert dumped['category'] is None
+        assert TRANSACTION.dump((transaction, None, None), ['account_name'])['account_name'] == 'Unknown'
+
+
+class TestFieldProjection:
+    """Test ?fields= trims both the response and the SELECT"""
+
+    def test_accounts_fields(self, client, data):
+        headers, _, _ = data
+        with track_queries() as tracker:
+            response = client.get('/api/accounts?fields=id,balance', headers=headers)
+        assert response.status_code == 200
+        assert response.get_json()['accounts'] == [{'id': data[1].id, 'balance': 125.5}]
+        assert selected_columns(tracker, 'accounts') == {'id', 'balance'}
+
+    def test_transactions_fields(self, client, data):
+        headers, _, _ = data
+        with track_queries() as tracker:
+            response = client.get('/api/transactions?fields=amount,account', headers=headers)
+        assert response.status_code == 200
+        rows = response.get_json()['transactions']
+        assert {tuple(sorted(row)) for row in rows} == {('account', 'amount')}
+        assert selected_columns(tracker, 'transactions') == {'id', 'amount'}
+        assert selected_columns(tracker, 'accounts') == {'id', 'name'}
+        assert selected_columns(tracker, 'categories') == {'id'}
+
+    def test_unknown_field_rejected(self, client, data):
+        headers, _, _ = data
+        response = client.get('/api/accounts?fields=id,password_hash', headers=headers)
+        assert response.status_code == 400
+        assert 'password_hash' in response.get_json()['error']
+        assert client.get('/api/transactions?fields=,', headers=headers).status_code == 400
+
+    def test_plan_is_cached(self):
+        assert ACCOUNT._plan(['name', 'id']) is ACCOUNT._plan(['id', 'name'])
+
+
+class TestResponseFormats:
+    """Test MessagePack negotiation and the columnar layout of list endpoints"""
+
+    def test_json_by_default(self, client, data):
+        headers, _, _ = data
+        response = client.get('/api/transactions', headers={**headers, 'Accept': '*/*'})
+        assert response.mimetype == 'application/json'
+        assert 'Accept' in response.headers['Vary']
+
+    def test_msgpack_matches_json(self, client, data):
+        headers, _, _ = data
+        as_json = client.get('/api/transactions', headers=headers).get_json()
+        response = client.get('/api/transactions', headers={**headers, 'Accept': 'application/msgpack'})
+        assert response.status_code == 200
+        assert response.mimetype == 'application/msgpack'
+        assert msgpack.unpackb(response.data) == as_json
+        assert len(response.data) < len(client.get('/api/transactions', headers=headers).data)
+
+    def test_columns_layout(self, client, data):
+        headers, _, _ = data
+        response = client.get('/api/transactions?layout=columns&fields=id,amount,category', headers=headers)
+        columns = response.get_json()['transactions']
+        assert set(columns) == {'id', 'amount', 'category'}
+        assert sorted(columns['amount']) == [-20.0, 1000.0]
+        assert len(columns['id']) == len(columns['category']) == 2
+
+    def test_msgpack_columns(self, client, data):
+        headers, _, _ = data
+        response = client.get('/api/accounts?layout=columns',
+                              headers={**headers, 'Accept': 'application/x-msgpack'})
+        columns = msgpack.unpackb(response.data)['accounts']
+        assert columns['name'] == ['Everyday']
+        assert columns['balance'] == [125.5]
+
+    def test_unknown_layout_rejected(self, client, data):
+        headers, _, _ = data
+        assert client.get('/api/categories?layout=grid', headers=headers).status_code == 400
+
+
+class TestFastJSONProvider:
+    """Test orjson output decodes to what Flask's own provider produces"""
+
+    def test_matches_default_provider(self, client):
+        provider = FastJSONProvider(app)
+        payload = {
+            'b': [1, 2.5, None, True, 'ünïcode'],
+            'a': {'when': datetime(2024, 3, 1, 12, 30), 'day': date(2024, 3, 1)},
+            'amount': Decimal('10.25'),
+            'id': uuid.UUID(int=7)
+        }
+        fast = provider.dumps(payload)
+        standard = json.dumps(payload, default=provider.default, sort_keys=True)
+        assert json.loads(fast) == json.loads(standard)
+        assert list(json.loads(fast)) == sorted(json.loads(fast))
+
+    def test_falls_back_for_big_ints(self, client):
+        assert FastJSONProvider(app).loads(FastJSONProvider(app).dumps({'n': 2 ** 70})) == {'n': 2 ** 70}
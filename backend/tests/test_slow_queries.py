@@ -0,0 +1,118 @@
+import pytest
+import json
+from datetime import datetime
+from sqlalchemy import text
+from src.main import app, db
+from src.utils.queries import add_statement_listener, remove_statement_listener
+from src.utils.slow_queries import (
+    SlowQueryRecorder, mask_parameters, read_entries, summarize, format_summary, main
+)
+
+@pytest.fixture
+def client():
+    """Create test client"""
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+
+@pytest.fixture
+def recorder(tmp_path):
+    """Record every statement (threshold 0) to a temporary log"""
+    recorder = SlowQueryRecorder(0, str(tmp_path / 'slow_queries.log'))
+    add_statement_listener(recorder.observe)
+    yield recorder
+    remove_statement_listener(recorder.observe)
+    recorder.close()
+
+def write_log(path, entries):
+    path.write_text(''.join(json.dumps(entry) + '\n' for entry in entries))
+
+
+class TestMasking:
+    """Test bound parameters are masked"""
+    
+    def test_positional_parameters(self):
+        """Test strings keep only their length, numbers and dates survive"""
+        assert mask_parameters(('alice@example.com', 42, 1.5, None, datetime(2024, 1, 2))) == [
+            '<str len=17>', 42, 1.5, None, '2024-01-02T00:00:00'
+        ]
+    
+    def test_named_and_executemany_parameters(self):
+        """Test sensitive names are masked and executemany is summarised"""
+        assert mask_parameters({'password_hash': 'abc', 'user_id': 7}) == {
+            'password_hash': '***MASKED***', 'user_id': 7
+        }
+        assert mask_parameters([(1, 'a'), (2, 'b')]) == {'rows': 2, 'first': [1, '<str len=1>']}
+
+
+class TestRecorder:
+    """Test slow statements are written with route and plan"""
+    
+    def test_request_query_logged_with_plan(self, client, recorder):
+        """Test a statement run by a route is logged with its EXPLAIN plan"""
+        assert client.get('/api/health').status_code == 200
+        recorder.drain()
+        
+        entries = list(read_entries(recorder.log_path))
+        health = [e for e in entries if e['statement'] == 'SELECT 1']
+        assert health and health[0]['route'] == 'GET /api/health'
+        assert health[0]['duration_ms'] >= 0
+        assert health[0]['plan']
+    
+    def test_parameters_masked_in_log(self, client, recorder):
+        """Test bound strings never reach the log"""
+        with app.app_context():
+            db.session.execute(text('SELECT id FROM users WHERE email = :email'), {'email': 'secret@example.com'})
+            db.session.rollback()
+        recorder.drain()
+        
+        raw = open(recorder.log_path).read()
+        assert 'secret@example.com' not in raw
+        entry = [e for e in read_entries(recorder.log_path) if 'FROM users' in e['statement']][0]
+        assert entry['route'] is None
+        assert entry['params'] == ['<str len=18>']
+    
+    def test_below_threshold_ignored(self, tmp_path):
+        """Test fast statements are not queued"""
+        recorder = SlowQueryRecorder(1000, str(tmp_path / 'slow.log'))
+        recorder.observe(None, 'SELECT 1', (), 0.01)
+        assert recorder._queue.qsize() == 0
+        recorder.close()
+
+
+class TestSummarizer:
+    """Test the CLI summary of the slow-query log"""
+    
+    def test_groups_by_shape(self, tmp_path):
+        """Test entries group by statement shape and sort by total time"""
+        log = tmp_path / 'slow_queries.log'
+        write_log(tmp_path / 'slow_queries.log.1', [
+            {'ts': 't1', 'duration_ms': 300, 'route': 'GET /api/budgets/<int:budget_id>',
+             'statement': 'SELECT * FROM transactions WHERE category_id = 1', 'plan': ['SCAN transactions']},
+        ])
+        write_log(log, [
+            {'ts': 't2', 'duration_ms': 250, 'route': 'GET /api/budgets/<int:budget_id>',
+             'statement': 'SELECT * FROM transactions WHERE category_id = 2'},
+            {'ts': 't3', 'duration_ms': 400, 'route': None, 'statement': 'DELETE FROM user_sessions'},
+        ])
+        
+        summary = summarize(read_entries(str(log)))
+        assert [item['count'] for item in summary] == [2, 1]
+        assert summary[0]['total_ms'] == 550
+        assert summary[0]['plan'] == ['SCAN transactions']
+        assert summary[0]['last_seen'] == 't2'
+        assert summary[1]['routes'] == [('(background)', 1)]
+        
+        only_budgets = summarize(read_entries(str(log)), route='/api/budgets')
+        assert len(only_budgets) == 1
+        assert 'SCAN transactions' in format_summary(only_budgets)
+    
+    def test_cli(self, tmp_path, capsys):
+        """Test the command line prints the summary"""
+        log = tmp_path / 'slow_queries.log'
+        write_log(log, [{'ts': 't1', 'duration_ms': 210, 'route': 'GET /api/x', 'statement': 'SELECT 1'}])
+        
+        assert main([str(log), '--json']) == 0
+        summary = json.loads(capsys.readouterr().out)
+        assert summary[0]['statement'] == 'SELECT ?'
+        assert summary[0]['count'] == 1
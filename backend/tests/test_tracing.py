@@ -0,0 +1,185 @@
+import pytest
+import json
+import logging
+import uuid
+from datetime import date, datetime
+from src.main import app, db
+from src.models.user import User
+from src.models.account import Account
+from src.models.transaction import Transaction, Category
+from src.models.budget import Budget, BudgetCategory
+from src.utils.logger import set_correlation, reset_correlation, JsonFormatter
+from src.utils.tracing import (
+    BatchSpanProcessor, OtlpFileExporter, Span, set_span_processor, start_span, traced
+)
+from flask_jwt_extended import create_access_token
+
+class MemoryExporter:
+    """Keeps exported OTLP payloads"""
+    
+    def __init__(self):
+        self.payloads = []
+    
+    def export(self, payload):
+        self.payloads.append(payload)
+    
+    def close(self):
+        pass
+    
+    @property
+    def spans(self):
+        return [span for payload in self.payloads
+                for resource in payload['resourceSpans']
+                for scope in resource['scopeSpans']
+                for span in scope['spans']]
+
+@pytest.fixture
+def exporter():
+    """Export spans to memory for the duration of a test"""
+    exporter = MemoryExporter()
+    processor = BatchSpanProcessor(exporter, interval=0.01)
+    set_span_processor(processor)
+    exporter.processor = processor
+    yield exporter
+    set_span_processor(None)
+    processor.shutdown()
+
+@pytest.fixture
+def client():
+    """Create test client"""
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+            yield client
+
+@pytest.fixture
+def auth_headers(client):
+    user = User(first_name='Trace', last_name='User', email=f'trace-{uuid.uuid4().hex[:12]}@example.com',
+                password_hash='hashed_password')
+    db.session.add(user)
+    db.session.commit()
+    return {'Authorization': f'Bearer {create_access_token(identity=str(user.id))}'}, user
+
+def attributes(span):
+    return {item['key']: list(item['value'].values())[0] for item in span['attributes']}
+
+
+class TestRequestIds:
+    """Test correlation ids on requests and log records"""
+    
+    def test_request_id_generated_and_echoed(self, client):
+        """Test a request id is generated, and a valid incoming one is kept"""
+        generated = client.get('/api/health').headers['X-Request-ID']
+        assert len(generated) == 32
+        
+        kept = client.get('/api/health', headers={'X-Request-ID': 'edge-42.a'})
+        assert kept.headers['X-Request-ID'] == 'edge-42.a'
+        
+        replaced = client.get('/api/health', headers={'X-Request-ID': 'bad id; drop' + 'x' * 80})
+        assert len(replaced.headers['X-Request-ID']) == 32
+    
+    def test_log_records_carry_correlation(self):
+        """Test records get the ids of the current context and '-' outside one"""
+        logger = logging.getLogger('app')
+        token = set_correlation('req-1', 'a' * 32)
+        try:
+            record = logger.makeRecord('app', logging.INFO, __file__, 1, 'inside', (), None)
+        finally:
+            reset_correlation(token)
+        outside = logger.makeRecord('app', logging.INFO, __file__, 1, 'outside', (), None)
+        
+        assert record.request_id == 'req-1'
+        entry = json.loads(JsonFormatter().format(record))
+        assert entry['request_id'] == 'req-1' and entry['trace_id'] == 'a' * 32
+        assert outside.request_id == '-'
+        assert 'request_id' not in json.loads(JsonFormatter().format(outside))
+
+
+class TestSpans:
+    """Test span creation outside requests"""
+    
+    def test_no_trace_is_noop(self, exporter):
+        """Test spans are skipped when no trace is active"""
+        with start_span('orphan') as span:
+            assert span is None
+        
+        @traced()
+        def work():
+            return 42
+        
+        assert work() == 42
+        exporter.processor.flush()
+        assert exporter.spans == []
+    
+    def test_otlp_file_exporter(self, tmp_path):
+        """Test the file exporter writes one OTLP request per line"""
+        processor = BatchSpanProcessor(OtlpFileExporter(str(tmp_path / 'traces.jsonl')), interval=0.01)
+        span = Span('root', 'f' * 32)
+        span.set_attribute('http.status_code', 200)
+        span.end_ns = span.start_ns + 1000
+        processor.on_end(span)
+        processor.shutdown()
+        
+        lines = (tmp_path / 'traces.jsonl').read_text().splitlines()
+        assert len(lines) == 1
+        exported = json.loads(lines[0])['resourceSpans'][0]['scopeSpans'][0]['spans'][0]
+        assert exported['traceId'] == 'f' * 32
+        assert exported['attributes'] == [{'key': 'http.status_code', 'value': {'intValue': '200'}}]
+
+
+class TestRequestTracing:
+    """Test a traced request breaks down into child spans"""
+    
+    def test_budget_summary_trace(self, client, auth_headers, exporter):
+        """Test view, JWT, SQL, service, JSON and logging spans share the request trace"""
+        headers, user = auth_headers
+        category = Category(name='Trace category', type='expense')
+        account = Account(user_id=user.id, name='Trace account')
+        db.session.add_all([category, account])
+        db.session.flush()
+        budget = Budget(user_id=user.id, name='Monthly', type='monthly', amount=100,
+                        start_date=date(2024, 1, 1), end_date=date(2024, 1, 31))
+        db.session.add(budget)
+        db.session.flush()
+        db.session.add(BudgetCategory(budget_id=budget.id, category_id=category.id, allocated_amount=100))
+        db.session.add(Transaction(user_id=user.id, account_id=account.id, category_id=category.id,
+                                   amount=-20, transaction_date=datetime(2024, 1, 10)))
+        db.session.commit()
+        
+        response = client.get(f'/api/budgets/{budget.id}/summary', headers=headers)
+        assert response.status_code == 200
+        exporter.processor.flush()
+        
+        spans = exporter.spans
+        root = [s for s in spans if s['name'] == 'GET /api/budgets/<int:budget_id>/summary'][0]
+        assert 'parentSpanId' not in root
+        assert attributes(root)['http.status_code'] == '200'
+        assert attributes(root)['http.request_id'] == response.headers['X-Request-ID']
+        
+        names = {s['name'] for s in spans if s['traceId'] == root['traceId']}
+        for expected in ('view budget.get_budget_summary', 'jwt.decode', 'db.query',
+                         'budget.spent_by_category', 'json.encode', 'log.request', 'log.response'):
+            assert expected in names
+        
+        by_id = {s['spanId']: s for s in spans}
+        service = [s for s in spans if s['name'] == 'budget.spent_by_category'][0]
+        assert by_id[service['parentSpanId']]['name'] == 'view budget.get_budget_summary'
+        queries = [s for s in spans if s['name'] == 'db.query' and s.get('parentSpanId') == service['spanId']]
+        assert queries and 'GROUP BY' in attributes(queries[0])['db.statement']
+    
+    def test_traceparent_continued(self, client, exporter):
+        """Test an incoming W3C traceparent sets the trace and parent ids"""
+        trace_id, parent_id = '4bf92f3577b34da6a3ce929d0e0e4736', '00f067aa0ba902b7'
+        client.get('/api/health', headers={'traceparent': f'00-{trace_id}-{parent_id}-01'})
+        exporter.processor.flush()
+        
+        root = [s for s in exporter.spans if s['name'] == 'GET /api/health'][0]
+        assert root['traceId'] == trace_id
+        assert root['parentSpanId'] == parent_id
+    
+    def test_unsampled_traceparent(self, client, exporter):
+        """Test a caller's not-sampled flag suppresses the trace"""
+        client.get('/api/health', headers={'traceparent': f'00-{"1" * 32}-{"2" * 16}-00'})
+        exporter.processor.flush()
+        assert exporter.spans == []